@@ -17,7 +17,7 @@ from pathlib import Path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from app import create_app
+from app import create_app, start_background_services
 from config.settings import settings
 
 
@@ -63,8 +63,9 @@ def main():
     # Set up environment
     setup_environment()
     
-    # Create Flask application
+    # Create Flask application and start its background workers
     app = create_app()
+    start_background_services(app)
     
     # Log startup information
     app.logger.info("=" * 50)
@@ -214,6 +214,56 @@ def register_blueprints(app: Flask) -> None:
         app.logger.warning(f"Could not register API blueprint: {e}")
 
 
+def start_background_services(app: Flask) -> None:
+    """
+    Start the per-process background workers.
+    
+    Workers run as daemon threads inside each application process; they coordinate
+    through the database, so running several worker processes is safe. Only the
+    server entry points (wsgi.py, app.py) call this: importing the package for
+    scripts, benchmarks or the flask CLI must not start them.
+    
+    Args:
+        app: Flask application instance
+    """
+    try:
+        from app.services.todoist_outbox import todoist_outbox
+        todoist_outbox.start()
+    except Exception as e:
+        app.logger.error(f"Could not start Todoist outbox dispatcher: {e}")
+    
+    try:
+        from app.handlers.telegram_handler import start_update_ingestion
+        start_update_ingestion()
+    except Exception as e:
+        app.logger.error(f"Could not start Telegram update ingestor: {e}")
+    
+    try:
+        from app.services.notification_log import notification_log
+        notification_log.start()
+    except Exception as e:
+        app.logger.error(f"Could not start notification log writer: {e}")
+    
+    try:
+        from app.services.outbound_dispatcher import telegram_dispatcher
+        telegram_dispatcher.start()
+    except Exception as e:
+        app.logger.error(f"Could not start Telegram outbound dispatcher: {e}")
+    
+    try:
+        from app.services.reminder_engine import reminder_engine
+        reminder_engine.start()
+    except Exception as e:
+        app.logger.error(f"Could not start reminder engine: {e}")
+    
+    try:
+        from app.services.job_scheduler import job_scheduler, register_default_jobs
+        register_default_jobs(job_scheduler)
+        job_scheduler.start()
+    except Exception as e:
+        app.logger.error(f"Could not start job scheduler: {e}")
+
+
 def register_error_handlers(app: Flask) -> None:
     """
     Register global error handlers for consistent error responses.
@@ -317,6 +367,7 @@ def register_request_logging(app: Flask) -> None:
 app = create_app()
 
 if __name__ == '__main__':
+    start_background_services(app)
     app.run(
         host=settings.flask_host,
         port=settings.flask_port,
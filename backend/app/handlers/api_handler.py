@@ -12,7 +12,9 @@ The API provides:
 - Authentication and authorization
 """
 
+import inspect
 import logging
+import math
 from typing import Dict, Any, Optional
 from datetime import datetime
 
@@ -24,6 +26,23 @@ from config.settings import settings
 from app.services.database_client import db_client
 from app.services.nlp_service import nlp_service
 from app.services.external_apis import todoist_service, google_drive_service
+from app.services.single_flight import llm_single_flight
+from app.services.rate_limiter import RateLimitExceeded, rate_limiter, llm_concurrency
+from app.services.equipment_lexicon import equipment_lexicon
+from app.services.report_similarity import report_similarity_index
+from app.services.report_dedup import report_deduplicator
+from app.services.site_locator import site_locator
+from app.services.report_attachments import report_attachments
+from app.services.update_ingestor import telegram_update_ingestor
+from app.services.update_dedup import seen_update_store
+from app.services.outbound_dispatcher import telegram_dispatcher
+from app.services.notification_log import notification_log
+from app.services.reminder_engine import reminder_engine
+from app.services.job_scheduler import job_scheduler
+from app.services.digest_service import digest_service
+from app.services.todoist_outbox import todoist_outbox
+from app.services.pipeline_metrics import pipeline_metrics, DEBUG_HEADER
+from app.services.speculative_prefetch import prefetch_stats
 
 
 # Create Flask blueprint for API endpoints
@@ -46,6 +65,9 @@ class UserContextSchema(Schema):
     primary_site_id = fields.Str()
     user_role = fields.Str(required=True)
     full_name = fields.Str(required=True)
+    timezone = fields.Str()  # IANA name, e.g. America/Chicago
+    latitude = fields.Float(validate=lambda x: -90 <= x <= 90)  # Where the user is; resolves the site of field reports
+    longitude = fields.Float(validate=lambda x: -180 <= x <= 180)
 
 
 class TaskCreateSchema(Schema):
@@ -74,44 +96,133 @@ class NLPProcessSchema(Schema):
     user_context = fields.Nested(UserContextSchema, required=True)
 
 
+class NLPBatchItemSchema(Schema):
+    """Schema for a single item of a batch NLP processing request."""
+    item_id = fields.Str()  # Optional caller-supplied correlation ID, echoed back
+    user_input = fields.Str(required=True, validate=lambda x: len(x) <= 2000)
+    user_context = fields.Nested(UserContextSchema, required=True)
+
+
+class NLPBatchProcessSchema(Schema):
+    """Schema for batch NLP processing requests."""
+    items = fields.List(
+        fields.Nested(NLPBatchItemSchema),
+        required=True,
+        validate=lambda x: 0 < len(x) <= settings.nlp_batch_max_items
+    )
+    max_concurrency = fields.Int(validate=lambda x: 1 <= x <= settings.nlp_batch_max_concurrency)
+
+
 # ==========================================
 # UTILITY FUNCTIONS
 # ==========================================
 
+def _authenticate_api_key():
+    """
+    Validate the X-API-Key header and apply the per-API-key rate limit.
+    
+    Returns:
+        Error response tuple if the request must be rejected, otherwise None
+    """
+    api_key = request.headers.get('X-API-Key')
+    
+    if not api_key:
+        return jsonify({
+            'error': 'Authentication Required',
+            'message': 'API key is missing. Please provide X-API-Key header.'
+        }), 401
+    
+    # In production, validate against stored API keys
+    # For now, check against a configured API key
+    valid_api_keys = settings.api_keys if hasattr(settings, 'api_keys') else []
+    
+    # Simple validation - in production, use hashed keys
+    if api_key not in valid_api_keys:
+        logging.getLogger(__name__).warning(f"Invalid API key attempted: {api_key[:8]}...")
+        return jsonify({
+            'error': 'Authentication Failed',
+            'message': 'Invalid API key.'
+        }), 401
+    
+    # Enforce the per-API-key rate limit
+    try:
+        rate_limiter.try_acquire(f"api_key:{api_key}")
+    except RateLimitExceeded as e:
+        return _rate_limited_response(e)
+    
+    # Store authenticated context
+    g.api_key = api_key
+    return None
+
+
+def _rate_limited_response(error: RateLimitExceeded):
+    """Build the 429 response (with Retry-After) for a rejected request."""
+    retry_after = math.ceil(error.retry_after)
+    response = jsonify({
+        'error': 'Too Many Requests',
+        'message': f'Rate limit exceeded. Please slow down and retry in {retry_after} seconds.',
+        'retry_after': retry_after
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
 def require_api_key(func):
     """
     Decorator to require API key authentication for endpoints.
     
     The API key should be provided in the X-API-Key header.
+    Supports both sync and async view functions.
     """
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            error_response = _authenticate_api_key()
+            if error_response:
+                return error_response
+            return await func(*args, **kwargs)
+        
+        return async_wrapper
+    
     @wraps(func)
     def wrapper(*args, **kwargs):
-        api_key = request.headers.get('X-API-Key')
-        
-        if not api_key:
-            return jsonify({
-                'error': 'Authentication Required',
-                'message': 'API key is missing. Please provide X-API-Key header.'
-            }), 401
-        
-        # In production, validate against stored API keys
-        # For now, check against a configured API key
-        valid_api_keys = settings.api_keys if hasattr(settings, 'api_keys') else []
-        
-        # Simple validation - in production, use hashed keys and rate limiting
-        if api_key not in valid_api_keys:
-            logging.getLogger(__name__).warning(f"Invalid API key attempted: {api_key[:8]}...")
-            return jsonify({
-                'error': 'Authentication Failed',
-                'message': 'Invalid API key.'
-            }), 401
-        
-        # Store authenticated context
-        g.api_key = api_key
+        error_response = _authenticate_api_key()
+        if error_response:
+            return error_response
         return func(*args, **kwargs)
     
     return wrapper
 
+
+def _validate_request_data(schema_class):
+    """
+    Validate the JSON body against a schema and store it in g.validated_data.
+    
+    Returns:
+        Error response tuple if validation failed, otherwise None
+    """
+    # Only validate JSON for methods that typically have request bodies
+    if request.method not in ['POST', 'PUT', 'PATCH']:
+        return None
+    
+    try:
+        schema = schema_class()
+        g.validated_data = schema.load(request.get_json() or {})
+        return None
+    except ValidationError as e:
+        return jsonify({
+            'error': 'Validation Error',
+            'message': 'Request data validation failed',
+            'details': e.messages
+        }), 400
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Request validation error: {e}")
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Invalid request data'
+        }), 400
+
+
 def validate_json_request(schema_class):
     """
     Decorator to validate JSON request data against a schema.
@@ -120,52 +231,63 @@ def validate_json_request(schema_class):
         schema_class: Marshmallow schema class for validation
     """
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                error_response = _validate_request_data(schema_class)
+                if error_response:
+                    return error_response
+                return await func(*args, **kwargs)
+            
+            return async_wrapper
+        
+        @wraps(func)
         def wrapper(*args, **kwargs):
-            # Only validate JSON for methods that typically have request bodies
-            if request.method not in ['POST', 'PUT', 'PATCH']:
-                return func(*args, **kwargs)
-                
-            try:
-                schema = schema_class()
-                data = schema.load(request.get_json() or {})
-                g.validated_data = data
-                return func(*args, **kwargs)
-            except ValidationError as e:
-                return jsonify({
-                    'error': 'Validation Error',
-                    'message': 'Request data validation failed',
-                    'details': e.messages
-                }), 400
-            except Exception as e:
-                logging.getLogger(__name__).error(f"Request validation error: {e}")
-                return jsonify({
-                    'error': 'Bad Request',
-                    'message': 'Invalid request data'
-                }), 400
-        wrapper.__name__ = func.__name__
+            error_response = _validate_request_data(schema_class)
+            if error_response:
+                return error_response
+            return func(*args, **kwargs)
+        
         return wrapper
     return decorator
 
 
+def _api_error_response(error: Exception):
+    """Build the structured response for an error raised by an endpoint."""
+    if isinstance(error, APIError):
+        return jsonify({
+            'error': 'API Error',
+            'message': str(error)
+        }), 400
+    
+    logging.getLogger(__name__).error(f"Unhandled API error: {error}", exc_info=True)
+    return jsonify({
+        'error': 'Internal Server Error',
+        'message': 'An unexpected error occurred'
+    }), 500
+
+
 def handle_api_errors(func):
     """
     Decorator to handle common API errors and return structured responses.
     """
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                return _api_error_response(e)
+        
+        return async_wrapper
+    
+    @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
-        except APIError as e:
-            return jsonify({
-                'error': 'API Error',
-                'message': str(e)
-            }), 400
         except Exception as e:
-            logging.getLogger(__name__).error(f"Unhandled API error: {e}", exc_info=True)
-            return jsonify({
-                'error': 'Internal Server Error',
-                'message': 'An unexpected error occurred'
-            }), 500
-    wrapper.__name__ = func.__name__
+            return _api_error_response(e)
+    
     return wrapper
 
 
@@ -182,7 +304,8 @@ async def process_nlp_input():
     Process natural language input through the NLP orchestration pipeline.
     
     This endpoint allows external systems to leverage the same NLP processing
-    capabilities used by the Telegram bot interface.
+    capabilities used by the Telegram bot interface. Send the X-FLRTS-Debug
+    header to include per-stage timings in the response metadata.
     """
     data = g.validated_data
     
@@ -192,15 +315,77 @@ async def process_nlp_input():
         user_context=data['user_context']
     )
     
+    metadata = {
+        'timestamp': datetime.now().isoformat(),
+        'processed_by': 'nlp_service'
+    }
+    if request.headers.get(DEBUG_HEADER, '').lower() in ('1', 'true', 'yes'):
+        metadata['stage_timings'] = result.get('stage_timings')
+    
     return jsonify({
         'success': result.get('success', False),
         'response': result.get('response'),
         'intent': result.get('intent'),
         'confidence': result.get('confidence'),
         'action_taken': result.get('action_taken'),
+        'metadata': metadata
+    })
+
+
+@api_bp.route('/nlp/process/batch', methods=['POST'])
+@require_api_key
+@validate_json_request(NLPBatchProcessSchema)
+@handle_api_errors
+async def process_nlp_batch():
+    """
+    Process a batch of natural language inputs concurrently.
+    
+    Intended for ingestion jobs replaying message backlogs (email or SMS gateways).
+    Items are processed with bounded parallelism and results are returned in
+    input order with per-item timing.
+    
+    Items skip the per-user limit, so each one is charged to the API key's batch
+    budget instead: NLP_BATCH_ITEMS_PER_MINUTE, with room for one full batch.
+    """
+    data = g.validated_data
+    max_concurrency = data.get('max_concurrency', settings.nlp_batch_max_concurrency)
+    
+    try:
+        rate_limiter.try_acquire(
+            f"api_key_batch:{g.api_key}", cost=len(data['items']),
+            per_minute=settings.nlp_batch_items_per_minute, burst=settings.nlp_batch_max_items
+        )
+    except RateLimitExceeded as e:
+        return _rate_limited_response(e)
+    
+    batch_result = await nlp_service.process_batch(data['items'], max_concurrency=max_concurrency)
+    
+    results = [
+        {
+            'index': index,
+            'item_id': item.get('item_id'),
+            'success': result.get('success', False),
+            'response': result.get('response'),
+            'intent': result.get('intent'),
+            'confidence': result.get('confidence'),
+            'action_taken': result.get('action_taken'),
+            'elapsed_ms': result.get('elapsed_ms')
+        }
+        for index, (item, result) in enumerate(zip(data['items'], batch_result['results']))
+    ]
+    succeeded = sum(1 for result in results if result['success'])
+    
+    return jsonify({
+        'success': succeeded == len(results),
+        'results': results,
+        'count': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
         'metadata': {
             'timestamp': datetime.now().isoformat(),
-            'processed_by': 'nlp_service'
+            'processed_by': 'nlp_service',
+            'max_concurrency': max_concurrency,
+            'total_elapsed_ms': batch_result['total_elapsed_ms']
         }
     })
 
@@ -259,23 +444,21 @@ def get_user_tasks(user_id: str):
 
 @api_bp.route('/tasks/<task_id>/complete', methods=['POST'])
 @handle_api_errors
-async def complete_task(task_id: str):
+def complete_task(task_id: str):
     """Mark a task as completed."""
     try:
-        # Update task status in database
-        result = db_client.supabase.table('tasks').update({
+        # Update task status in database; the Todoist completion is queued in the same transaction
+        task = db_client.update_task_status(task_id, {
             'status': 'Completed',
             'completion_date': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat()
-        }).eq('id', task_id).execute()
+        }, 'complete_task' if todoist_outbox.enabled else None)
         
-        if not result.data:
+        if not task:
             raise APIError(f"Task {task_id} not found")
         
-        # Also complete in Todoist if linked
-        task = result.data[0]
-        if task.get('todoist_task_id'):
-            await todoist_service.complete_task(task['todoist_task_id'])
+        if todoist_outbox.enabled:
+            todoist_outbox.notify()
         
         return jsonify({
             'success': True,
@@ -305,6 +488,11 @@ def create_field_report():
     # Create report in database
     created_report = db_client.create_field_report(data)
     
+    try:
+        report_similarity_index.add_report(created_report)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Could not index report {created_report['id']} for similarity search: {e}")
+    
     return jsonify({
         'success': True,
         'message': 'Field report created successfully',
@@ -318,6 +506,36 @@ def create_field_report():
     }), 201
 
 
+@api_bp.route('/field-reports/similar', methods=['GET'])
+@handle_api_errors
+def get_similar_field_reports():
+    """
+    Find field reports similar to a description (q) or to an existing report (report_id).
+    
+    Optional site_id restricts results to one site; limit defaults to 5 (max 50).
+    """
+    query = request.args.get('q', '').strip()
+    report_id = request.args.get('report_id', '').strip() or None
+    site_id = request.args.get('site_id', '').strip() or None
+    limit = min(max(request.args.get('limit', 5, type=int), 1), 50)
+    
+    if not query and not report_id:
+        raise APIError("Either q or report_id is required")
+    
+    try:
+        reports = report_similarity_index.search(query, report_id=report_id, limit=limit, site_id=site_id)
+    except KeyError:
+        raise APIError(f"Field report {report_id} is not in the similarity index")
+    
+    return jsonify({
+        'success': True,
+        'reports': reports,
+        'count': len(reports),
+        'query': query or None,
+        'report_id': report_id
+    })
+
+
 @api_bp.route('/field-reports/site/<site_id>', methods=['GET'])
 @handle_api_errors
 def get_site_field_reports(site_id: str):
@@ -335,6 +553,26 @@ def get_site_field_reports(site_id: str):
     })
 
 
+@api_bp.route('/field-reports/<report_id>/attachments', methods=['GET'])
+@handle_api_errors
+def get_field_report_attachments(report_id: str):
+    """
+    Retrieve the photos and documents attached to a field report.
+    
+    storage_path is relative to ATTACHMENT_STORAGE_DIR for the local backend and a
+    Drive file ID for the drive backend; status is 'Received' until the file has
+    been moved into storage.
+    """
+    attachments = report_attachments.for_report(report_id)
+    
+    return jsonify({
+        'success': True,
+        'attachments': attachments,
+        'count': len(attachments),
+        'report_id': report_id
+    })
+
+
 # ==========================================
 # SITES ENDPOINTS
 # ==========================================
@@ -356,6 +594,35 @@ def get_sites():
     })
 
 
+@api_bp.route('/sites/nearest', methods=['GET'])
+@handle_api_errors
+def get_nearest_sites():
+    """
+    Find the sites nearest to a position (lat, lon in degrees).
+    
+    limit defaults to 3 (max 50); optional max_km drops sites further away.
+    """
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
+    limit = min(max(request.args.get('limit', 3, type=int), 1), 50)
+    max_km = request.args.get('max_km', type=float)
+    
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return jsonify({
+            'error': 'Bad Request',
+            'message': 'Query parameters "lat" and "lon" must be a valid latitude and longitude'
+        }), 400
+    
+    sites = site_locator.nearest(latitude, longitude, limit=limit, max_distance_km=max_km)
+    
+    return jsonify({
+        'success': True,
+        'sites': sites,
+        'count': len(sites),
+        'query': {'lat': latitude, 'lon': longitude, 'limit': limit, 'max_km': max_km}
+    })
+
+
 @api_bp.route('/sites/search', methods=['GET'])
 @handle_api_errors
 def search_sites():
@@ -385,6 +652,30 @@ def search_sites():
         }), 404
 
 
+# ==========================================
+# NOTIFICATIONS ENDPOINTS
+# ==========================================
+
+@api_bp.route('/notifications/user/<user_id>', methods=['GET'])
+@handle_api_errors
+def get_user_notifications(user_id: str):
+    """Retrieve the most recent notifications sent to a user, including ones not yet written."""
+    notification_type = request.args.get('type')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    
+    notifications = notification_log.recent_for_user(user_id, limit, notification_type)
+    
+    return jsonify({
+        'success': True,
+        'notifications': notifications,
+        'count': len(notifications),
+        'filters_applied': {
+            'type': notification_type,
+            'limit': limit
+        }
+    })
+
+
 # ==========================================
 # BUSINESS LOGIC ENDPOINTS
 # ==========================================
@@ -568,6 +859,38 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+@api_bp.route('/metrics', methods=['GET'])
+@require_api_key
+@handle_api_errors
+def get_metrics():
+    """Export in-process performance counters for monitoring (per worker)."""
+    return jsonify({
+        'success': True,
+        'metrics': {
+            'llm_single_flight': llm_single_flight.get_stats(),
+            'llm_concurrency': llm_concurrency.get_stats(),
+            'rate_limiter': rate_limiter.get_stats(),
+            'equipment_lexicon': equipment_lexicon.get_stats(),
+            'report_similarity': report_similarity_index.get_stats(),
+            'report_dedup': report_deduplicator.get_stats(),
+            'telegram_updates': telegram_update_ingestor.get_stats(),
+            'telegram_update_dedup': seen_update_store.get_stats(),
+            'telegram_outbound': telegram_dispatcher.get_stats(),
+            'notification_log': notification_log.get_stats(),
+            'site_locator': site_locator.get_stats(),
+            'report_attachments': report_attachments.get_stats(),
+            'reminders': reminder_engine.get_stats(),
+            'jobs': job_scheduler.get_stats(),
+            'digests': digest_service.get_stats(),
+            'todoist_outbox': todoist_outbox.get_stats(),
+            'intent_cascade': nlp_service.get_cascade_stats(),
+            'speculative_prefetch': prefetch_stats.get_stats(),
+            'pipeline_latency': pipeline_metrics.get_stats()
+        },
+        'timestamp': datetime.now().isoformat()
+    })
+
+
 @api_bp.route('/test/database-connection', methods=['GET'])
 @require_api_key
 @handle_api_errors
@@ -7,33 +7,46 @@ rapid, low-friction CRUD operations on FLRTS items using typed natural language
 The Telegram bot serves as a crucial, direct interface that allows field technicians to:
 - Create tasks and reminders using natural language
 - Log field reports through narrative text input
+- Attach photos and documents to field reports
 - Add items to lists (shopping lists, tool inventories)
 - Query their tasks and site information
 - Perform basic updates and status changes
 
 All interactions are processed through the NLP orchestration pipeline which routes
-requests to appropriate services (Todoist, OpenAI LLM, database operations).
+requests to appropriate services (Todoist, OpenAI LLM, database operations). Frequent
+requests also have structured commands (/tasks, /reports, /done, /report, /add) that
+go straight to the matching NLP handler without intent classification, and task
+pickers use inline keyboards so follow-ups arrive as callback queries.
 """
 
 import logging
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 from flask import Blueprint, request, jsonify
-from telegram import Update, Bot
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters, ContextTypes
 
 from config.settings import settings
 from app.services.database_client import db_client
-from app.services.nlp_service import nlp_service
+from app.services.nlp_service import nlp_service, Intent
+from app.services.update_ingestor import telegram_update_ingestor
+from app.services.update_dedup import seen_update_store
+from app.services.outbound_dispatcher import telegram_dispatcher
+from app.services.site_locator import site_locator
+from app.services.report_attachments import AttachmentError, report_attachments
 
 
 # Create Flask blueprint for Telegram webhook endpoints
 telegram_bp = Blueprint('telegram', __name__)
 
-# Global bot instance
+# Global bot instance, set only once it is fully initialized
 bot_application: Optional[Application] = None
+_bot_application_lock = asyncio.Lock()
+
+# Callback data prefix for "mark this task done" buttons (followed by the task ID display)
+DONE_CALLBACK_PREFIX = 'done:'
 
 
 class TelegramBotHandler:
@@ -89,9 +102,10 @@ class TelegramBotHandler:
                 f"Once you're registered, I'll be able to help you with field reports, tasks, and more!"
             )
         
-        await context.bot.send_message(
+        self.reply(
             chat_id=chat_id,
             text=welcome_message,
+            flrts_user=flrts_user,
             parse_mode='Markdown'
         )
     
@@ -108,7 +122,10 @@ class TelegramBotHandler:
             "*10NetZero FLRTS Bot Help* 🤖\\n\\n"
             "*Field Reports:*\\n"
             f"• \"Field report Site Alpha: Generator running at 80% load, fuel levels good\"\\n"
-            f"• \"Log incident at Site Beta: Noticed oil leak near pump 3\"\\n\\n"
+            f"• \"Log incident at Site Beta: Noticed oil leak near pump 3\"\\n"
+            f"• \"Has a pump seal leak happened before at any site?\"\\n"
+            f"• Share your location 📍 and reports without a site name are logged at the site you're on\\n"
+            f"• Send a photo 📷 with the report as its caption, or right after a report, to attach it\\n\\n"
             "*Tasks & Reminders:*\\n"
             f"• \"Remind me to call Anthony tomorrow at 2pm about the new controls\"\\n"
             f"• \"Create task: Check generator maintenance schedule for next week\"\\n\\n"
@@ -122,11 +139,16 @@ class TelegramBotHandler:
             "*Commands:*\\n"
             f"• /start - Get started\\n"
             f"• /help - Show this help\\n"
-            f"• /status - Check your account status\\n\\n"
+            f"• /status - Check your account status\\n"
+            f"• /tasks - List your open tasks\\n"
+            f"• /reports - Show recent field reports\\n"
+            f"• /done <task ID or title> - Complete a task (no argument: pick from a list)\\n"
+            f"• /report <site> <text> - Log a field report for a site\\n"
+            f"• /add <list> <items> - Add items to a list, e.g. /add supplies zip ties, tape\\n\\n"
             f"Just type naturally - I'll understand what you need! 💪"
         )
         
-        await context.bot.send_message(
+        self.reply(
             chat_id=chat_id,
             text=help_text,
             parse_mode='Markdown'
@@ -147,7 +169,7 @@ class TelegramBotHandler:
         flrts_user = db_client.get_user_by_telegram_id(str(user.id))
         
         if not flrts_user:
-            await context.bot.send_message(
+            self.reply(
                 chat_id=chat_id,
                 text="❌ You're not registered in the FLRTS system. Please contact your administrator."
             )
@@ -184,17 +206,19 @@ class TelegramBotHandler:
             
             status_text += f"\\n_Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M')}_"
             
-            await context.bot.send_message(
+            self.reply(
                 chat_id=chat_id,
                 text=status_text,
+                flrts_user=flrts_user,
                 parse_mode='Markdown'
             )
             
         except Exception as e:
             self.logger.error(f"Error in status command: {e}")
-            await context.bot.send_message(
+            self.reply(
                 chat_id=chat_id,
-                text="❌ Sorry, I couldn't retrieve your status information right now. Please try again later."
+                text="❌ Sorry, I couldn't retrieve your status information right now. Please try again later.",
+                flrts_user=flrts_user
             )
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -227,7 +251,7 @@ class TelegramBotHandler:
         flrts_user = db_client.get_user_by_telegram_id(str(user.id))
         
         if not flrts_user:
-            await context.bot.send_message(
+            self.reply(
                 chat_id=chat_id,
                 text="❌ You're not registered in the FLRTS system. Please use /start and contact your administrator to get set up."
             )
@@ -235,9 +259,10 @@ class TelegramBotHandler:
         
         # Check message length
         if len(user_input) > settings.max_message_length:
-            await context.bot.send_message(
+            self.reply(
                 chat_id=chat_id,
-                text=f"❌ Message too long. Please keep messages under {settings.max_message_length} characters."
+                text=f"❌ Message too long. Please keep messages under {settings.max_message_length} characters.",
+                flrts_user=flrts_user
             )
             return
         
@@ -248,42 +273,350 @@ class TelegramBotHandler:
             # Process message through NLP service
             nlp_response = await nlp_service.process_user_input(
                 user_input=user_input,
-                user_context={
-                    'flrts_user_id': flrts_user['id'],
-                    'telegram_user_id': str(user.id),
-                    'primary_site_id': flrts_user['personnel']['primary_site_id'],
-                    'user_role': flrts_user['user_role_flrts'],
-                    'full_name': f"{flrts_user['personnel']['first_name']} {flrts_user['personnel']['last_name']}"
-                }
+                user_context=self.build_user_context(flrts_user, user)
             )
             
+            # Ambiguous task references get a picker instead of a retyped follow-up
+            reply_markup = None
+            if nlp_response.get('needs_clarification'):
+                reply_markup = self.build_task_keyboard(nlp_response.get('candidates', []))
+            
             # Send response back to user
-            response_text = nlp_response.get('response', 'I processed your request, but something went wrong generating a response.')
+            self.send_nlp_response(context, chat_id, nlp_response, reply_markup, flrts_user)
+            
+            # Log successful processing
+            self.logger.info(f"Successfully processed message from user {user.id}, action: {nlp_response.get('intent', 'unknown')}")
+            
+        except Exception as e:
+            self.logger.error(f"Error processing message from user {user.id}: {e}")
+            self.reply(
+                chat_id=chat_id,
+                text="❌ Sorry, I encountered an error processing your request. Please try again or contact support if the problem persists.",
+                flrts_user=flrts_user
+            )
+    
+    async def handle_location(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle a shared location: resolve the site the user is at and log their next
+        field reports there instead of at their primary site.
+        
+        Live locations arrive as a stream of message edits; those are only answered
+        when the resolved site changes.
+        """
+        message = update.effective_message
+        chat_id = update.effective_chat.id
+        flrts_user = await self.authenticate(update, context)
+        if not flrts_user or not message or not message.location:
+            return
+        
+        latitude, longitude = message.location.latitude, message.location.longitude
+        previous = site_locator.located_site(flrts_user['id'])
+        
+        try:
+            site = site_locator.resolve(latitude, longitude)
+        except Exception as e:
+            self.logger.error(f"Error resolving location from user {update.effective_user.id}: {e}")
+            self.reply(
+                chat_id=chat_id,
+                text="❌ Sorry, I couldn't look up the site for your location right now.",
+                flrts_user=flrts_user
+            )
+            return
+        
+        site_locator.remember(flrts_user['id'], site)
+        if update.edited_message and (previous or {}).get('id') == (site or {}).get('id'):
+            return
+        
+        if site:
+            text = (
+                f"📍 You're at {site['site_name']} ({site['distance_km']:.1f} km). "
+                f"Field reports you send now will be logged there."
+            )
+        else:
+            nearest = site_locator.nearest(latitude, longitude, limit=1)
+            text = f"📍 There is no site within {site_locator.max_distance_km:g} km of you"
+            text += f" (nearest: {nearest[0]['site_name']}, {nearest[0]['distance_km']:.1f} km)." if nearest else "."
+            text += " Field reports will use your primary site."
+        
+        self.reply(chat_id=chat_id, text=text, flrts_user=flrts_user)
+    
+    async def handle_attachment(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle a photo or document: save it and attach it to a field report.
+        
+        A caption is logged as a new field report with the file attached. Without a
+        caption the file joins the report the user logged in the last
+        `attachment_link_window_seconds`, or else the next one they log. Photos sent
+        as an album arrive as separate messages on the chat's ordered lane, so the
+        captioned first photo creates the report before the others are attached.
+        """
+        message = update.effective_message
+        chat_id = update.effective_chat.id
+        flrts_user = await self.authenticate(update, context)
+        incoming = report_attachments.from_message(message) if message else None
+        if not flrts_user or not incoming:
+            return
+        
+        label = "Photo" if incoming.kind == 'photo' else "File"
+        
+        try:
+            await context.bot.send_chat_action(chat_id=chat_id, action="typing")
+            attachment = await report_attachments.receive(context.bot, incoming, flrts_user['id'])
+        except AttachmentError as e:
+            self.reply(chat_id=chat_id, text=f"❌ {e}", flrts_user=flrts_user)
+            return
+        except Exception as e:
+            self.logger.error(f"Error saving attachment from user {update.effective_user.id}: {e}")
+            self.reply(
+                chat_id=chat_id,
+                text="❌ Sorry, I couldn't save that file right now. Please try again.",
+                flrts_user=flrts_user
+            )
+            return
+        
+        caption = (message.caption or '').strip()
+        try:
+            if caption:
+                # Logging the report links the user's unassigned attachments, this one included
+                nlp_response = await nlp_service.process_command(
+                    Intent.CREATE_FIELD_REPORT, self.build_user_context(flrts_user, update.effective_user),
+                    user_input=caption
+                )
+                if nlp_response.get('action_taken') == 'duplicate_report_collapsed':
+                    report_attachments.attach(attachment['id'], nlp_response['report_id'])
+                self.send_nlp_response(context, chat_id, nlp_response, flrts_user=flrts_user)
+                return
             
-            # Add status indicators based on success
-            if nlp_response.get('success', False):
-                if nlp_response.get('action_taken'):
-                    response_text = f"✅ {response_text}"
-                else:
-                    response_text = f"ℹ️ {response_text}"
+            report = report_attachments.recent_report(flrts_user['id'])
+            if report:
+                report_attachments.attach(attachment['id'], report['id'])
+                text = f"📎 {label} attached to {report['report_id_display']}: {report['report_title_summary']}"
             else:
-                response_text = f"❌ {response_text}"
+                minutes = settings.attachment_link_window_seconds // 60
+                text = f"📎 {label} saved. It will be attached to the field report you send in the next {minutes} minutes."
             
-            await context.bot.send_message(
+            self.reply(chat_id=chat_id, text=text, flrts_user=flrts_user)
+        
+        except Exception as e:
+            self.logger.error(f"Error attaching file from user {update.effective_user.id} to a report: {e}")
+            self.reply(
                 chat_id=chat_id,
-                text=response_text,
-                parse_mode='Markdown' if nlp_response.get('use_markdown', False) else None
+                text=f"⚠️ {label} saved, but I couldn't attach it to a report. It will join your next field report.",
+                flrts_user=flrts_user
             )
+    
+    def build_user_context(self, flrts_user: Dict[str, Any], user) -> Dict[str, Any]:
+        """Build the NLP user context for a registered FLRTS user."""
+        located = site_locator.located_site(flrts_user['id'])
+        return {
+            'flrts_user_id': flrts_user['id'],
+            'telegram_user_id': str(user.id),
+            'primary_site_id': flrts_user['personnel']['primary_site_id'],
+            'user_role': flrts_user['user_role_flrts'],
+            'full_name': f"{flrts_user['personnel']['first_name']} {flrts_user['personnel']['last_name']}",
+            'timezone': (flrts_user.get('preferences_flrts') or {}).get('timezone'),
+            'located_site_id': located['id'] if located else None,
+            'located_site_name': located['site_name'] if located else None
+        }
+    
+    def format_nlp_response(self, nlp_response: Dict[str, Any]) -> str:
+        """Prefix an NLP response with its status indicator."""
+        response_text = nlp_response.get('response', 'I processed your request, but something went wrong generating a response.')
+        
+        # Add status indicators based on success
+        if nlp_response.get('success', False):
+            if nlp_response.get('action_taken'):
+                return f"✅ {response_text}"
+            return f"ℹ️ {response_text}"
+        return f"❌ {response_text}"
+    
+    def send_nlp_response(self, context: ContextTypes.DEFAULT_TYPE, chat_id: int, nlp_response: Dict[str, Any],
+                          reply_markup: Optional[InlineKeyboardMarkup] = None,
+                          flrts_user: Optional[Dict[str, Any]] = None) -> None:
+        """Queue an NLP response for a chat, optionally with an inline keyboard."""
+        self.reply(
+            chat_id=chat_id,
+            text=self.format_nlp_response(nlp_response),
+            flrts_user=flrts_user,
+            parse_mode='Markdown' if nlp_response.get('use_markdown', False) else None,
+            reply_markup=reply_markup,
+            related_task_id=nlp_response.get('task_id'),
+            related_field_report_id=nlp_response.get('report_id')
+        )
+    
+    def reply(self, chat_id: int, text: str, flrts_user: Optional[Dict[str, Any]] = None, **options) -> None:
+        """
+        Queue a message on the outbound dispatcher instead of sending it inline.
+        
+        The dispatcher paces sends to Telegram's limits and retries 429s and
+        network errors, so handlers never wait on (or lose) a send.
+        
+        Args:
+            chat_id: Chat to send to
+            text: Message text
+            flrts_user: Registered recipient; replies to registered users are logged to notifications_log
+            options: parse_mode, reply_markup and related task/report IDs
+        """
+        telegram_dispatcher.enqueue(
+            chat_id, text, recipient_user_id=flrts_user['id'] if flrts_user else None, **options
+        )
+    
+    def build_task_keyboard(self, tasks: List[Dict[str, Any]]) -> Optional[InlineKeyboardMarkup]:
+        """
+        Build a one-button-per-task keyboard that completes the chosen task.
+        
+        Args:
+            tasks: Tasks with task_id_display and task_title
             
-            # Log successful processing
-            self.logger.info(f"Successfully processed message from user {user.id}, action: {nlp_response.get('intent', 'unknown')}")
+        Returns:
+            Inline keyboard, or None if there are no tasks
+        """
+        buttons = [
+            [InlineKeyboardButton(
+                f"✅ {task['task_title'][:48]}",
+                callback_data=f"{DONE_CALLBACK_PREFIX}{task['task_id_display']}"
+            )]
+            for task in tasks if task.get('task_id_display')
+        ]
+        return InlineKeyboardMarkup(buttons) if buttons else None
+    
+    async def authenticate(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[Dict[str, Any]]:
+        """
+        Look up the FLRTS user behind an update.
+        
+        Returns:
+            The FLRTS user, or None after telling an unregistered user how to get set up
+        """
+        flrts_user = db_client.get_user_by_telegram_id(str(update.effective_user.id))
+        
+        if not flrts_user:
+            self.reply(
+                chat_id=update.effective_chat.id,
+                text="❌ You're not registered in the FLRTS system. Please use /start and contact your administrator to get set up."
+            )
+        
+        return flrts_user
+    
+    async def run_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, intent: Intent,
+                          arguments: Optional[Dict[str, Any]] = None, user_input: str = '',
+                          task_picker: bool = False) -> None:
+        """
+        Run a structured command through its NLP handler and reply.
+        
+        Args:
+            update: Incoming Telegram update
+            context: Handler context
+            intent: Intent the command maps to
+            arguments: Parsed command arguments
+            user_input: Free text carried by the command
+            task_picker: Attach a keyboard for completing the listed tasks
+        """
+        chat_id = update.effective_chat.id
+        flrts_user = await self.authenticate(update, context)
+        if not flrts_user:
+            return
+        
+        try:
+            await context.bot.send_chat_action(chat_id=chat_id, action="typing")
+            
+            nlp_response = await nlp_service.process_command(
+                intent, self.build_user_context(flrts_user, update.effective_user), arguments, user_input
+            )
+            
+            reply_markup = None
+            if task_picker or nlp_response.get('needs_clarification'):
+                reply_markup = self.build_task_keyboard(nlp_response.get('tasks') or nlp_response.get('candidates', []))
+            
+            self.send_nlp_response(context, chat_id, nlp_response, reply_markup, flrts_user)
             
         except Exception as e:
-            self.logger.error(f"Error processing message from user {user.id}: {e}")
-            await context.bot.send_message(
+            self.logger.error(f"Error processing {intent.value} command from user {update.effective_user.id}: {e}")
+            self.reply(
                 chat_id=chat_id,
-                text="❌ Sorry, I encountered an error processing your request. Please try again or contact support if the problem persists."
+                text="❌ Sorry, I encountered an error processing your request. Please try again or contact support if the problem persists.",
+                flrts_user=flrts_user
+            )
+    
+    async def tasks_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /tasks: list open tasks with buttons to complete them."""
+        await self.run_command(update, context, Intent.QUERY_TASKS, task_picker=True)
+    
+    async def reports_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /reports: show recent field reports."""
+        await self.run_command(update, context, Intent.QUERY_REPORTS)
+    
+    async def done_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /done <task ID or title>; without an argument, offer a task picker."""
+        reference = ' '.join(context.args or []).strip()
+        
+        if not reference:
+            await self.run_command(update, context, Intent.QUERY_TASKS, task_picker=True)
+            return
+        
+        await self.run_command(
+            update, context, Intent.UPDATE_TASK_STATUS,
+            arguments={'task_reference': reference, 'new_status': 'Completed'}
+        )
+    
+    async def report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /report <site> <text>."""
+        args = context.args or []
+        
+        if len(args) < 2:
+            self.reply(
+                chat_id=update.effective_chat.id,
+                text="Usage: /report <site> <what you observed>\nExample: /report Alpha Generator 2 running rough"
+            )
+            return
+        
+        await self.run_command(
+            update, context, Intent.CREATE_FIELD_REPORT,
+            arguments={'site': args[0]}, user_input=' '.join(args[1:])
+        )
+    
+    async def add_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /add <list> <items>."""
+        args = context.args or []
+        items = nlp_service.split_list_items(' '.join(args[1:])) if len(args) > 1 else []
+        
+        if not items:
+            self.reply(
+                chat_id=update.effective_chat.id,
+                text="Usage: /add <list> <items>\nExample: /add supplies zip ties, electrical tape"
             )
+            return
+        
+        await self.run_command(
+            update, context, Intent.ADD_LIST_ITEM,
+            arguments={'list_type': nlp_service.extract_list_type(args[0]), 'items': items}
+        )
+    
+    async def task_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        Handle a task picker button press.
+        
+        The chosen task is completed directly and the picker message is replaced
+        with the result, so no new NLP request is made.
+        """
+        query = update.callback_query
+        await query.answer()
+        
+        flrts_user = db_client.get_user_by_telegram_id(str(query.from_user.id))
+        if not flrts_user:
+            await query.edit_message_text("❌ You're not registered in the FLRTS system.")
+            return
+        
+        task_reference = query.data[len(DONE_CALLBACK_PREFIX):]
+        nlp_response = await nlp_service.process_command(
+            Intent.UPDATE_TASK_STATUS,
+            self.build_user_context(flrts_user, query.from_user),
+            {'task_reference': task_reference, 'new_status': 'Completed'}
+        )
+        
+        await query.edit_message_text(
+            self.format_nlp_response(nlp_response),
+            parse_mode='Markdown' if nlp_response.get('use_markdown', False) else None
+        )
     
     async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
         """
@@ -296,7 +629,7 @@ class TelegramBotHandler:
         # Try to send error message to user if update contains chat info
         if isinstance(update, Update) and update.effective_chat:
             try:
-                await context.bot.send_message(
+                self.reply(
                     chat_id=update.effective_chat.id,
                     text="❌ Sorry, something went wrong. Please try again in a moment."
                 )
@@ -320,21 +653,50 @@ async def initialize_bot_application():
     if bot_application:
         return bot_application
     
-    # Create application
-    bot_application = Application.builder().token(settings.telegram_bot_token).build()
-    
-    # Add command handlers
-    bot_application.add_handler(CommandHandler("start", telegram_handler.start_command))
-    bot_application.add_handler(CommandHandler("help", telegram_handler.help_command))
-    bot_application.add_handler(CommandHandler("status", telegram_handler.status_command))
-    
-    # Add message handler for natural language processing
-    bot_application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, telegram_handler.handle_message))
-    
-    # Add error handler
-    bot_application.add_error_handler(telegram_handler.error_handler)
+    # Lanes that arrive during setup wait here instead of using a half-built application
+    async with _bot_application_lock:
+        if bot_application:
+            return bot_application
+        
+        # Create application
+        application = Application.builder().token(settings.telegram_bot_token).build()
+        
+        # Add command handlers
+        application.add_handler(CommandHandler("start", telegram_handler.start_command))
+        application.add_handler(CommandHandler("help", telegram_handler.help_command))
+        application.add_handler(CommandHandler("status", telegram_handler.status_command))
+        
+        # Structured commands that skip intent classification
+        application.add_handler(CommandHandler("tasks", telegram_handler.tasks_command))
+        application.add_handler(CommandHandler("reports", telegram_handler.reports_command))
+        application.add_handler(CommandHandler("done", telegram_handler.done_command))
+        application.add_handler(CommandHandler("report", telegram_handler.report_command))
+        application.add_handler(CommandHandler("add", telegram_handler.add_command))
+        application.add_handler(CallbackQueryHandler(telegram_handler.task_callback, pattern=f"^{DONE_CALLBACK_PREFIX}"))
+        
+        # Add message handler for natural language processing
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, telegram_handler.handle_message))
+        
+        # Shared and live locations pick the site for subsequent field reports
+        application.add_handler(MessageHandler(filters.LOCATION, telegram_handler.handle_location))
+        
+        # Photos and documents are streamed into attachment storage and linked to field reports;
+        # editing a caption must not store the file or file the report a second time
+        application.add_handler(MessageHandler(
+            (filters.PHOTO | filters.Document.ALL) & ~filters.UpdateType.EDITED_MESSAGE,
+            telegram_handler.handle_attachment
+        ))
+        
+        # Add error handler
+        application.add_error_handler(telegram_handler.error_handler)
+        
+        await application.initialize()
+        
+        # Published only after initialize() succeeds, so a failed attempt is retried by the next update
+        bot_application = application
+        
+        logging.getLogger(__name__).info("Telegram bot application initialized with handlers")
     
-    logging.getLogger(__name__).info("Telegram bot application initialized with handlers")
     return bot_application
 
 
@@ -343,9 +705,14 @@ def telegram_webhook():
     """
     Flask endpoint for receiving Telegram webhook updates.
     
-    This endpoint receives updates from Telegram and processes them
-    through the bot application. Used in production with webhook mode.
+    This endpoint receives updates from Telegram and hands them to the update
+    ingestor, which processes them on its own event loop. Used in production with
+    webhook mode. Redeliveries of an update that was already accepted are
+    acknowledged before the payload is deserialized. When the ingestor's queue is
+    full the update is refused with a 503 so that Telegram redelivers it later.
     """
+    update_id = None
+    
     try:
         # Get update data from request
         update_data = request.get_json()
@@ -353,19 +720,29 @@ def telegram_webhook():
         if not update_data:
             return jsonify({'error': 'No update data provided'}), 400
         
+        # Drop Telegram's retries of an update we already have, before any parsing work
+        update_id = update_data.get('update_id')
+        if not seen_update_store.claim(update_id):
+            return jsonify({'status': 'duplicate'})
+        
         # Create Update object
         update = Update.de_json(update_data, telegram_handler.bot)
         
         if not update:
+            seen_update_store.forget(update_id)
             return jsonify({'error': 'Invalid update data'}), 400
         
-        # Process update asynchronously
-        asyncio.create_task(process_telegram_update(update))
+        # Queue for the background consumers and return immediately
+        if not telegram_update_ingestor.submit(update):
+            logging.getLogger(__name__).warning(f"Telegram update queue full, refusing update {update.update_id}")
+            seen_update_store.forget(update_id)
+            return jsonify({'error': 'Update queue full'}), 503
         
         return jsonify({'status': 'ok'})
         
     except Exception as e:
         logging.getLogger(__name__).error(f"Webhook error: {e}")
+        seen_update_store.forget(update_id)
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -373,18 +750,42 @@ async def process_telegram_update(update: Update):
     """
     Process a Telegram update through the bot application.
     
+    Runs on the update ingestor's event loop. Errors raised by bot handlers are
+    reported through the application's error handler; anything else propagates
+    to the ingestor, which logs and counts it.
+    
     Args:
         update: Telegram Update object to process
     """
-    try:
-        # Initialize bot application if needed
-        application = await initialize_bot_application()
-        
-        # Process the update
-        await application.process_update(update)
-        
-    except Exception as e:
-        logging.getLogger(__name__).error(f"Error processing Telegram update: {e}")
+    # Initialize bot application if needed
+    application = await initialize_bot_application()
+    
+    # Process the update
+    await application.process_update(update)
+
+
+def update_lane_key(update: Update) -> int:
+    """
+    Lane an update is processed on: its chat, so one chat's messages run in order.
+    
+    Updates without a chat (e.g. inline queries) fall back to the sender, then to
+    their own update ID.
+    """
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+def start_update_ingestion() -> bool:
+    """
+    Start the background loop that processes webhook updates in this process.
+    
+    Returns:
+        True if the ingestor is running
+    """
+    return telegram_update_ingestor.start(process_telegram_update, key=update_lane_key)
 
 
 @telegram_bp.route('/set_webhook', methods=['POST'])
@@ -16,18 +16,22 @@ which this client interfaces with for complex operations.
 """
 
 import logging
+import threading
+import time
 import uuid
 from contextlib import contextmanager
-from typing import Any, Dict, List, Optional, Union, Generator
+from typing import Any, Dict, List, Optional, Tuple, Union, Generator
 from datetime import datetime, date
 
 import psycopg2
 import psycopg2.extras
+from psycopg2 import sql
 from supabase import create_client, Client
 from supabase.client import ClientOptions
 from psycopg2.extensions import connection as Connection
 
 from config.settings import settings
+from app.services.pipeline_metrics import pipeline_metrics
 
 
 class DatabaseError(Exception):
@@ -65,6 +69,10 @@ class DatabaseClient:
             options=options
         )
         
+        # Active lists per site, cached for list item additions: site_id -> (loaded_at, lists)
+        self._site_lists_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._site_lists_lock = threading.Lock()
+        
         self.logger.info("Database client initialized with Supabase connection")
     
     def check_connection(self) -> bool:
@@ -119,6 +127,7 @@ class DatabaseClient:
     # FLRTS USERS OPERATIONS
     # ==========================================
     
+    @pipeline_metrics.timed('db.get_user_by_telegram_id')
     def get_user_by_telegram_id(self, telegram_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve user information by Telegram ID for bot authentication.
@@ -132,7 +141,7 @@ class DatabaseClient:
         try:
             result = self.supabase.table('flrts_users').select(
                 'id, user_id_display, personnel_id, telegram_id, telegram_username, '
-                'user_role_flrts, is_active_flrts_user, '
+                'user_role_flrts, is_active_flrts_user, preferences_flrts, '
                 'personnel!inner(first_name, last_name, email, primary_site_id)'
             ).eq('telegram_id', telegram_id).eq('is_active_flrts_user', True).execute()
             
@@ -205,6 +214,7 @@ class DatabaseClient:
             self.logger.error(f"Error retrieving sites: {e}")
             raise DatabaseError(f"Failed to retrieve sites: {e}")
     
+    @pipeline_metrics.timed('db.get_site_by_name_or_alias')
     def get_site_by_name_or_alias(self, site_identifier: str) -> Optional[Dict[str, Any]]:
         """
         Find a site by name or alias for flexible site identification.
@@ -237,6 +247,7 @@ class DatabaseClient:
             self.logger.error(f"Error finding site by identifier {site_identifier}: {e}")
             raise DatabaseError(f"Failed to find site: {e}")
     
+    @pipeline_metrics.timed('db.get_site_by_id')
     def get_site_by_id(self, site_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a site by its ID.
@@ -265,6 +276,7 @@ class DatabaseClient:
     # FIELD REPORTS OPERATIONS
     # ==========================================
     
+    @pipeline_metrics.timed('db.create_field_report')
     def create_field_report(self, report_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a new field report with automatic ID generation.
@@ -298,6 +310,7 @@ class DatabaseClient:
             self.logger.error(f"Error creating field report: {e}")
             raise DatabaseError(f"Failed to create field report: {e}")
     
+    @pipeline_metrics.timed('db.get_field_reports_by_site')
     def get_field_reports_by_site(self, site_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Retrieve recent field reports for a specific site.
@@ -323,6 +336,36 @@ class DatabaseClient:
             self.logger.error(f"Error retrieving field reports for site {site_id}: {e}")
             raise DatabaseError(f"Failed to retrieve field reports: {e}")
     
+    def get_field_reports_for_similarity(self, since: Optional[str] = None, offset: int = 0,
+                                         limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Retrieve field report text for the similarity index, oldest first.
+        
+        Args:
+            since: Only reports submitted at or after this timestamp
+            offset: Number of reports to skip (for paging)
+            limit: Maximum number of reports to return
+            
+        Returns:
+            List of field report records including report_content_full and the site name
+        """
+        try:
+            query = self.supabase.table('field_reports').select(
+                'id, report_id_display, site_id, report_date, report_type, report_title_summary, '
+                'report_content_full, submission_timestamp, sites(site_name)'
+            )
+            
+            if since:
+                query = query.gte('submission_timestamp', since)
+            
+            result = query.order('submission_timestamp').order('id').range(offset, offset + limit - 1).execute()
+            return result.data
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving field reports for similarity index: {e}")
+            raise DatabaseError(f"Failed to retrieve field reports: {e}")
+    
+    @pipeline_metrics.timed('db.get_field_reports_by_user')
     def get_field_reports_by_user(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Retrieve recent field reports submitted by a specific user.
@@ -348,10 +391,180 @@ class DatabaseClient:
             self.logger.error(f"Error retrieving field reports by user {user_id}: {e}")
             raise DatabaseError(f"Failed to retrieve field reports: {e}")
     
+    @pipeline_metrics.timed('db.link_field_report_equipment')
+    def link_field_report_equipment(self, report_id: str, equipment_ids: List[str],
+                                    asic_ids: List[str]) -> Dict[str, int]:
+        """
+        Link a field report to equipment and ASICs in bulk.
+        
+        Each junction table receives a single multi-row insert; links that already
+        exist are ignored.
+        
+        Args:
+            report_id: UUID of the field report
+            equipment_ids: UUIDs of equipment mentioned in the report
+            asic_ids: UUIDs of ASICs mentioned in the report
+        
+        Returns:
+            Number of rows written per junction table
+        """
+        try:
+            linked = {'equipment': 0, 'asics': 0}
+            
+            if equipment_ids:
+                rows = [{'report_id': report_id, 'equipment_id': equipment_id} for equipment_id in equipment_ids]
+                result = self.supabase.table('field_reports_equipment').upsert(
+                    rows, on_conflict='report_id,equipment_id', ignore_duplicates=True
+                ).execute()
+                linked['equipment'] = len(result.data or [])
+            
+            if asic_ids:
+                rows = [{'report_id': report_id, 'asic_id': asic_id} for asic_id in asic_ids]
+                result = self.supabase.table('field_reports_asics').upsert(
+                    rows, on_conflict='report_id,asic_id', ignore_duplicates=True
+                ).execute()
+                linked['asics'] = len(result.data or [])
+            
+            self.logger.debug(
+                f"Linked report {report_id} to {linked['equipment']} equipment and {linked['asics']} ASICs"
+            )
+            return linked
+        
+        except Exception as e:
+            self.logger.error(f"Error linking equipment to field report {report_id}: {e}")
+            raise DatabaseError(f"Failed to link field report equipment: {e}")
+    
+    def create_field_report_attachment(self, attachment_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Record a field report attachment.
+        
+        Args:
+            attachment_data: field_report_attachments columns (uploaded_by_user_id, file_name,
+                size_bytes, storage_backend, optional field_report_id, ...)
+        
+        Returns:
+            Created attachment record
+        """
+        try:
+            result = self.supabase.table('field_report_attachments').insert(attachment_data).execute()
+            
+            if result.data:
+                return result.data[0]
+            
+            raise DatabaseError("Attachment creation returned no data")
+        
+        except Exception as e:
+            self.logger.error(f"Error creating field report attachment: {e}")
+            raise DatabaseError(f"Failed to create field report attachment: {e}")
+    
+    def update_field_report_attachment(self, attachment_id: str, update_data: Dict[str, Any]) -> None:
+        """
+        Update a field report attachment (storage location, thumbnail, status or report).
+        
+        Args:
+            attachment_id: UUID of the attachment
+            update_data: Columns to update
+        """
+        try:
+            self.supabase.table('field_report_attachments').update(
+                update_data, returning='minimal'
+            ).eq('id', attachment_id).execute()
+        
+        except Exception as e:
+            self.logger.error(f"Error updating field report attachment {attachment_id}: {e}")
+            raise DatabaseError(f"Failed to update field report attachment: {e}")
+    
+    def link_unassigned_attachments(self, user_id: str, report_id: str, since: str) -> int:
+        """
+        Attach a user's attachments that have no report yet to a field report.
+        
+        Args:
+            user_id: UUID of the uploading user
+            report_id: UUID of the field report
+            since: Only attachments received at or after this timestamp
+        
+        Returns:
+            Number of attachments linked
+        """
+        try:
+            result = self.supabase.table('field_report_attachments').update(
+                {'field_report_id': report_id}
+            ).eq('uploaded_by_user_id', user_id).is_('field_report_id', 'null').gte('created_at', since).execute()
+            
+            return len(result.data or [])
+        
+        except Exception as e:
+            self.logger.error(f"Error linking attachments of user {user_id} to report {report_id}: {e}")
+            raise DatabaseError(f"Failed to link field report attachments: {e}")
+    
+    def get_field_report_attachments(self, report_id: str) -> List[Dict[str, Any]]:
+        """
+        Retrieve the attachments of a field report, oldest first.
+        
+        Args:
+            report_id: UUID of the field report
+        
+        Returns:
+            List of attachment records
+        """
+        try:
+            result = self.supabase.table('field_report_attachments').select(
+                'id, field_report_id, uploaded_by_user_id, file_name, mime_type, size_bytes, sha256, '
+                'storage_backend, storage_path, thumbnail_path, status, error, created_at, stored_at'
+            ).eq('field_report_id', report_id).order('created_at').execute()
+            
+            return result.data
+        
+        except Exception as e:
+            self.logger.error(f"Error retrieving attachments for field report {report_id}: {e}")
+            raise DatabaseError(f"Failed to retrieve field report attachments: {e}")
+    
+    # ==========================================
+    # EQUIPMENT OPERATIONS
+    # ==========================================
+    
+    def get_equipment_lexicon_source(self, page_size: int = 1000) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Retrieve the identifiers used to recognise equipment and ASICs in free text.
+        
+        Retired records are excluded. Both tables are read in pages ordered by id,
+        since PostgREST caps a single response at its max-rows setting.
+        
+        Args:
+            page_size: Records requested per page (at most PostgREST's max-rows)
+        
+        Returns:
+            Dictionary with 'equipment' and 'asics' record lists
+        """
+        columns = {
+            'equipment': 'id, equipment_id_display, equipment_name, serial_number, site_location_id',
+            'asics': 'id, asic_id_display, asic_name_model, serial_number, site_location_id'
+        }
+        
+        try:
+            source = {}
+            for table, select in columns.items():
+                records = []
+                while True:
+                    result = self.supabase.table(table).select(select).or_(
+                        'status.is.null,status.neq.Retired'
+                    ).order('id').range(len(records), len(records) + page_size - 1).execute()
+                    records.extend(result.data)
+                    if len(result.data) < page_size:
+                        break
+                source[table] = records
+            
+            return source
+        
+        except Exception as e:
+            self.logger.error(f"Error retrieving equipment identifiers: {e}")
+            raise DatabaseError(f"Failed to retrieve equipment identifiers: {e}")
+    
     # ==========================================
     # TASKS OPERATIONS
     # ==========================================
     
+    @pipeline_metrics.timed('db.create_task')
     def create_task(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Create a new task with automatic ID generation.
@@ -381,6 +594,37 @@ class DatabaseClient:
             self.logger.error(f"Error creating task: {e}")
             raise DatabaseError(f"Failed to create task: {e}")
     
+    @pipeline_metrics.timed('db.create_reminder')
+    def create_reminder(self, reminder_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create a new reminder with automatic ID generation.
+        
+        Args:
+            reminder_data: Reminder information
+            
+        Returns:
+            Created reminder record
+        """
+        try:
+            # Generate reminder ID display if not provided
+            if 'reminder_id_display' not in reminder_data:
+                today = datetime.now().strftime('%Y%m%d')
+                reminder_data['reminder_id_display'] = f"REM-{today}-{str(uuid.uuid4())[:8].upper()}"
+            
+            result = self.supabase.table('reminders').insert(reminder_data).execute()
+            
+            if result.data:
+                reminder = result.data[0]
+                self.logger.info(f"Created reminder: {reminder['reminder_id_display']}")
+                return reminder
+            
+            raise DatabaseError("Reminder creation returned no data")
+            
+        except Exception as e:
+            self.logger.error(f"Error creating reminder: {e}")
+            raise DatabaseError(f"Failed to create reminder: {e}")
+    
+    @pipeline_metrics.timed('db.get_tasks_for_user')
     def get_tasks_for_user(self, user_id: str, status_filter: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Retrieve tasks assigned to a specific user.
@@ -411,10 +655,133 @@ class DatabaseClient:
             self.logger.error(f"Error retrieving tasks for user {user_id}: {e}")
             raise DatabaseError(f"Failed to retrieve tasks: {e}")
     
+    @pipeline_metrics.timed('db.find_task_candidates')
+    def find_task_candidates(self, user_id: str, reference: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find a user's open tasks matching a task ID or (partial, fuzzy) title.
+        
+        Filtering and similarity scoring run in the database (match_user_tasks uses
+        the trigram index on task_title), so only the best candidates are returned.
+        
+        Args:
+            user_id: UUID of the assigned user
+            reference: Task ID display or part of the task title
+            limit: Maximum number of candidates to return
+            
+        Returns:
+            Candidate tasks with match_score and exact_id_match, best first
+        """
+        try:
+            result = self.supabase.rpc('match_user_tasks', {
+                'p_user_id': user_id,
+                'p_reference': reference,
+                'p_limit': limit
+            }).execute()
+            
+            self.logger.debug(f"Found {len(result.data)} task candidates for '{reference}'")
+            return result.data
+            
+        except Exception as e:
+            self.logger.error(f"Error matching task reference '{reference}' for user {user_id}: {e}")
+            raise DatabaseError(f"Failed to match task reference: {e}")
+    
+    @pipeline_metrics.timed('db.create_task_with_outbox')
+    def create_task_with_outbox(self, task_data: Dict[str, Any], operation: str,
+                                payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create a task and its Todoist outbox entry in a single transaction.
+        
+        Either both rows are committed or neither is, so a task can never be
+        stored without its pending Todoist write (or vice versa).
+        
+        Args:
+            task_data: Task information
+            operation: Outbox operation, e.g. 'create_task'
+            payload: Operation payload for the outbox dispatcher
+            
+        Returns:
+            Created task record
+        """
+        try:
+            # Generate task ID display if not provided
+            if 'task_id_display' not in task_data:
+                today = datetime.now().strftime('%Y%m%d')
+                task_data['task_id_display'] = f"TASK-{today}-{str(uuid.uuid4())[:8].upper()}"
+            
+            columns = list(task_data.keys())
+            insert_task = sql.SQL("INSERT INTO tasks ({}) VALUES ({}) RETURNING *").format(
+                sql.SQL(', ').join(map(sql.Identifier, columns)),
+                sql.SQL(', ').join(sql.Placeholder() * len(columns))
+            )
+            
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(insert_task, [task_data[column] for column in columns])
+                    task = dict(cursor.fetchone())
+                    cursor.execute(
+                        "INSERT INTO todoist_outbox (operation, task_id, payload) VALUES (%s, %s, %s)",
+                        (operation, task['id'], psycopg2.extras.Json(payload))
+                    )
+                    conn.commit()
+            
+            self.logger.info(f"Created task with Todoist outbox entry: {task['task_id_display']}")
+            return task
+            
+        except Exception as e:
+            self.logger.error(f"Error creating task with outbox entry: {e}")
+            raise DatabaseError(f"Failed to create task: {e}")
+    
+    @pipeline_metrics.timed('db.update_task_status')
+    def update_task_status(self, task_id: str, update_data: Dict[str, Any],
+                           outbox_operation: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Update a task and optionally enqueue a Todoist write in the same transaction.
+        
+        Args:
+            task_id: UUID of the task
+            update_data: Columns to update (status, completion_date, ...)
+            outbox_operation: Optional outbox operation to enqueue, e.g. 'complete_task'
+            
+        Returns:
+            Updated task record, or None if the task does not exist
+        """
+        try:
+            if not outbox_operation:
+                result = self.supabase.table('tasks').update(update_data).eq('id', task_id).execute()
+                return result.data[0] if result.data else None
+            
+            columns = list(update_data.keys())
+            update_task = sql.SQL("UPDATE tasks SET {} WHERE id = %s RETURNING *").format(
+                sql.SQL(', ').join(
+                    sql.SQL("{} = %s").format(sql.Identifier(column)) for column in columns
+                )
+            )
+            
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(update_task, [update_data[column] for column in columns] + [task_id])
+                    task = cursor.fetchone()
+                    if task is None:
+                        conn.rollback()
+                        return None
+                    cursor.execute(
+                        "INSERT INTO todoist_outbox (operation, task_id) VALUES (%s, %s)",
+                        (outbox_operation, task_id)
+                    )
+                    conn.commit()
+            
+            self.logger.info(f"Updated task {task_id} and enqueued Todoist {outbox_operation}")
+            return dict(task)
+            
+        except Exception as e:
+            self.logger.error(f"Error updating task {task_id}: {e}")
+            raise DatabaseError(f"Failed to update task: {e}")
+    
     # ==========================================
     # LISTS AND LIST ITEMS OPERATIONS
     # ==========================================
     
+    @pipeline_metrics.timed('db.get_lists_by_site')
     def get_lists_by_site(self, site_id: str, list_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Retrieve lists for a specific site, optionally filtered by type.
@@ -441,6 +808,7 @@ class DatabaseClient:
             self.logger.error(f"Error retrieving lists for site {site_id}: {e}")
             raise DatabaseError(f"Failed to retrieve lists: {e}")
     
+    @pipeline_metrics.timed('db.add_list_item')
     def add_list_item(self, list_id: str, item_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Add a new item to an existing list.
@@ -474,6 +842,604 @@ class DatabaseClient:
             self.logger.error(f"Error adding item to list {list_id}: {e}")
             raise DatabaseError(f"Failed to add list item: {e}")
     
+    @pipeline_metrics.timed('db.get_site_lists')
+    def get_site_lists(self, site_id: str) -> List[Dict[str, Any]]:
+        """
+        Return a site's active lists, cached for settings.list_cache_ttl_seconds.
+        
+        Args:
+            site_id: UUID of the site
+            
+        Returns:
+            List of list records
+        """
+        now = time.monotonic()
+        with self._site_lists_lock:
+            cached = self._site_lists_cache.get(site_id)
+        if cached and now - cached[0] < settings.list_cache_ttl_seconds:
+            return cached[1]
+        
+        lists = self.get_lists_by_site(site_id)
+        with self._site_lists_lock:
+            self._site_lists_cache[site_id] = (now, lists)
+        return lists
+    
+    @pipeline_metrics.timed('db.add_list_items')
+    def add_list_items(self, list_id: str, item_names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Append several items to a list in one statement.
+        
+        The items get consecutive item_order values after the list's current last
+        item. The parent list row is locked for the transaction so concurrent
+        additions to the same list cannot be given the same positions.
+        
+        Args:
+            list_id: UUID of the parent list
+            item_names: Item texts, in the order they should appear
+            
+        Returns:
+            Created list item records (id, list_item_id_display, item_name_primary_text, item_order)
+        """
+        if not item_names:
+            return []
+        
+        today = datetime.now().strftime('%Y%m%d')
+        displays = [f"LI-{today}-{str(uuid.uuid4())[:8].upper()}" for _ in item_names]
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT id FROM lists WHERE id = %s FOR UPDATE", (list_id,))
+                    if cursor.fetchone() is None:
+                        raise DatabaseError(f"List {list_id} does not exist")
+                    
+                    cursor.execute(
+                        """
+                        INSERT INTO list_items (list_item_id_display, parent_list_id, item_name_primary_text, item_order)
+                        SELECT item.display, %(list_id)s, item.name, last.item_order + item.position
+                        FROM unnest(%(displays)s::text[], %(names)s::text[]) WITH ORDINALITY AS item(display, name, position)
+                        CROSS JOIN (
+                            SELECT COALESCE(MAX(item_order), 0) AS item_order
+                            FROM list_items WHERE parent_list_id = %(list_id)s
+                        ) AS last
+                        ORDER BY item.position
+                        RETURNING id, list_item_id_display, item_name_primary_text, item_order
+                        """,
+                        {'list_id': list_id, 'displays': displays, 'names': [name[:255] for name in item_names]}
+                    )
+                    items = [dict(row) for row in cursor.fetchall()]
+                    conn.commit()
+            
+            self.logger.info(f"Added {len(items)} items to list {list_id}")
+            return sorted(items, key=lambda item: item['item_order'])
+            
+        except Exception as e:
+            self.logger.error(f"Error adding items to list {list_id}: {e}")
+            raise DatabaseError(f"Failed to add list items: {e}")
+    
+    # ==========================================
+    # TODOIST OUTBOX OPERATIONS
+    # ==========================================
+    
+    def claim_todoist_outbox(self, worker_id: str, limit: int, lock_timeout_seconds: float) -> List[Dict[str, Any]]:
+        """
+        Claim due outbox rows for dispatch.
+        
+        Rows are locked with FOR UPDATE SKIP LOCKED so several workers can drain the
+        outbox concurrently without claiming the same row. Rows left in Processing by
+        a crashed worker are reclaimed once their lock times out.
+        
+        Args:
+            worker_id: Identifier of the claiming worker
+            limit: Maximum number of rows to claim
+            lock_timeout_seconds: Age after which a Processing row is reclaimed
+            
+        Returns:
+            Claimed rows with the task's current todoist_task_id and whether a
+            create for the same task is still undelivered
+        """
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        UPDATE todoist_outbox o
+                        SET status = 'Processing', locked_at = NOW(), locked_by = %s,
+                            attempts = o.attempts + 1
+                        FROM (
+                            SELECT id FROM todoist_outbox
+                            WHERE (status = 'Pending' AND next_attempt_at <= NOW())
+                               OR (status = 'Processing' AND locked_at < NOW() - make_interval(secs => %s))
+                            ORDER BY id
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        ) due
+                        WHERE o.id = due.id
+                        RETURNING o.id, o.operation, o.task_id, o.payload, o.command_uuid, o.attempts,
+                            (SELECT t.todoist_task_id FROM tasks t WHERE t.id = o.task_id) AS todoist_task_id,
+                            EXISTS (
+                                SELECT 1 FROM todoist_outbox c
+                                WHERE c.task_id = o.task_id AND c.operation = 'create_task'
+                                  AND c.status IN ('Pending', 'Processing') AND c.id < o.id
+                            ) AS create_pending
+                        """,
+                        (worker_id, lock_timeout_seconds, limit)
+                    )
+                    rows = [dict(row) for row in cursor.fetchall()]
+                    conn.commit()
+            
+            rows.sort(key=lambda row: row['id'])
+            return rows
+            
+        except Exception as e:
+            self.logger.error(f"Error claiming Todoist outbox rows: {e}")
+            raise DatabaseError(f"Failed to claim outbox rows: {e}")
+    
+    def finish_todoist_outbox(self, done: List[int], retry: List[Tuple[int, float, Optional[str], bool]],
+                              dead: List[Tuple[int, str]], todoist_ids: Dict[str, str]) -> None:
+        """
+        Record the outcome of a dispatch batch in one transaction.
+        
+        Args:
+            done: Outbox row IDs that were delivered
+            retry: (row ID, delay seconds, error, count_attempt) for rows to try again;
+                rows deferred behind an undelivered create do not use up an attempt
+            dead: (row ID, error) for rows that exhausted their attempts
+            todoist_ids: Task UUID -> Todoist ID for tasks created in Todoist
+        """
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    if todoist_ids:
+                        psycopg2.extras.execute_values(
+                            cursor,
+                            "UPDATE tasks t SET todoist_task_id = v.todoist_id, updated_at = NOW() "
+                            "FROM (VALUES %s) AS v(id, todoist_id) WHERE t.id = v.id::uuid",
+                            list(todoist_ids.items())
+                        )
+                    
+                    if done:
+                        cursor.execute(
+                            "UPDATE todoist_outbox SET status = 'Done', processed_at = NOW(), "
+                            "locked_at = NULL, locked_by = NULL, last_error = NULL WHERE id = ANY(%s)",
+                            (done,)
+                        )
+                    
+                    if retry:
+                        psycopg2.extras.execute_values(
+                            cursor,
+                            "UPDATE todoist_outbox o SET status = 'Pending', locked_at = NULL, locked_by = NULL, "
+                            "next_attempt_at = NOW() + make_interval(secs => v.delay::float8), "
+                            "last_error = COALESCE(v.error, o.last_error), "
+                            "attempts = CASE WHEN v.count_attempt THEN o.attempts ELSE o.attempts - 1 END "
+                            "FROM (VALUES %s) AS v(id, delay, error, count_attempt) WHERE o.id = v.id",
+                            retry
+                        )
+                    
+                    if dead:
+                        psycopg2.extras.execute_values(
+                            cursor,
+                            "UPDATE todoist_outbox o SET status = 'Dead', processed_at = NOW(), "
+                            "locked_at = NULL, locked_by = NULL, last_error = v.error "
+                            "FROM (VALUES %s) AS v(id, error) WHERE o.id = v.id",
+                            dead
+                        )
+                    
+                    conn.commit()
+            
+        except Exception as e:
+            self.logger.error(f"Error recording Todoist outbox results: {e}")
+            raise DatabaseError(f"Failed to record outbox results: {e}")
+    
+    # ==========================================
+    # REMINDER OPERATIONS
+    # ==========================================
+    
+    def get_scheduled_reminders(self, end: datetime, start: Optional[datetime] = None, limit: int = 500,
+                                after: Optional[Tuple[datetime, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Load Scheduled Telegram reminders due in a time range, earliest first.
+        
+        The range is read from idx_reminders_datetime, so the cost depends on the
+        number of reminders in the window rather than the size of the table.
+        
+        Args:
+            end: Exclusive upper bound on reminder_date_time
+            start: Inclusive lower bound (None for no lower bound)
+            limit: Maximum number of rows
+            after: (reminder_date_time, id) of the last row of the previous page
+        
+        Returns:
+            Reminder rows with the recipient's telegram_id and timezone
+        """
+        conditions = ["r.status = 'Scheduled'", "r.reminder_date_time < %(end)s",
+                      "(r.notification_channels IS NULL OR 'Telegram' = ANY(r.notification_channels))"]
+        params: Dict[str, Any] = {'end': end, 'limit': limit}
+        if start is not None:
+            conditions.append("r.reminder_date_time >= %(start)s")
+            params['start'] = start
+        if after is not None:
+            conditions.append("(r.reminder_date_time, r.id) > (%(after_time)s, %(after_id)s::uuid)")
+            params.update({'after_time': after[0], 'after_id': after[1]})
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT r.id::text AS id, r.reminder_id_display, r.reminder_title, r.reminder_date_time, "
+                        "r.is_recurring, r.recurrence_rule, r.user_to_remind_id::text AS user_to_remind_id, "
+                        "r.related_task_id::text AS related_task_id, "
+                        "r.related_field_report_id::text AS related_field_report_id, "
+                        "u.telegram_id, u.preferences_flrts->>'timezone' AS timezone "
+                        "FROM reminders r JOIN flrts_users u ON u.id = r.user_to_remind_id "
+                        f"WHERE {' AND '.join(conditions)} "
+                        "ORDER BY r.reminder_date_time, r.id LIMIT %(limit)s",
+                        params
+                    )
+                    return [dict(row) for row in cursor.fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Error loading scheduled reminders: {e}")
+            raise DatabaseError(f"Failed to load reminders: {e}")
+    
+    def claim_reminders(self, claims: List[Tuple[str, datetime, Optional[datetime]]]) -> List[str]:
+        """
+        Atomically take due reminders for delivery.
+        
+        A reminder is only claimed if it is still Scheduled for the time it was
+        loaded with, so two workers can never both deliver the same occurrence.
+        One-off reminders become Sent; recurring ones move to their next occurrence
+        and stay Scheduled.
+        
+        Args:
+            claims: (reminder ID, loaded reminder_date_time, next occurrence or None)
+        
+        Returns:
+            IDs of the reminders claimed by this call
+        """
+        if not claims:
+            return []
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    rows = psycopg2.extras.execute_values(
+                        cursor,
+                        "UPDATE reminders r SET "
+                        "status = CASE WHEN v.next_time IS NULL THEN 'Sent' ELSE 'Scheduled' END, "
+                        "reminder_date_time = COALESCE(v.next_time, r.reminder_date_time), updated_at = NOW() "
+                        "FROM (VALUES %s) AS v(id, due_time, next_time) "
+                        "WHERE r.id = v.id AND r.status = 'Scheduled' AND r.reminder_date_time = v.due_time "
+                        "RETURNING r.id::text AS id",
+                        claims,
+                        template="(%s::uuid, %s::timestamptz, %s::timestamptz)",
+                        fetch=True
+                    )
+                    conn.commit()
+                    return [row['id'] for row in rows]
+        
+        except Exception as e:
+            self.logger.error(f"Error claiming {len(claims)} reminders: {e}")
+            raise DatabaseError(f"Failed to claim reminders: {e}")
+    
+    def set_reminders_status(self, reminder_ids: List[str], status: str) -> None:
+        """
+        Set the status of several reminders in one statement.
+        
+        Args:
+            reminder_ids: Reminder UUIDs
+            status: New status ('Sent', 'Error', ...)
+        """
+        if not reminder_ids:
+            return
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE reminders SET status = %s, updated_at = NOW() WHERE id = ANY(%s::uuid[])",
+                        (status, reminder_ids)
+                    )
+                    conn.commit()
+        
+        except Exception as e:
+            self.logger.error(f"Error updating {len(reminder_ids)} reminders to {status}: {e}")
+            raise DatabaseError(f"Failed to update reminders: {e}")
+    
+    # ==========================================
+    # DIGEST OPERATIONS
+    # ==========================================
+    
+    def get_digest_recipients(self, preference: str, limit: int = 500,
+                              after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Load a page of active users who can receive Telegram digests.
+        
+        Users opt out of a digest by setting its preference key to false in
+        preferences_flrts.
+        
+        Args:
+            preference: preferences_flrts key of the digest, e.g. 'daily_digest'
+            limit: Maximum number of users
+            after: ID of the last user of the previous page
+        
+        Returns:
+            User rows (id, telegram_id, timezone), ordered by ID
+        """
+        conditions = ["u.is_active_flrts_user", "u.telegram_id ~ '^-?[0-9]+$'",
+                      "COALESCE(u.preferences_flrts->>%(preference)s, 'true') <> 'false'"]
+        params: Dict[str, Any] = {'preference': preference, 'limit': limit}
+        if after is not None:
+            conditions.append("u.id > %(after)s::uuid")
+            params['after'] = after
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT u.id::text AS id, u.telegram_id, u.preferences_flrts->>'timezone' AS timezone "
+                        f"FROM flrts_users u WHERE {' AND '.join(conditions)} "
+                        "ORDER BY u.id LIMIT %(limit)s",
+                        params
+                    )
+                    return [dict(row) for row in cursor.fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Error loading digest recipients: {e}")
+            raise DatabaseError(f"Failed to load digest recipients: {e}")
+    
+    def get_digest_tasks(self, user_ids: List[str], due_before: date) -> List[Dict[str, Any]]:
+        """
+        Load the digest tasks of many users in one query.
+        
+        Args:
+            user_ids: flrts_users IDs
+            due_before: Exclusive upper bound on due_date for open tasks
+        
+        Returns:
+            Open tasks due before the bound plus all Blocked tasks, with user_id and
+            site_name, ordered by user and due date
+        """
+        if not user_ids:
+            return []
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT t.assigned_to_user_id::text AS user_id, t.id::text AS id, t.task_id_display, "
+                        "t.task_title, t.due_date, t.priority, t.status, s.site_name "
+                        "FROM tasks t LEFT JOIN sites s ON s.id = t.site_id "
+                        "WHERE t.assigned_to_user_id = ANY(%s::uuid[]) "
+                        "AND (t.status = 'Blocked' OR (t.status IN ('To Do', 'In Progress') AND t.due_date < %s)) "
+                        "ORDER BY t.assigned_to_user_id, t.due_date NULLS LAST, t.task_id_display",
+                        (user_ids, due_before)
+                    )
+                    return [dict(row) for row in cursor.fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Error loading digest tasks for {len(user_ids)} users: {e}")
+            raise DatabaseError(f"Failed to load digest tasks: {e}")
+    
+    def get_digest_reports(self, user_ids: List[str], since: datetime, per_user: int = 10) -> List[Dict[str, Any]]:
+        """
+        Load recent field reports at each user's sites in one query.
+        
+        A user's sites are those of their open tasks and those they reported from
+        during the period.
+        
+        Args:
+            user_ids: flrts_users IDs
+            since: Earliest submission_timestamp
+            per_user: Maximum reports per user (most recent first)
+        
+        Returns:
+            Report rows with user_id and site_name, ordered by user, newest first
+        """
+        if not user_ids:
+            return []
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        WITH user_sites AS (
+                            SELECT assigned_to_user_id AS user_id, site_id FROM tasks
+                            WHERE assigned_to_user_id = ANY(%(ids)s::uuid[]) AND site_id IS NOT NULL
+                              AND status IN ('To Do', 'In Progress', 'Blocked')
+                            UNION
+                            SELECT submitted_by_user_id, site_id FROM field_reports
+                            WHERE submitted_by_user_id = ANY(%(ids)s::uuid[]) AND submission_timestamp >= %(since)s
+                        ), ranked AS (
+                            SELECT us.user_id, fr.id, fr.report_id_display, fr.report_title_summary, fr.report_type,
+                                   fr.submission_timestamp, s.site_name,
+                                   ROW_NUMBER() OVER (PARTITION BY us.user_id ORDER BY fr.submission_timestamp DESC) AS rank
+                            FROM user_sites us
+                            JOIN field_reports fr ON fr.site_id = us.site_id
+                            JOIN sites s ON s.id = fr.site_id
+                            WHERE fr.submission_timestamp >= %(since)s AND fr.report_status <> 'Draft'
+                        )
+                        SELECT user_id::text AS user_id, id::text AS id, report_id_display, report_title_summary,
+                               report_type, submission_timestamp, site_name
+                        FROM ranked WHERE rank <= %(per_user)s
+                        ORDER BY user_id, submission_timestamp DESC
+                        """,
+                        {'ids': user_ids, 'since': since, 'per_user': per_user}
+                    )
+                    return [dict(row) for row in cursor.fetchall()]
+        
+        except Exception as e:
+            self.logger.error(f"Error loading digest reports for {len(user_ids)} users: {e}")
+            raise DatabaseError(f"Failed to load digest reports: {e}")
+
+    # ==========================================
+    # JOB SCHEDULER OPERATIONS
+    # ==========================================
+    
+    @contextmanager
+    def advisory_lock(self, namespace: int, key: int) -> Generator[bool, None, None]:
+        """
+        Hold a session-level PostgreSQL advisory lock for the duration of a block.
+        
+        The lock is tried, not waited for, and is released when the block exits
+        (or when the connection drops, e.g. if the worker dies).
+        
+        Args:
+            namespace: First int4 of the lock key, identifying the kind of lock
+            key: Second int4 of the lock key
+        
+        Yields:
+            True if this session holds the lock
+        """
+        with self.get_postgres_connection() as conn:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s, %s) AS locked", (namespace, key))
+                locked = cursor.fetchone()['locked']
+                try:
+                    yield locked
+                finally:
+                    if locked:
+                        cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (namespace, key))
+    
+    def start_job_run(self, job_name: str, scheduled_for: datetime, worker_id: str) -> Optional[int]:
+        """
+        Record the start of a job run for a schedule slot.
+        
+        Args:
+            job_name: Name of the job
+            scheduled_for: Nominal schedule slot being run
+            worker_id: host:pid of the running worker
+        
+        Returns:
+            job_runs.id, or None if the slot has already been run
+        """
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "INSERT INTO job_runs (job_name, scheduled_for, worker_id) VALUES (%s, %s, %s) "
+                        "ON CONFLICT (job_name, scheduled_for) DO NOTHING RETURNING id",
+                        (job_name, scheduled_for, worker_id)
+                    )
+                    row = cursor.fetchone()
+                    conn.commit()
+                    return row['id'] if row else None
+        
+        except Exception as e:
+            self.logger.error(f"Error recording start of job {job_name}: {e}")
+            raise DatabaseError(f"Failed to start job run: {e}")
+    
+    def finish_job_run(self, run_id: int, status: str, duration_ms: int,
+                       result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """
+        Record the outcome of a job run.
+        
+        Args:
+            run_id: job_runs.id returned by start_job_run
+            status: 'Succeeded' or 'Failed'
+            duration_ms: Run time in milliseconds
+            result: JSON-serialisable summary returned by the job
+            error: Error message for failed runs
+        """
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE job_runs SET status = %s, finished_at = NOW(), duration_ms = %s, "
+                        "result = %s, error = %s WHERE id = %s",
+                        (status, duration_ms, psycopg2.extras.Json(result) if result is not None else None,
+                         error, run_id)
+                    )
+                    conn.commit()
+        
+        except Exception as e:
+            self.logger.error(f"Error recording outcome of job run {run_id}: {e}")
+            raise DatabaseError(f"Failed to finish job run: {e}")
+    
+    def get_last_job_slots(self, job_names: List[str]) -> Dict[str, datetime]:
+        """
+        Latest schedule slot run for each job.
+        
+        Args:
+            job_names: Jobs to look up
+        
+        Returns:
+            Job name -> latest scheduled_for (jobs that never ran are omitted)
+        """
+        if not job_names:
+            return {}
+        
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT job_name, MAX(scheduled_for) AS scheduled_for FROM job_runs "
+                        "WHERE job_name = ANY(%s) GROUP BY job_name",
+                        (job_names,)
+                    )
+                    return {row['job_name']: row['scheduled_for'] for row in cursor.fetchall()}
+        
+        except Exception as e:
+            self.logger.error(f"Error loading job run history: {e}")
+            raise DatabaseError(f"Failed to load job runs: {e}")
+    
+    # ==========================================
+    # NOTIFICATION LOG OPERATIONS
+    # ==========================================
+    
+    def log_notifications(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Insert several notifications_log rows in a single request.
+        
+        Args:
+            records: notifications_log rows (timestamp_sent, recipient_user_id, channel,
+                notification_type, message_content, status, ...)
+            
+        Returns:
+            Number of rows written
+        """
+        if not records:
+            return 0
+        
+        try:
+            self.supabase.table('notifications_log').insert(records, returning='minimal').execute()
+            return len(records)
+            
+        except Exception as e:
+            self.logger.error(f"Error writing {len(records)} notification log rows: {e}")
+            raise DatabaseError(f"Failed to write notification log: {e}") from e
+    
+    def get_recent_notifications(self, user_id: str, limit: int = 20,
+                                 notification_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Retrieve the most recent notifications sent to a user.
+        
+        Args:
+            user_id: UUID of the recipient
+            limit: Maximum number of notifications
+            notification_type: Optional notification_type to filter by
+        
+        Returns:
+            notifications_log rows, newest first
+        """
+        try:
+            query = self.supabase.table('notifications_log').select(
+                'id, timestamp_sent, recipient_user_id, channel, notification_type, subject_or_title, '
+                'message_content, status, related_task_id, related_field_report_id'
+            ).eq('recipient_user_id', user_id)
+            
+            if notification_type:
+                query = query.eq('notification_type', notification_type)
+            
+            result = query.order('timestamp_sent', desc=True).limit(limit).execute()
+            return result.data
+        
+        except Exception as e:
+            self.logger.error(f"Error retrieving notifications for user {user_id}: {e}")
+            raise DatabaseError(f"Failed to retrieve notifications: {e}")
+
     # ==========================================
     # BUSINESS LOGIC FUNCTIONS
     # ==========================================
@@ -501,6 +1467,27 @@ class DatabaseClient:
             self.logger.error(f"Error executing markup calculation for invoice {invoice_id}: {e}")
             raise DatabaseError(f"Failed to calculate markup: {e}")
     
+    def recalculate_all_markups(self) -> int:
+        """
+        Recalculate markups and partner billings for every open vendor invoice.
+        
+        Returns:
+            Number of invoices recalculated
+        """
+        try:
+            with self.get_postgres_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT recalculate_all_markups() AS updated")
+                    updated = cursor.fetchone()['updated']
+                    conn.commit()
+            
+            self.logger.info(f"Recalculated markups for {updated} invoices")
+            return updated
+            
+        except Exception as e:
+            self.logger.error(f"Error recalculating markups: {e}")
+            raise DatabaseError(f"Failed to recalculate markups: {e}")
+    
     def get_financial_summary_for_site(self, site_id: str) -> Dict[str, Any]:
         """
         Get financial summary for a site using the database business logic function.
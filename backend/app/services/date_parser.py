@@ -0,0 +1,493 @@
+"""
+10NetZero-FLRTS Natural Language Date/Time Parser
+
+This module parses the date, time and recurrence expressions that technicians use when
+creating tasks and reminders ("tomorrow at 2pm", "next friday", "in 3 days",
+"every monday at 9am") without calling out to Todoist's Quick Add.
+
+Parsing is done locally with precompiled regular expressions in the user's timezone,
+so task creation no longer waits on an external HTTP round trip. The parser returns
+the cleaned task title alongside the due date, due datetime and an RFC 5545 style
+recurrence rule (as stored in reminders.recurrence_rule).
+"""
+
+import logging
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil.relativedelta import relativedelta
+
+from config.settings import settings
+
+
+WEEKDAYS = {
+    'monday': 0, 'mon': 0,
+    'tuesday': 1, 'tue': 1, 'tues': 1,
+    'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3,
+    'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5,
+    'sunday': 6, 'sun': 6
+}
+
+RRULE_DAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+MONTHS = {
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4, 'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8, 'september': 9, 'sep': 9, 'sept': 9,
+    'october': 10, 'oct': 10, 'november': 11, 'nov': 11, 'december': 12, 'dec': 12
+}
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'other': 2
+}
+
+# Times of day used when a period is named without a clock time
+PERIOD_TIMES = {
+    'morning': time(9, 0),
+    'noon': time(12, 0),
+    'midday': time(12, 0),
+    'afternoon': time(14, 0),
+    'evening': time(18, 0),
+    'tonight': time(20, 0),
+    'midnight': time(23, 59),
+    'eod': time(17, 0),
+    'end of day': time(17, 0)
+}
+
+_WEEKDAY_FULL = r'monday|tuesday|wednesday|thursday|friday|saturday|sunday'
+_WEEKDAY_ANY = r'monday|mon|tuesday|tues|tue|wednesday|wed|thursday|thurs|thur|thu|friday|fri|saturday|sat|sunday|sun'
+_MONTH = r'january|february|march|april|may|june|july|august|september|october|november|december|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec'
+_NUMBER = r'\d+|an?|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve'
+_LEAD = r'(?:(?:on|by|due|before|for|starting)\s+)?'
+
+RECURRENCE_WEEKDAYS_PATTERN = re.compile(
+    rf'\b(?:every|each)\s+((?:{_WEEKDAY_ANY})s?(?:\s*(?:,|and|&)\s*(?:{_WEEKDAY_ANY})s?)*)\b',
+    re.IGNORECASE
+)
+RECURRENCE_INTERVAL_PATTERN = re.compile(
+    rf'\b(?:every|each)\s+(?:(other|{_NUMBER})\s+)?(weekday|day|week|month|year)s?\b',
+    re.IGNORECASE
+)
+# "daily" only repeats when nothing it could describe follows it: "check pumps daily",
+# "daily at 9" and "weekly on monday" repeat, "update daily log" does not
+RECURRENCE_WORD_PATTERN = re.compile(
+    rf'\b(daily|weekly|monthly|yearly|annually|weekdays)\b(?=\s*(?:$|[,.;:!?)]|@|\d|'
+    rf'(?:at|on|from|starting|until|till|by|before|after|around|in|every|each|{_WEEKDAY_ANY}|'
+    rf'morning|afternoon|evening|tonight|noon|midnight)\b))',
+    re.IGNORECASE
+)
+OFFSET_PATTERN = re.compile(
+    rf'\bin\s+(half\s+an?|{_NUMBER})\s+(minute|min|hour|hr|day|week|month)s?\b',
+    re.IGNORECASE
+)
+ISO_DATE_PATTERN = re.compile(rf'\b{_LEAD}(\d{{4}})-(\d{{1,2}})-(\d{{1,2}})\b', re.IGNORECASE)
+# A bare N/M is usually a fraction ("3/4 inch pipe", "1/2 hp motor"), so slash dates need a
+# lead word or a year, and never count when a size unit or part name follows them
+_SIZE_FOLLOWS = (
+    r'(?!\s*(?:["\'\u2033]|(?:in|inch|inches|ft|foot|feet|mm|cm|hp|npt|amps?|gauge|ga|of|'
+    r'pipe|pipes|bolts?|nuts?|screws?|fittings?|hose|drill|bit|socket|wrench|tube|tubing)\b))'
+)
+SLASH_DATE_PATTERN = re.compile(
+    r'\b(?P<lead>(?:on|by|due|before|for|starting)\s+)?(\d{1,2})/(\d{1,2})(?:/(?P<year>\d{2,4}))?\b'
+    r'(?(lead)|(?(year)|(?!)))' + _SIZE_FOLLOWS,
+    re.IGNORECASE
+)
+MONTH_DAY_PATTERN = re.compile(
+    rf'\b{_LEAD}({_MONTH})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?\b',
+    re.IGNORECASE
+)
+DAY_MONTH_PATTERN = re.compile(
+    rf'\b{_LEAD}(?:the\s+)?(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({_MONTH})(?:,?\s+(\d{{4}}))?\b',
+    re.IGNORECASE
+)
+RELATIVE_DAY_PATTERN = re.compile(
+    r'\b(?:(?:by|for|due)\s+)?(day\s+after\s+tomorrow|today|tonight|tomorrow|tmrw|tmr)\b',
+    re.IGNORECASE
+)
+PERIOD_PATTERN = re.compile(
+    r'\b(?:(?:by|before)\s+)?(?:(next|this)\s+(week|month|weekend)|'
+    r'(?:the\s+)?end\s+of\s+(?:the\s+)?(week|month)|(eow|eom))\b',
+    re.IGNORECASE
+)
+WEEKDAY_PATTERN = re.compile(
+    rf'\b(?:(next|this|on|by|due|before)\s+({_WEEKDAY_ANY})|(?<!about )(?<!the )(?<!last )(?<!of )({_WEEKDAY_FULL}))\b',
+    re.IGNORECASE
+)
+CLOCK_PATTERN = re.compile(
+    r'(?:\b(?:at|by|before|around)\s+|@\s*|\b)(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)(?=\W|$)',
+    re.IGNORECASE
+)
+CLOCK_24H_PATTERN = re.compile(r'(?:\b(?:at|by|before|around)\s+|@\s*|\b)([01]?\d|2[0-3]):([0-5]\d)\b', re.IGNORECASE)
+BARE_HOUR_PATTERN = re.compile(r'(?:\bat\s+|@\s*)(\d{1,2})\b(?![/:\-%.]\d)', re.IGNORECASE)
+PERIOD_TIME_PATTERN = re.compile(
+    r'\b(?:(?:in\s+the|this|at|by|before)\s+)?(morning|afternoon|evening|noon|midday|midnight|eod|end\s+of\s+(?:the\s+)?day)\b',
+    re.IGNORECASE
+)
+COMMAND_PREFIX_PATTERN = re.compile(
+    r'^\s*(?:please\s+)?(?:'
+    r'remind\s+me\s+(?:to\s+|about\s+|that\s+)?|'
+    r'(?:create|add|make|new|set)\s+(?:a\s+|an\s+)?(?:new\s+)?(?:task|reminder|todo|to-do)\s*(?:to\s+|for\s+|:\s*|-\s*)?|'
+    r'(?:task|todo|to-do|reminder)\s*:\s*|'
+    r'schedule\s+'
+    r')',
+    re.IGNORECASE
+)
+DANGLING_WORDS_PATTERN = re.compile(r'(?:\s+(?:at|on|by|due|in|for|from|and|starting|every))+\s*$', re.IGNORECASE)
+
+
+class DateParser:
+    """
+    Parses natural language date, time and recurrence expressions.
+    
+    Weekday semantics follow Todoist: "friday" and "this friday" mean the coming
+    Friday (never today for a bare weekday name), "next friday" means the Friday of
+    next calendar week, and "next week" means next Monday. Dates without a year roll
+    over to next year once they have passed. Slash dates are read month first (6/12
+    is June 12th) and need a lead word ("by 6/12") or a year, so part sizes like
+    "3/4 inch" stay in the title. "at 3" without am/pm is read as a working-hours
+    time (3pm). "in half a day" is twelve hours from now, half a week three days and
+    half a month fifteen days.
+    """
+    
+    def __init__(self, default_timezone: Optional[str] = None):
+        """
+        Initialize the parser.
+        
+        Args:
+            default_timezone: IANA timezone used when the user has none configured
+        """
+        self.logger = logging.getLogger(__name__)
+        self.default_timezone = default_timezone or settings.default_timezone
+    
+    def get_timezone(self, timezone_name: Optional[str]) -> ZoneInfo:
+        """
+        Resolve a user's timezone, falling back to the default on bad input.
+        
+        Args:
+            timezone_name: IANA timezone name, e.g. "America/Chicago"
+        
+        Returns:
+            ZoneInfo instance
+        """
+        for name in (timezone_name, self.default_timezone, 'UTC'):
+            if not name:
+                continue
+            try:
+                return ZoneInfo(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                self.logger.warning(f"Unknown timezone '{name}', falling back")
+        return ZoneInfo('UTC')
+    
+    def parse(self, text: str, timezone_name: Optional[str] = None,
+              now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Extract the task title, due date/time and recurrence from task text.
+        
+        Args:
+            text: Natural language task or reminder request
+            timezone_name: User's IANA timezone (default timezone if None)
+            now: Reference time, mainly for tests and benchmarks (defaults to current time)
+        
+        Returns:
+            Dictionary with title, due_date (YYYY-MM-DD), due_datetime (ISO 8601 with
+            offset, only when a time was given), has_time, is_recurring,
+            recurrence_rule, recurrence_text, timezone and matched expressions
+        """
+        tz = self.get_timezone(timezone_name)
+        now = now.astimezone(tz) if now and now.tzinfo else (now.replace(tzinfo=tz) if now else datetime.now(tz))
+        today = now.date()
+        
+        # Patterns ignore case and run on the original text, so match spans line up with
+        # it; each consumed span is blanked out so later patterns cannot match it again
+        working = text
+        matched: List[Tuple[int, int]] = []
+        
+        def consume(match: re.Match) -> None:
+            nonlocal working
+            start, end = match.span()
+            working = working[:start] + ' ' * (end - start) + working[end:]
+            matched.append((start, end))
+        
+        target_date: Optional[date] = None
+        target_time: Optional[time] = None
+        exact: Optional[datetime] = None
+        rrule: Optional[str] = None
+        recurrence_weekdays: List[int] = []
+        recurrence_text: Optional[str] = None
+        
+        # Recurrence ("every monday and thursday", "every 2 weeks", "daily")
+        match = RECURRENCE_WEEKDAYS_PATTERN.search(working)
+        if match:
+            names = re.findall(_WEEKDAY_ANY, match.group(1).lower())
+            recurrence_weekdays = sorted({WEEKDAYS[name] for name in names})
+            rrule = 'FREQ=WEEKLY;BYDAY=' + ','.join(RRULE_DAYS[day] for day in recurrence_weekdays)
+            recurrence_text = text[match.start():match.end()]
+            consume(match)
+        else:
+            match = RECURRENCE_INTERVAL_PATTERN.search(working) or RECURRENCE_WORD_PATTERN.search(working)
+            if match:
+                rrule, recurrence_weekdays = self._interval_rrule(match)
+                recurrence_text = text[match.start():match.end()]
+                consume(match)
+        
+        # Exact offsets ("in 2 hours", "in 3 days")
+        match = OFFSET_PATTERN.search(working)
+        if match:
+            amount = self._number(match.group(1))
+            unit = match.group(2).lower()
+            if unit in ('minute', 'min'):
+                exact = now + timedelta(minutes=30 if amount is None else amount)
+            elif unit in ('hour', 'hr'):
+                exact = now + (timedelta(minutes=30) if amount is None else timedelta(hours=amount))
+            elif unit == 'day':
+                # Half a day is a clock time; "in 0 days" means today
+                if amount is None:
+                    exact = now + timedelta(hours=12)
+                else:
+                    target_date = today + timedelta(days=amount)
+            elif unit == 'week':
+                target_date = today + (timedelta(days=3) if amount is None else timedelta(weeks=amount))
+            else:
+                target_date = today + (timedelta(days=15) if amount is None else relativedelta(months=amount))
+            consume(match)
+        
+        # Absolute dates
+        if target_date is None and exact is None:
+            target_date = self._match_absolute_date(working, today, consume)
+        
+        # Relative days and periods ("tomorrow", "next week", "end of month")
+        if target_date is None and exact is None:
+            match = RELATIVE_DAY_PATTERN.search(working)
+            if match:
+                word = re.sub(r'\s+', ' ', match.group(1).lower())
+                if word == 'day after tomorrow':
+                    target_date = today + timedelta(days=2)
+                elif word in ('tomorrow', 'tmrw', 'tmr'):
+                    target_date = today + timedelta(days=1)
+                else:
+                    target_date = today
+                    if word == 'tonight':
+                        target_time = PERIOD_TIMES['tonight']
+                consume(match)
+        
+        if target_date is None and exact is None:
+            match = PERIOD_PATTERN.search(working)
+            if match:
+                target_date, period_time = self._resolve_period(match, today)
+                target_time = target_time or period_time
+                consume(match)
+        
+        # Weekdays ("friday", "next tuesday", "on wed")
+        if target_date is None and exact is None:
+            match = WEEKDAY_PATTERN.search(working)
+            if match:
+                modifier = match.group(1) and match.group(1).lower()
+                weekday = WEEKDAYS[(match.group(2) or match.group(3)).lower()]
+                target_date = self._resolve_weekday(today, weekday, modifier)
+                consume(match)
+        
+        # Clock times ("at 2pm", "14:30", "noon", "this evening")
+        if exact is None:
+            clock = self._match_time(working, consume)
+            if clock is not None:
+                # "tonight at 9" is 9pm even though a bare "at 9" would be 9am
+                if target_time == PERIOD_TIMES['tonight'] and clock.hour < 12:
+                    clock = clock.replace(hour=clock.hour + 12)
+                target_time = clock
+        
+        # First occurrence of a recurring item when no explicit start was given
+        if rrule and target_date is None and exact is None:
+            target_date = self._first_occurrence(today, now, recurrence_weekdays, target_time)
+        
+        # A time on its own means today, or tomorrow once that time has passed
+        if target_time is not None and target_date is None and exact is None:
+            target_date = today if datetime.combine(today, target_time, tz) > now else today + timedelta(days=1)
+        
+        if exact is not None:
+            due_datetime = exact.replace(second=0, microsecond=0)
+            target_date = due_datetime.date()
+        elif target_date is not None and target_time is not None:
+            due_datetime = datetime.combine(target_date, target_time, tz)
+        else:
+            due_datetime = None
+        
+        return {
+            'title': self._clean_title(text, matched),
+            'due_date': target_date.isoformat() if target_date else None,
+            'due_datetime': due_datetime.isoformat() if due_datetime else None,
+            'has_time': due_datetime is not None,
+            'is_recurring': rrule is not None,
+            'recurrence_rule': rrule,
+            'recurrence_text': recurrence_text,
+            'timezone': tz.key,
+            'matched': [text[start:end].strip() for start, end in sorted(matched)]
+        }
+    
+    def _interval_rrule(self, match: re.Match) -> Tuple[str, List[int]]:
+        """Build a recurrence rule from "every N units" or "daily"-style matches."""
+        if match.re is RECURRENCE_WORD_PATTERN:
+            word = match.group(1).lower()
+            if word == 'weekdays':
+                return 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR', [0, 1, 2, 3, 4]
+            freq = {'daily': 'DAILY', 'weekly': 'WEEKLY', 'monthly': 'MONTHLY'}.get(word, 'YEARLY')
+            return f'FREQ={freq}', []
+        
+        interval = self._number(match.group(1)) if match.group(1) else 1
+        unit = match.group(2).lower()
+        if unit == 'weekday':
+            return 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR', [0, 1, 2, 3, 4]
+        
+        freq = {'day': 'DAILY', 'week': 'WEEKLY', 'month': 'MONTHLY', 'year': 'YEARLY'}[unit]
+        rule = f'FREQ={freq}'
+        if interval and interval > 1:
+            rule += f';INTERVAL={interval}'
+        return rule, []
+    
+    def _match_absolute_date(self, working: str, today: date, consume) -> Optional[date]:
+        """Match ISO, slash and month-name dates."""
+        for pattern in (ISO_DATE_PATTERN, MONTH_DAY_PATTERN, DAY_MONTH_PATTERN, SLASH_DATE_PATTERN):
+            match = pattern.search(working)
+            if not match:
+                continue
+            
+            if pattern is ISO_DATE_PATTERN:
+                year, month, day = (int(match.group(i)) for i in (1, 2, 3))
+            elif pattern is MONTH_DAY_PATTERN:
+                month, day = MONTHS[match.group(1).lower()], int(match.group(2))
+                year = int(match.group(3)) if match.group(3) else None
+            elif pattern is DAY_MONTH_PATTERN:
+                day, month = int(match.group(1)), MONTHS[match.group(2).lower()]
+                year = int(match.group(3)) if match.group(3) else None
+            else:
+                month, day = int(match.group(2)), int(match.group(3))
+                year = int(match.group('year')) if match.group('year') else None
+                if year is not None and year < 100:
+                    year += 2000
+            
+            try:
+                candidate = date(year or today.year, month, day)
+            except ValueError:
+                continue
+            
+            # Dates without a year mean the next time that date comes around
+            if year is None and candidate < today:
+                candidate = candidate.replace(year=today.year + 1)
+            
+            consume(match)
+            return candidate
+        
+        return None
+    
+    def _resolve_period(self, match: re.Match, today: date) -> Tuple[date, Optional[time]]:
+        """Resolve "next week", "this weekend", "end of month" and friends."""
+        modifier, unit, end_unit, short = (group and group.lower() for group in match.groups())
+        next_monday = today + timedelta(days=7 - today.weekday())
+        
+        if short == 'eow' or end_unit == 'week':
+            friday = today + timedelta(days=4 - today.weekday())
+            return max(friday, today), PERIOD_TIMES['eod']
+        if short == 'eom' or end_unit == 'month':
+            return today + relativedelta(day=31), PERIOD_TIMES['eod']
+        
+        if unit == 'week':
+            return (next_monday if modifier == 'next' else today), None
+        if unit == 'weekend':
+            saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+            return (saturday + timedelta(days=7) if modifier == 'next' and today.weekday() < 5 else saturday), None
+        
+        # month
+        if modifier == 'next':
+            return today + relativedelta(months=1, day=1), None
+        return today, None
+    
+    @staticmethod
+    def _resolve_weekday(today: date, weekday: int, modifier: Optional[str]) -> date:
+        """Resolve a weekday name relative to today."""
+        if modifier == 'next':
+            next_monday = today + timedelta(days=7 - today.weekday())
+            return next_monday + timedelta(days=weekday)
+        
+        days_ahead = (weekday - today.weekday()) % 7
+        if days_ahead == 0 and modifier != 'this':
+            days_ahead = 7
+        return today + timedelta(days=days_ahead)
+    
+    def _match_time(self, working: str, consume) -> Optional[time]:
+        """Match a clock time or named period of the day."""
+        match = CLOCK_PATTERN.search(working)
+        if match:
+            hour, minute = int(match.group(1)), int(match.group(2) or 0)
+            meridiem = match.group(3).lower().replace('.', '')
+            if 1 <= hour <= 12 and minute < 60:
+                if meridiem == 'pm' and hour != 12:
+                    hour += 12
+                elif meridiem == 'am' and hour == 12:
+                    hour = 0
+                consume(match)
+                return time(hour, minute)
+        
+        match = CLOCK_24H_PATTERN.search(working)
+        if match:
+            consume(match)
+            return time(int(match.group(1)), int(match.group(2)))
+        
+        match = PERIOD_TIME_PATTERN.search(working)
+        if match:
+            consume(match)
+            return PERIOD_TIMES[re.sub(r'\s+(?:the\s+)?', ' ', match.group(1).lower()).replace('end of day', 'eod')]
+        
+        match = BARE_HOUR_PATTERN.search(working)
+        if match:
+            hour = int(match.group(1))
+            if 1 <= hour <= 12:
+                # Field work happens in daylight: "at 3" means 3pm, "at 8" means 8am
+                consume(match)
+                return time(hour + 12 if hour < 7 else hour, 0)
+        
+        return None
+    
+    @staticmethod
+    def _first_occurrence(today: date, now: datetime, weekdays: List[int], at: Optional[time]) -> date:
+        """First date a recurring item fires, counting today if its time is still ahead."""
+        start_today = at is None or datetime.combine(today, at, now.tzinfo) > now
+        
+        if not weekdays:
+            return today if start_today else today + timedelta(days=1)
+        
+        for offset in range(0 if start_today else 1, 8):
+            candidate = today + timedelta(days=offset)
+            if candidate.weekday() in weekdays:
+                return candidate
+        return today
+    
+    @staticmethod
+    def _number(token: str) -> Optional[int]:
+        """Convert a numeric token ("3", "three", "an") to an int; None means half."""
+        token = token.strip().lower()
+        if token.startswith('half'):
+            return None
+        if token.isdigit():
+            return int(token)
+        return NUMBER_WORDS.get(token, 1)
+    
+    @staticmethod
+    def _clean_title(text: str, matched: List[Tuple[int, int]]) -> str:
+        """Remove date expressions and command phrasing from the original text."""
+        title = text
+        for start, end in sorted(matched, reverse=True):
+            title = title[:start] + ' ' + title[end:]
+        
+        title = COMMAND_PREFIX_PATTERN.sub('', title)
+        title = re.sub(r'\s+([,.;:!?])', r'\1', re.sub(r'\s+', ' ', title)).strip(' ,.;:-')
+        title = DANGLING_WORDS_PATTERN.sub('', title).strip(' ,.;:-')
+        
+        return title[:1].upper() + title[1:]
+
+
+# Global date parser instance
+date_parser = DateParser()
@@ -0,0 +1,238 @@
+"""
+10NetZero-FLRTS Scheduled Digests
+
+Daily and weekly Telegram summaries of each user's overdue, due and blocked tasks and
+of the recent field reports at their sites (notifications_log type `Scheduled Digest`).
+
+Digests are built a page of recipients (`digest_batch_size` users) at a time: one
+query loads the page, one loads every relevant task of those users and one their
+recent site reports, so 1,000 users cost a handful of queries instead of one query
+per user. Messages are rendered in memory and handed to the outbound Telegram
+dispatcher, which paces them under Telegram's rate limits; the next page is only
+loaded once the current one has been delivered, keeping the outbound queue short.
+
+Both digests run as periodic jobs (see job_scheduler), so a digest is sent by one
+worker only. Users opt out by setting `daily_digest` or `weekly_digest` to false in
+their preferences_flrts.
+"""
+
+import concurrent.futures
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+from app.services.date_parser import date_parser
+from app.services.outbound_dispatcher import telegram_dispatcher
+
+
+@dataclass(frozen=True)
+class DigestPeriod:
+    """Kind of digest and the time span it covers."""
+    name: str
+    title: str
+    days: int  # Tasks due within this many days and reports from this many days back
+    preference: str  # preferences_flrts key that opts a user out when false
+
+
+DIGEST_PERIODS = {
+    'daily': DigestPeriod('daily', 'Daily digest', 1, 'daily_digest'),
+    'weekly': DigestPeriod('weekly', 'Weekly digest', 7, 'weekly_digest'),
+}
+
+
+class DigestService:
+    """
+    Builds and sends scheduled digests for all users in batched queries.
+    """
+    
+    def __init__(self):
+        """Initialize the service from settings."""
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = settings.digest_batch_size
+        self.max_items = settings.digest_max_items
+        self.page_timeout = settings.digest_page_timeout_seconds
+        
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'runs': 0,
+            'recipients': 0,
+            'sent': 0,
+            'empty': 0,
+            'failed': 0,
+            'queries': 0,
+            'last_run': None
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """Digests need to be switched on and a direct PostgreSQL connection."""
+        return settings.digests_enabled and bool(settings.database_url or settings.postgres_password)
+    
+    def send(self, period_name: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Send a digest to every recipient.
+        
+        Args:
+            period_name: 'daily' or 'weekly'
+            now: Current time (defaults to the clock)
+        
+        Returns:
+            Run summary: recipients, sent, empty (nothing to report), failed and queries
+        """
+        period = DIGEST_PERIODS[period_name]
+        now = now or datetime.now(timezone.utc)
+        db = get_db_client()
+        summary = {'recipients': 0, 'sent': 0, 'empty': 0, 'failed': 0, 'queries': 0}
+        
+        # Open tasks are loaded up to the latest local date any timezone can be on
+        due_before = now.date() + timedelta(days=period.days + 1)
+        since = now - timedelta(days=period.days)
+        after = None
+        
+        while True:
+            users = db.get_digest_recipients(period.preference, limit=self.batch_size, after=after)
+            summary['queries'] += 1
+            if not users:
+                break
+            
+            user_ids = [user['id'] for user in users]
+            tasks = self._group(db.get_digest_tasks(user_ids, due_before))
+            reports = self._group(db.get_digest_reports(user_ids, since, per_user=self.max_items))
+            summary['queries'] += 2
+            
+            futures = []
+            for user in users:
+                text = self.render(period, user, tasks.get(user['id'], []), reports.get(user['id'], []), now)
+                if text is None:
+                    summary['empty'] += 1
+                    continue
+                
+                future = telegram_dispatcher.enqueue(
+                    int(user['telegram_id']), text,
+                    recipient_user_id=user['id'],
+                    notification_type='Scheduled Digest',
+                    subject=period.title
+                )
+                if future is None:
+                    summary['failed'] += 1
+                else:
+                    futures.append(future)
+            
+            summary['recipients'] += len(users)
+            self._await_page(futures, summary)
+            
+            if len(users) < self.batch_size:
+                break
+            after = users[-1]['id']
+        
+        with self._stats_lock:
+            self._stats['runs'] += 1
+            for key, value in summary.items():
+                self._stats[key] += value
+            self._stats['last_run'] = now.isoformat()
+        
+        self.logger.info(
+            f"{period.title} sent to {summary['sent']} of {summary['recipients']} users "
+            f"({summary['empty']} empty, {summary['failed']} failed, {summary['queries']} queries)"
+        )
+        return summary
+    
+    def _await_page(self, futures: List[concurrent.futures.Future], summary: Dict[str, Any]) -> None:
+        """Wait for a page of digests to be delivered and count the outcomes."""
+        if not futures:
+            return
+        
+        done, pending = concurrent.futures.wait(futures, timeout=self.page_timeout)
+        for future in done:
+            if future.exception() is None:
+                summary['sent'] += 1
+            else:
+                summary['failed'] += 1
+        
+        if pending:
+            # Still queued; the dispatcher delivers and logs them, they are just not counted here
+            self.logger.warning(f"{len(pending)} digests still queued after {self.page_timeout:.0f}s, continuing")
+    
+    @staticmethod
+    def _group(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Group rows by their user_id, keeping the query's order."""
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row['user_id']].append(row)
+        return grouped
+    
+    def render(self, period: DigestPeriod, user: Dict[str, Any], tasks: List[Dict[str, Any]],
+               reports: List[Dict[str, Any]], now: datetime) -> Optional[str]:
+        """
+        Render one user's digest.
+        
+        Args:
+            period: Digest period
+            user: Recipient row (timezone is used for "today")
+            tasks: The user's digest tasks
+            reports: The user's recent site reports
+            now: Current time
+        
+        Returns:
+            Message text, or None if there is nothing to report
+        """
+        today = now.astimezone(date_parser.get_timezone(user.get('timezone'))).date()
+        horizon = today + timedelta(days=period.days)
+        
+        overdue, due, blocked = [], [], []
+        for task in tasks:
+            due_date = task.get('due_date')
+            if task['status'] == 'Blocked':
+                blocked.append(task)
+            elif due_date is not None and due_date < today:
+                overdue.append(task)
+            elif due_date is not None and due_date < horizon:
+                due.append(task)
+        
+        due_heading = "Due today" if period.days == 1 else f"Due in the next {period.days} days"
+        sections = [
+            self._section("⚠️ Overdue", overdue, self._task_line),
+            self._section(f"📝 {due_heading}", due, self._task_line),
+            self._section("⛔ Blocked", blocked, self._task_line),
+            self._section("📄 Reports at your sites", reports, self._report_line),
+        ]
+        sections = [section for section in sections if section]
+        if not sections:
+            return None
+        
+        return f"📅 {period.title} - {today.strftime('%a %d %b')}\n\n" + "\n\n".join(sections)
+    
+    def _section(self, heading: str, items: List[Dict[str, Any]], line) -> Optional[str]:
+        """Render a digest section, or None if it has no items."""
+        if not items:
+            return None
+        
+        lines = [f"{heading} ({len(items)})"]
+        lines.extend(line(item) for item in items[:self.max_items])
+        if len(items) > self.max_items:
+            lines.append(f"...and {len(items) - self.max_items} more")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _task_line(task: Dict[str, Any]) -> str:
+        site = f" ({task['site_name']})" if task.get('site_name') else ""
+        due = f" - due {task['due_date'].isoformat()}" if isinstance(task.get('due_date'), date) else ""
+        return f"• {task['task_id_display']} {task['task_title']}{site}{due}"
+    
+    @staticmethod
+    def _report_line(report: Dict[str, Any]) -> str:
+        return f"• {report['site_name']}: {report['report_title_summary']} ({report['report_type']})"
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return digest totals for the metrics endpoint."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+# Global digest service instance
+digest_service = DigestService()
@@ -0,0 +1,293 @@
+"""
+10NetZero-FLRTS Equipment Lexicon Matcher
+
+This module spots equipment and ASIC mentions in field report text without an LLM call.
+A multi-pattern (Aho-Corasick) automaton is built from the names, ASIC models, serial
+numbers and display IDs stored in the `equipment` and `asics` tables, so every known
+identifier is found in a single linear pass over the report text.
+
+The automaton is rebuilt periodically in the background so newly registered equipment
+becomes matchable without a restart, while requests keep using the current automaton.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+
+
+class AhoCorasickMatcher:
+    """
+    Case-insensitive multi-pattern matcher with whole-word boundaries.
+    
+    Patterns are inserted into a trie, failure links are computed breadth-first,
+    and search walks the text once regardless of how many patterns exist.
+    """
+    
+    def __init__(self, patterns: List[Tuple[str, Any]]):
+        """
+        Build the automaton.
+        
+        Args:
+            patterns: List of (pattern_text, payload) pairs; payloads are returned on match
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        
+        for pattern, payload in patterns:
+            self._insert(pattern.lower(), payload)
+        
+        self._build_failure_links()
+    
+    def _insert(self, pattern: str, payload: Any) -> None:
+        """Add a pattern to the trie."""
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(pattern), payload))
+    
+    def _build_failure_links(self) -> None:
+        """Compute failure links and merge outputs along them (breadth-first)."""
+        queue = deque(self._goto[0].values())
+        
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+    
+    def search(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        Find all whole-word pattern occurrences in the text.
+        
+        Overlapping matches are resolved in favour of the longest match.
+        
+        Args:
+            text: Text to scan
+        
+        Returns:
+            List of (start, end, payload) tuples ordered by position
+        """
+        lowered = text.lower()
+        matches = []
+        node = 0
+        
+        for index, char in enumerate(lowered):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            
+            for length, payload in self._output[node]:
+                start = index - length + 1
+                end = index + 1
+                if self._is_word_boundary(lowered, start, end):
+                    matches.append((start, end, payload))
+        
+        return self._longest_non_overlapping(matches)
+    
+    @staticmethod
+    def _is_word_boundary(text: str, start: int, end: int) -> bool:
+        """Return True if the span is not embedded inside a larger word."""
+        before_ok = start == 0 or not text[start - 1].isalnum()
+        after_ok = end == len(text) or not text[end].isalnum()
+        return before_ok and after_ok
+    
+    @staticmethod
+    def _longest_non_overlapping(matches: List[Tuple[int, int, Any]]) -> List[Tuple[int, int, Any]]:
+        """Keep the longest match where spans overlap (identical spans are all kept)."""
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        selected = []
+        covered_until = -1
+        current_span = None
+        
+        for start, end, payload in matches:
+            if (start, end) == current_span:
+                selected.append((start, end, payload))
+            elif start >= covered_until:
+                selected.append((start, end, payload))
+                covered_until = end
+                current_span = (start, end)
+        
+        return selected
+
+
+class EquipmentLexicon:
+    """
+    Periodically refreshed lexicon of equipment and ASIC identifiers.
+    
+    Mentions carry a match type: serial numbers and display IDs identify exactly one
+    record, while equipment names and ASIC models can be shared by many records and
+    are only linked to a report when the report's site disambiguates them.
+    """
+    
+    MIN_PATTERN_LENGTH = 3
+    EXACT_MATCH_TYPES = ('serial_number', 'display_id')
+    
+    def __init__(self):
+        """Initialize an empty lexicon; the automaton is built on first use."""
+        self.logger = logging.getLogger(__name__)
+        self.refresh_interval = settings.equipment_lexicon_refresh_seconds
+        
+        self._matcher: Optional[AhoCorasickMatcher] = None
+        self._built_at = 0.0
+        self._pattern_count = 0
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+    
+    def _load_patterns(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Load identifiers from the equipment and asics tables."""
+        source = get_db_client().get_equipment_lexicon_source()
+        patterns = []
+        
+        def add(text: Optional[str], entry: Dict[str, Any], match_type: str) -> None:
+            if text and len(text.strip()) >= self.MIN_PATTERN_LENGTH:
+                patterns.append((text.strip(), dict(entry, match_type=match_type)))
+        
+        for item in source['equipment']:
+            entry = {
+                'kind': 'equipment',
+                'id': item['id'],
+                'name': item['equipment_name'],
+                'site_id': item.get('site_location_id')
+            }
+            add(item.get('equipment_name'), entry, 'name')
+            add(item.get('serial_number'), entry, 'serial_number')
+            add(item.get('equipment_id_display'), entry, 'display_id')
+        
+        for item in source['asics']:
+            entry = {
+                'kind': 'asic',
+                'id': item['id'],
+                'name': item['asic_name_model'],
+                'site_id': item.get('site_location_id')
+            }
+            add(item.get('asic_name_model'), entry, 'model')
+            add(item.get('serial_number'), entry, 'serial_number')
+            add(item.get('asic_id_display'), entry, 'display_id')
+        
+        return patterns
+    
+    def refresh(self) -> None:
+        """Rebuild the automaton from the database."""
+        started = time.perf_counter()
+        patterns = self._load_patterns()
+        matcher = AhoCorasickMatcher(patterns)
+        
+        # Swap in the new automaton atomically; readers keep the old one until then
+        self._matcher = matcher
+        self._pattern_count = len(patterns)
+        self._built_at = time.monotonic()
+        
+        self.logger.info(
+            f"Equipment lexicon rebuilt with {len(patterns)} patterns in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+    
+    def _ensure_fresh(self) -> Optional[AhoCorasickMatcher]:
+        """Build on first use and schedule background refreshes when stale."""
+        if self._matcher is None:
+            with self._build_lock:
+                if self._matcher is None:
+                    self.refresh()
+            return self._matcher
+        
+        if time.monotonic() - self._built_at > self.refresh_interval and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._background_refresh, name='equipment-lexicon-refresh', daemon=True).start()
+        
+        return self._matcher
+    
+    def _background_refresh(self) -> None:
+        """Refresh without blocking callers; keep the old automaton on failure."""
+        try:
+            with self._build_lock:
+                self.refresh()
+        except Exception as e:
+            self.logger.warning(f"Equipment lexicon refresh failed, keeping previous lexicon: {e}")
+            self._built_at = time.monotonic()
+        finally:
+            self._refreshing = False
+    
+    def find_mentions(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Find equipment and ASIC mentions in report text.
+        
+        Args:
+            text: Field report narrative
+        
+        Returns:
+            List of mention dictionaries (kind, id, name, site_id, match_type, matched_text)
+        """
+        try:
+            matcher = self._ensure_fresh()
+        except Exception as e:
+            self.logger.error(f"Equipment lexicon unavailable: {e}")
+            return []
+        
+        return [
+            dict(payload, matched_text=text[start:end])
+            for start, end, payload in matcher.search(text)
+        ]
+    
+    def resolve_links(self, mentions: List[Dict[str, Any]], site_id: Optional[str]) -> Dict[str, List[str]]:
+        """
+        Decide which mentioned records should be linked to a report.
+        
+        Serial numbers and display IDs always link. Names and models link only to
+        records at the report's site, or when the name identifies a single record.
+        
+        Args:
+            mentions: Output of find_mentions
+            site_id: Site the report was filed against
+        
+        Returns:
+            Dictionary with 'equipment_ids' and 'asic_ids' lists (deduplicated)
+        """
+        links = {'equipment': [], 'asic': []}
+        by_text: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        
+        for mention in mentions:
+            if mention['match_type'] in self.EXACT_MATCH_TYPES:
+                links[mention['kind']].append(mention['id'])
+            else:
+                by_text.setdefault((mention['kind'], mention['matched_text'].lower()), []).append(mention)
+        
+        for (kind, _), candidates in by_text.items():
+            at_site = [m for m in candidates if site_id and m.get('site_id') == site_id]
+            if at_site:
+                links[kind].extend(m['id'] for m in at_site)
+            elif len(candidates) == 1:
+                links[kind].append(candidates[0]['id'])
+        
+        return {
+            'equipment_ids': list(dict.fromkeys(links['equipment'])),
+            'asic_ids': list(dict.fromkeys(links['asic']))
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return lexicon statistics for the metrics endpoint."""
+        return {
+            'patterns': self._pattern_count,
+            'age_seconds': round(time.monotonic() - self._built_at, 1) if self._matcher else None
+        }
+
+
+# Global equipment lexicon instance
+equipment_lexicon = EquipmentLexicon()
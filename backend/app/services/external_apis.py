@@ -29,6 +29,14 @@ class ExternalAPIError(Exception):
     pass
 
 
+class TodoistRateLimitError(ExternalAPIError):
+    """Custom exception raised when Todoist rejects a request with HTTP 429."""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class TodoistService:
     """
     Service for integrating with Todoist API for task management and NLP.
@@ -44,6 +52,7 @@ class TodoistService:
         self.logger = logging.getLogger(__name__)
         self.api_token = settings.todoist_api_token
         self.base_url = "https://api.todoist.com/rest/v2"
+        self.sync_url = "https://api.todoist.com/sync/v9/sync"
         
         if not self.api_token:
             self.logger.warning("Todoist API token not configured")
@@ -151,6 +160,48 @@ class TodoistService:
                 'message': 'Failed to process task with Todoist'
             }
     
+    def sync_commands(self, commands: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Send a batch of commands to the Todoist Sync API in one request.
+        
+        Commands carry a client-generated UUID, so resending a batch after a lost
+        response does not apply any command twice.
+        
+        Args:
+            commands: Sync API commands (at most 100 per request)
+            
+        Returns:
+            Sync response with sync_status per command UUID and temp_id_mapping
+            
+        Raises:
+            TodoistRateLimitError: If Todoist asks us to back off (HTTP 429)
+            ExternalAPIError: If the request fails
+        """
+        if not self.enabled:
+            raise ExternalAPIError("Todoist API not configured")
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json"
+        }
+        
+        try:
+            response = requests.post(self.sync_url, headers=headers, json={"commands": commands}, timeout=30)
+            
+            if response.status_code == 429:
+                retry_after = float(response.headers.get('Retry-After', 60))
+                raise TodoistRateLimitError(f"Todoist rate limit hit, retry after {retry_after}s", retry_after)
+            
+            response.raise_for_status()
+            return response.json()
+            
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Todoist sync request failed: {e}")
+            raise ExternalAPIError(f"Todoist API error: {e}")
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Invalid JSON response from Todoist sync: {e}")
+            raise ExternalAPIError("Invalid response from Todoist API")
+    
     def _map_todoist_priority(self, todoist_priority: int) -> str:
         """
         Map Todoist priority levels to FLRTS priority levels.
@@ -0,0 +1,439 @@
+"""
+10NetZero-FLRTS Periodic Job Scheduler
+
+Markup recalculation, reminder housekeeping and digests need to run on a schedule,
+but under `gunicorn --workers 4` every worker process starts the same background
+services. This scheduler runs in every worker and makes sure each scheduled slot of
+a job is executed by exactly one of them, across workers and hosts:
+
+1. Each job has a cron expression (minute hour day-of-month month day-of-week, in
+   `default_timezone`) or a fixed interval; slots are computed identically everywhere
+2. Every worker wakes up for a slot after a random jitter, so they do not all hit the
+   database at the same instant
+3. A worker runs the slot only if it gets the job's PostgreSQL advisory lock (no two
+   runs of a job overlap) and can insert the slot into `job_runs` (a slot that has
+   already been run by another worker is skipped)
+4. On startup a job whose last recorded slot is older than its most recent due slot
+   is run once straight away, so work missed during a deploy or outage is caught up
+
+Run history, status, duration and each job's returned summary are kept in `job_runs`.
+"""
+
+import heapq
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+from app.services.date_parser import date_parser
+
+
+# First half of every job's advisory lock key ("FLRJ"); the second half is derived from the job name
+JOB_LOCK_NAMESPACE = 0x464C524A
+
+
+class CronSchedule:
+    """
+    Five-field cron expression: minute hour day-of-month month day-of-week.
+    
+    Fields accept `*`, numbers, ranges (`1-5`), lists (`1,15`) and steps (`*/15`,
+    `8-18/2`); day-of-week runs 0-6 from Sunday (7 is also Sunday). As in cron, when
+    both day fields are restricted a day matching either one qualifies.
+    """
+    
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+    
+    def __init__(self, expression: str, timezone_name: Optional[str] = None):
+        """
+        Parse a cron expression.
+        
+        Args:
+            expression: Cron expression, e.g. "0 2 * * *"
+            timezone_name: Timezone the expression is evaluated in (default settings.default_timezone)
+        
+        Raises:
+            ValueError: If the expression is malformed
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        
+        self.expression = expression
+        self.zone = date_parser.get_timezone(timezone_name)
+        parsed = [self._parse_field(text, low, high) for text, (low, high) in zip(fields, self.FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self.days_restricted = fields[2] != '*'
+        self.weekdays_restricted = fields[4] != '*'
+    
+    @staticmethod
+    def _parse_field(text: str, low: int, high: int) -> List[int]:
+        """Expand one cron field into its sorted values."""
+        values: Set[int] = set()
+        for part in text.split(','):
+            step = 1
+            if '/' in part:
+                part, step_text = part.split('/', 1)
+                step = int(step_text)
+                if step < 1:
+                    raise ValueError(f"Invalid cron step: {text!r}")
+            
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field {text!r} is outside {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+    
+    def _day_matches(self, day: date) -> bool:
+        """Whether jobs may run on a calendar day."""
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        weekday_ok = (day.isoweekday() % 7) in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+    
+    def next_after(self, after: datetime) -> datetime:
+        """
+        First slot strictly after a moment.
+        
+        Args:
+            after: Timezone-aware datetime
+        
+        Returns:
+            Next slot in UTC
+        """
+        local = after.astimezone(self.zone).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        day = local.date()
+        
+        for _ in range(366 * 8):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    if day == local.date() and hour < local.hour:
+                        continue
+                    for minute in self.minutes:
+                        if day == local.date() and hour == local.hour and minute < local.minute:
+                            continue
+                        slot = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.zone)
+                        return slot.astimezone(timezone.utc)
+            day += timedelta(days=1)
+        
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+@dataclass(eq=False)
+class Job:
+    """A periodic job and its in-process run statistics."""
+    name: str
+    func: Callable[[], Any]
+    cron: Optional[CronSchedule] = None
+    interval_seconds: Optional[float] = None
+    jitter_seconds: float = 0.0
+    catch_up: bool = True
+    stats: Dict[str, Any] = field(default_factory=lambda: {
+        'runs': 0,
+        'failures': 0,
+        'skipped_locked': 0,
+        'skipped_done': 0,
+        'last_slot': None,
+        'last_status': None,
+        'last_duration_ms': None
+    })
+    
+    @property
+    def lock_key(self) -> int:
+        """Second half of the job's advisory lock key: a signed 32-bit hash of its name."""
+        value = zlib.crc32(self.name.encode('utf-8'))
+        return value - (1 << 32) if value >= (1 << 31) else value
+    
+    def next_slot(self, after: datetime) -> datetime:
+        """First schedule slot strictly after a moment (interval slots are aligned to the epoch)."""
+        if self.cron:
+            return self.cron.next_after(after)
+        interval = self.interval_seconds
+        return datetime.fromtimestamp((after.timestamp() // interval + 1) * interval, timezone.utc)
+
+
+class JobScheduler:
+    """
+    Runs registered jobs at their slots, one worker per slot across the deployment.
+    """
+    
+    def __init__(self):
+        """Initialize an empty scheduler; jobs are added with add_job() before start()."""
+        self.logger = logging.getLogger(__name__)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.max_workers = settings.job_scheduler_max_workers
+        
+        self._jobs: Dict[str, Job] = {}
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+    
+    @property
+    def enabled(self) -> bool:
+        """Scheduling needs the scheduler switched on and a direct PostgreSQL connection."""
+        return settings.job_scheduler_enabled and bool(settings.database_url or settings.postgres_password)
+    
+    def add_job(self, name: str, func: Callable[[], Any], cron: Optional[str] = None,
+                interval_seconds: Optional[float] = None, jitter_seconds: float = 0.0,
+                catch_up: bool = True) -> Job:
+        """
+        Register a periodic job.
+        
+        Args:
+            name: Unique job name (also its job_runs.job_name and advisory lock)
+            func: Callable run for each slot; a returned dict is stored as the run's result
+            cron: Cron expression in settings.default_timezone
+            interval_seconds: Fixed interval, used when no cron expression is given
+            jitter_seconds: Up to this many seconds of random delay before each run
+            catch_up: Run once at startup if a slot was missed while no worker was up
+        
+        Returns:
+            The registered job
+        """
+        if bool(cron) == bool(interval_seconds):
+            raise ValueError(f"Job {name} needs exactly one of cron or interval_seconds")
+        
+        job = Job(
+            name=name,
+            func=func,
+            cron=CronSchedule(cron, settings.default_timezone) if cron else None,
+            interval_seconds=interval_seconds,
+            jitter_seconds=jitter_seconds,
+            catch_up=catch_up
+        )
+        with self._lock:
+            self._jobs[name] = job
+        self._wake.set()
+        return job
+    
+    def start(self) -> bool:
+        """
+        Start the scheduler thread (idempotent).
+        
+        Returns:
+            True if the scheduler is running
+        """
+        if not self.enabled:
+            self.logger.info("Job scheduler disabled")
+            return False
+        
+        if self._thread and self._thread.is_alive():
+            return True
+        
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Job scheduler started with {len(self._jobs)} jobs ({self.worker_id})")
+        return True
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop scheduling; runs already in progress are left to finish."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+    
+    def _initial_slots(self, now: datetime) -> List[Tuple[float, datetime, str]]:
+        """Queue each job's next slot, plus a catch-up run for jobs that missed one."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        
+        try:
+            last_slots = get_db_client().get_last_job_slots([job.name for job in jobs if job.catch_up])
+        except Exception as e:
+            self.logger.warning(f"Could not load job history, skipping catch-up: {e}")
+            last_slots = {}
+        
+        queue = []
+        for job in jobs:
+            last = last_slots.get(job.name)
+            if last is not None:
+                missed = job.next_slot(last)
+                if missed <= now:
+                    # Record the catch-up under the most recent missed slot so a restart does not repeat it
+                    while (following := job.next_slot(missed)) <= now:
+                        missed = following
+                    self.logger.info(f"Job {job.name} missed its {missed.isoformat()} slot, catching up")
+                    queue.append((self._fire_time(job, now), missed, job.name))
+            
+            slot = job.next_slot(now)
+            queue.append((self._fire_time(job, slot), slot, job.name))
+        return queue
+    
+    @staticmethod
+    def _fire_time(job: Job, slot: datetime) -> float:
+        """Moment to wake up for a slot, including the job's random jitter."""
+        return slot.timestamp() + random.uniform(0, job.jitter_seconds)
+    
+    def _run(self) -> None:
+        """Scheduler loop: sleep until the next slot, hand it to the executor, queue the following one."""
+        queue = self._initial_slots(datetime.now(timezone.utc))
+        heapq.heapify(queue)
+        scheduled = {name for _, _, name in queue}
+        
+        while not self._stop.is_set():
+            # Jobs registered after start() join the queue here
+            with self._lock:
+                added = [job for name, job in self._jobs.items() if name not in scheduled]
+            for job in added:
+                slot = job.next_slot(datetime.now(timezone.utc))
+                heapq.heappush(queue, (self._fire_time(job, slot), slot, job.name))
+                scheduled.add(job.name)
+            
+            if not queue:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            
+            fire_at, slot, name = queue[0]
+            delay = fire_at - time.time()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            
+            heapq.heappop(queue)
+            job = self._jobs[name]
+            self._executor.submit(self.run_slot, job, slot)
+            
+            following = job.next_slot(max(slot, datetime.now(timezone.utc)))
+            if not any(queued_name == name and queued_slot == following for _, queued_slot, queued_name in queue):
+                heapq.heappush(queue, (self._fire_time(job, following), following, name))
+    
+    def run_slot(self, job: Job, slot: datetime) -> Optional[str]:
+        """
+        Run one slot of a job if this worker wins it.
+        
+        Args:
+            job: Job to run
+            slot: Nominal schedule slot
+        
+        Returns:
+            'Succeeded' or 'Failed' if the job ran here, None if it was skipped
+        """
+        with self._lock:
+            if job.name in self._running:
+                job.stats['skipped_locked'] += 1
+                return None
+            self._running.add(job.name)
+        
+        try:
+            db = get_db_client()
+            with db.advisory_lock(JOB_LOCK_NAMESPACE, job.lock_key) as acquired:
+                if not acquired:
+                    self._record(job, 'skipped_locked')
+                    return None
+                
+                run_id = db.start_job_run(job.name, slot, self.worker_id)
+                if run_id is None:
+                    self._record(job, 'skipped_done')
+                    return None
+                
+                return self._execute(db, job, slot, run_id)
+        
+        except Exception as e:
+            self.logger.error(f"Job {job.name} could not be scheduled for {slot.isoformat()}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._running.discard(job.name)
+    
+    def _execute(self, db, job: Job, slot: datetime, run_id: int) -> str:
+        """Call the job function and record the run."""
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = job.func()
+            status = 'Succeeded'
+        except Exception as e:
+            status, error = 'Failed', str(e)
+            self.logger.error(f"Job {job.name} failed: {e}", exc_info=True)
+        
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        db.finish_job_run(run_id, status, duration_ms, result=result if isinstance(result, dict) else None, error=error)
+        
+        with self._lock:
+            job.stats['runs'] += 1
+            job.stats['failures'] += status == 'Failed'
+            job.stats.update(last_slot=slot.isoformat(), last_status=status, last_duration_ms=duration_ms)
+        
+        self.logger.info(f"Job {job.name} {status.lower()} in {duration_ms} ms (slot {slot.isoformat()})")
+        return status
+    
+    def _record(self, job: Job, counter: str) -> None:
+        with self._lock:
+            job.stats[counter] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-job run statistics for the metrics endpoint."""
+        with self._lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'worker_id': self.worker_id,
+                'jobs': {name: dict(job.stats) for name, job in self._jobs.items()}
+            }
+
+
+def register_default_jobs(scheduler: 'JobScheduler') -> None:
+    """
+    Register the backend's periodic jobs.
+    
+    Args:
+        scheduler: Scheduler to add the jobs to
+    """
+    from app.services.reminder_engine import reminder_engine
+    from app.services.digest_service import digest_service
+    
+    def recalculate_markups() -> Dict[str, Any]:
+        return {'invoices': get_db_client().recalculate_all_markups()}
+    
+    scheduler.add_job(
+        'markup_recalculation', recalculate_markups,
+        cron=settings.markup_recalculation_cron, jitter_seconds=settings.job_scheduler_jitter_seconds
+    )
+    
+    if reminder_engine.enabled:
+        scheduler.add_job(
+            'reminder_expiry', lambda: {'retired': reminder_engine.expire_stale()},
+            cron=settings.reminder_expiry_cron, jitter_seconds=settings.job_scheduler_jitter_seconds
+        )
+    
+    if digest_service.enabled:
+        # A digest missed during downtime is stale, so it is not caught up
+        scheduler.add_job(
+            'daily_digest', lambda: digest_service.send('daily'),
+            cron=settings.daily_digest_cron, jitter_seconds=settings.job_scheduler_jitter_seconds, catch_up=False
+        )
+        scheduler.add_job(
+            'weekly_digest', lambda: digest_service.send('weekly'),
+            cron=settings.weekly_digest_cron, jitter_seconds=settings.job_scheduler_jitter_seconds, catch_up=False
+        )
+
+
+# Global job scheduler instance
+job_scheduler = JobScheduler()
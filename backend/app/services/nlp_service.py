@@ -15,16 +15,53 @@ The NLP pipeline follows the system design specifications for handling different
 of natural language input and routing them to appropriate processing mechanisms.
 """
 
+import asyncio
+import json
 import logging
+import math
 import re
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, List
 from datetime import datetime, date
 from enum import Enum
 
 import openai
 from config.settings import settings
 from app.services.database_client import db_client
-from app.services.external_apis import todoist_service, google_drive_service
+from app.services.external_apis import google_drive_service
+from app.services.single_flight import SingleFlight, llm_single_flight
+from app.services.rate_limiter import RateLimitExceeded, rate_limiter, llm_concurrency
+from app.services.equipment_lexicon import equipment_lexicon
+from app.services.report_similarity import report_similarity_index
+from app.services.report_dedup import report_deduplicator
+from app.services.site_locator import site_locator
+from app.services.report_attachments import report_attachments
+from app.services.date_parser import date_parser
+from app.services.todoist_outbox import todoist_outbox, build_create_payload
+from app.services.reminder_engine import reminder_engine
+from app.services.pipeline_metrics import pipeline_metrics
+from app.services.speculative_prefetch import SpeculativePrefetch, current_prefetch, prefetch_stats
+
+
+# Site named in report text, e.g. "Site Alpha:" or "at site Beta"
+SITE_MENTION_PATTERN = re.compile(r'\bsite\s+(\w+)', re.IGNORECASE)
+
+# Threads shared by all batch requests in this worker (created on first use)
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    """Return the worker-wide batch pool of nlp_batch_max_concurrency threads."""
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=settings.nlp_batch_max_concurrency, thread_name_prefix='nlp-batch'
+            )
+        return _batch_executor
 
 
 class Intent(Enum):
@@ -41,6 +78,7 @@ class Intent(Enum):
     QUERY_TASKS = "query_tasks"
     QUERY_LISTS = "query_lists"
     QUERY_REPORTS = "query_reports"
+    QUERY_SIMILAR_REPORTS = "query_similar_reports"
     UPDATE_TASK_STATUS = "update_task_status"
     GENERAL_QUERY = "general_query"
     UNKNOWN = "unknown"
@@ -55,6 +93,32 @@ class NLPService:
     Integrates with external APIs and database operations to fulfill requests.
     """
     
+    # Data each handler reads first; loaded speculatively while the LLM classifies
+    PREFETCH_KEYS = {
+        Intent.QUERY_TASKS: ('open_tasks',),
+        Intent.QUERY_REPORTS: ('recent_reports',),
+        Intent.ADD_LIST_ITEM: ('site_lists',)
+    }
+    RECENT_REPORT_LIMIT = 5
+    SIMILAR_REPORT_LIMIT = 5
+    
+    # Phrasing around a similar-report question that is not part of the problem description
+    SIMILARITY_TRIGGER_PATTERN = re.compile(
+        r"\b(has|have|did)\s+(this|that|it|an?|any)\b|\b(happened|occurred|been\s+seen|seen)\b(\s+(this|that|it))?(\s+before)?"
+        r"|\b(at|on)\s+(any|other)\s+(other\s+)?sites?\b|\b(any|find|show|search\s+for|look\s+up)\b"
+        r"|\bsimilar\s+(reports?|issues?|incidents?|problems?|failures?)(\s+(to|like|about))?\b"
+        r"|\b(reports?|incidents?)\s+(like|about|similar\s+to)\b|\b(like|to)\s+this\b|\bbefore\b",
+        re.IGNORECASE
+    )
+    
+    # lists.list_type values an extracted list type resolves to, in order of preference
+    LIST_TYPE_TARGETS = {
+        'equipment': ('Tools Inventory',),
+        'supplies': ('Shopping List',),
+        'safety': ('Safety Checklist',),
+        'general': ('Other', 'Shopping List')
+    }
+    
     def __init__(self):
         """Initialize the NLP service with OpenAI client and intent patterns."""
         self.logger = logging.getLogger(__name__)
@@ -71,7 +135,7 @@ class NLPService:
         # Define intent classification patterns for fallback processing
         self.intent_patterns = {
             Intent.CREATE_TASK: [
-                r'\b(create|add|new)\s+(task|todo|assignment)\b',
+                r'\b(create|add|new)\s+(a\s+)?(task|todo|assignment)\b',
                 r'\btask\s*:\s*',
                 r'\b(remind|tell)\s+\w+\s+to\b',
                 r'\bneed\s+to\b',
@@ -95,7 +159,7 @@ class NLPService:
                 r'\bneed\b.*\b(supplies|parts|tools)\b'
             ],
             Intent.QUERY_TASKS: [
-                r'\b(what|show|list|check)\b.*\b(task|todo|assignment)\b',
+                r'\b(what|show|list|check)\b.*\b(tasks?|todos?|assignments?)\b',
                 r'\bmy\s+(schedule|work|tasks)\b',
                 r'\bwhat.*\b(today|tomorrow|this\s+week)\b',
                 r'\bdue\s+(today|soon)\b'
@@ -110,92 +174,421 @@ class NLPService:
                 r'\brecent\s+(reports|logs)\b',
                 r'\breport\s+(history|status)\b'
             ],
+            Intent.QUERY_SIMILAR_REPORTS: [
+                r'\b(happened|occurred|seen)\b.*\bbefore\b',
+                r'\bsimilar\s+(reports?|issues?|incidents?|problems?|failures?)\b',
+                r'\b(reports?|incidents?)\s+(like|similar\s+to)\b'
+            ],
             Intent.UPDATE_TASK_STATUS: [
                 r'\b(done|complete|completed|finish|finished)\b',
                 r'\bmark.*\b(complete|done)\b',
-                r'\b(close|cancel)\s+(task|todo)\b'
+                r'\b(close|cancel|complete|finish)\s+(task|todo)\b',
+                r'\btask-\d{8}-[0-9a-f]{8}\b',
+                r'\b(update|change)\b.+\bto\s+(todo|to-do|pending|in-progress|progress|working|done|complete|completed)\b'
             ]
         }
+        self._compiled_patterns = {
+            intent: [re.compile(pattern) for pattern in patterns]
+            for intent, patterns in self.intent_patterns.items()
+        }
+        
+        # Bare keywords that also appear in other intents ("finished inspecting the
+        # generator, oil is low" is a field report); alone they score below the default
+        # nlp_confidence_threshold so the LLM decides
+        self.weak_patterns = {
+            r'\b(done|complete|completed|finish|finished)\b'
+        }
+        
+        # Classifier cascade statistics (local tier vs. LLM tier)
+        self._cascade_lock = threading.Lock()
+        self._cascade_stats = {
+            'classifications': 0,
+            'local': 0,
+            'llm': 0,
+            'llm_failures': 0,
+            'escalated_low_confidence': 0,
+            'escalated_close_margin': 0,
+            'llm_calls_avoided': 0,
+            'local_by_intent': {},
+            'llm_by_intent': {}
+        }
     
-    async def process_user_input(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_user_input(self, user_input: str, user_context: Dict[str, Any],
+                                 enforce_rate_limit: bool = True) -> Dict[str, Any]:
         """
         Main entry point for processing user input through the NLP pipeline.
         
         Args:
             user_input: Natural language text from the user
             user_context: User information including site assignments and permissions
+            enforce_rate_limit: Apply the per-user rate limit (disabled for trusted batch ingestion)
             
         Returns:
             Dictionary containing response text, success status, and metadata
+            (including per-stage timings under 'stage_timings')
         """
+        token = pipeline_metrics.start_trace()
+        try:
+            result = await self._run_pipeline(user_input, user_context, enforce_rate_limit)
+        finally:
+            timings = pipeline_metrics.finish_trace(token)
+        
+        result['stage_timings'] = timings
+        return result
+    
+    async def _run_pipeline(self, user_input: str, user_context: Dict[str, Any],
+                            enforce_rate_limit: bool) -> Dict[str, Any]:
+        """Classify the input and route it to its handler inside the current trace."""
+        prefetch: Optional[SpeculativePrefetch] = None
+        prefetch_token = None
+        
         try:
             self.logger.info(f"Processing input from user {user_context.get('flrts_user_id')}: {user_input[:100]}")
             
-            # Step 1: Classify user intent
-            intent, confidence = await self.classify_intent(user_input)
+            # Step 0: Enforce the per-user rate limit before any LLM or DB work
+            if enforce_rate_limit:
+                rejection = await self._enforce_rate_limit(user_context)
+                if rejection:
+                    return rejection
             
-            self.logger.debug(f"Classified intent: {intent.value} (confidence: {confidence:.2f})")
+            # Step 1: Classify user intent; if the LLM is consulted, load likely handler data meanwhile
+            def start_prefetch() -> None:
+                nonlocal prefetch, prefetch_token
+                if settings.nlp_prefetch_enabled:
+                    prefetch = SpeculativePrefetch(self._prefetch_loaders(user_context), prefetch_stats)
+                    prefetch_token = current_prefetch.set(prefetch)
             
-            # Step 2: Route to appropriate handler based on intent
-            if intent == Intent.CREATE_TASK or intent == Intent.CREATE_REMINDER:
-                return await self.handle_task_creation(user_input, user_context, intent)
+            with pipeline_metrics.span('classify_intent'):
+                intent, confidence = await self.classify_intent(user_input, on_escalate=start_prefetch)
+            pipeline_metrics.set_intent(intent.value)
             
-            elif intent == Intent.CREATE_FIELD_REPORT:
-                return await self.handle_field_report_creation(user_input, user_context)
+            if prefetch:
+                prefetch.keep_only(self.PREFETCH_KEYS.get(intent, ()))
             
-            elif intent == Intent.ADD_LIST_ITEM:
-                return await self.handle_list_item_addition(user_input, user_context)
+            self.logger.debug(f"Classified intent: {intent.value} (confidence: {confidence:.2f})")
             
-            elif intent == Intent.QUERY_TASKS:
-                return await self.handle_task_query(user_input, user_context)
+            # Step 2: Route to appropriate handler based on intent
+            with pipeline_metrics.span('handler'):
+                if intent == Intent.CREATE_TASK or intent == Intent.CREATE_REMINDER:
+                    return await self.handle_task_creation(user_input, user_context, intent)
+                
+                elif intent == Intent.CREATE_FIELD_REPORT:
+                    return await self.handle_field_report_creation(user_input, user_context)
+                
+                elif intent == Intent.ADD_LIST_ITEM:
+                    return await self.handle_list_item_addition(user_input, user_context)
+                
+                elif intent == Intent.QUERY_TASKS:
+                    return await self.handle_task_query(user_input, user_context)
+                
+                elif intent == Intent.QUERY_LISTS:
+                    return await self.handle_list_query(user_input, user_context)
+                
+                elif intent == Intent.QUERY_REPORTS:
+                    return await self.handle_report_query(user_input, user_context)
+                
+                elif intent == Intent.QUERY_SIMILAR_REPORTS:
+                    return await self.handle_similar_report_query(user_input, user_context)
+                
+                elif intent == Intent.UPDATE_TASK_STATUS:
+                    return await self.handle_task_status_update(user_input, user_context)
+                
+                elif intent == Intent.GENERAL_QUERY:
+                    return await self.handle_general_query(user_input, user_context)
+                
+                else:  # Intent.UNKNOWN
+                    return {
+                        'success': False,
+                        'response': "I'm not sure how to help with that. Try asking me to create a task, log a field report, or check your schedule. You can also use /help for examples.",
+                        'intent': intent.value,
+                        'confidence': confidence
+                    }
             
-            elif intent == Intent.QUERY_LISTS:
-                return await self.handle_list_query(user_input, user_context)
+        except Exception as e:
+            self.logger.error(f"Error processing user input: {e}", exc_info=True)
+            return {
+                'success': False,
+                'response': "Sorry, I encountered an error processing your request. Please try again.",
+                'error': str(e)
+            }
+        
+        finally:
+            if prefetch:
+                prefetch.close()
+                current_prefetch.reset(prefetch_token)
+    
+    async def process_command(self, intent: Intent, user_context: Dict[str, Any],
+                              arguments: Optional[Dict[str, Any]] = None, user_input: str = '') -> Dict[str, Any]:
+        """
+        Run a structured bot command straight through its handler.
+        
+        Commands such as /tasks or /done arrive with their arguments already parsed,
+        so intent classification (and any LLM call) is skipped entirely.
+        
+        Args:
+            intent: Intent the command maps to
+            user_context: User information including site assignments and permissions
+            arguments: Parsed arguments (task_info for UPDATE_TASK_STATUS, list_info for
+                ADD_LIST_ITEM, site for CREATE_FIELD_REPORT)
+            user_input: Free text carried by the command (e.g. the report narrative)
             
-            elif intent == Intent.QUERY_REPORTS:
-                return await self.handle_report_query(user_input, user_context)
+        Returns:
+            Dictionary containing response text, success status, and metadata
+        """
+        token = pipeline_metrics.start_trace()
+        pipeline_metrics.set_intent(intent.value)
+        try:
+            result = await self._run_command(intent, user_context, arguments or {}, user_input)
+        finally:
+            timings = pipeline_metrics.finish_trace(token)
+        
+        result['stage_timings'] = timings
+        return result
+    
+    async def _run_command(self, intent: Intent, user_context: Dict[str, Any],
+                           arguments: Dict[str, Any], user_input: str) -> Dict[str, Any]:
+        """Dispatch a structured command to its handler inside the current trace."""
+        try:
+            self.logger.info(f"Command {intent.value} from user {user_context.get('flrts_user_id')}: {arguments}")
             
-            elif intent == Intent.UPDATE_TASK_STATUS:
-                return await self.handle_task_status_update(user_input, user_context)
+            rejection = await self._enforce_rate_limit(user_context)
+            if rejection:
+                return rejection
             
-            elif intent == Intent.GENERAL_QUERY:
-                return await self.handle_general_query(user_input, user_context)
+            with pipeline_metrics.span('handler'):
+                if intent == Intent.QUERY_TASKS:
+                    return await self.handle_task_query(user_input, user_context)
+                
+                elif intent == Intent.QUERY_REPORTS:
+                    return await self.handle_report_query(user_input, user_context)
+                
+                elif intent == Intent.UPDATE_TASK_STATUS:
+                    return await self.handle_task_status_update(user_input, user_context, task_info=arguments)
+                
+                elif intent == Intent.CREATE_FIELD_REPORT:
+                    return await self.handle_field_report_creation(
+                        user_input, user_context, site_identifier=arguments.get('site')
+                    )
+                
+                elif intent == Intent.ADD_LIST_ITEM:
+                    return await self.handle_list_item_addition(user_input, user_context, list_info=arguments)
             
-            else:  # Intent.UNKNOWN
-                return {
-                    'success': False,
-                    'response': "I'm not sure how to help with that. Try asking me to create a task, log a field report, or check your schedule. You can also use /help for examples.",
-                    'intent': intent.value,
-                    'confidence': confidence
-                }
+            raise ValueError(f"No command handler for intent {intent.value}")
         
         except Exception as e:
-            self.logger.error(f"Error processing user input: {e}", exc_info=True)
+            self.logger.error(f"Error processing command {intent.value}: {e}", exc_info=True)
             return {
                 'success': False,
                 'response': "Sorry, I encountered an error processing your request. Please try again.",
+                'intent': intent.value,
                 'error': str(e)
             }
     
-    async def classify_intent(self, user_input: str) -> tuple[Intent, float]:
+    async def _enforce_rate_limit(self, user_context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Classify user intent using OpenAI or fallback pattern matching.
+        Apply the per-user rate limit.
+        
+        Returns:
+            A rejection response if the user is over the limit, otherwise None
+        """
+        if not user_context.get('flrts_user_id'):
+            return None
+        
+        try:
+            with pipeline_metrics.span('rate_limit'):
+                await rate_limiter.acquire(f"user:{user_context['flrts_user_id']}")
+        except RateLimitExceeded as e:
+            self.logger.warning(f"Rate limit exceeded for user {user_context['flrts_user_id']}")
+            return {
+                'success': False,
+                'response': f"⏳ You're sending messages faster than I can process them. Please slow down and try again in {math.ceil(e.retry_after)} seconds.",
+                'rate_limited': True,
+                'retry_after': e.retry_after
+            }
+        
+        return None
+    
+    def _prefetch_loaders(self, user_context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the speculative loads for a request (see PREFETCH_KEYS).
         
         Args:
-            user_input: User's natural language input
+            user_context: User information including site assignments
             
         Returns:
-            Tuple of (Intent, confidence_score)
+            Mapping of prefetch key to blocking loader
         """
-        # First try OpenAI classification if available
-        if self.openai_enabled:
+        user_id = user_context['flrts_user_id']
+        site_id = user_context.get('primary_site_id')
+        loaders = {'open_tasks': lambda: db_client.get_tasks_for_user(user_id)}
+        
+        if site_id:
+            loaders['site_lists'] = lambda: db_client.get_site_lists(site_id)
+            loaders['recent_reports'] = lambda: db_client.get_field_reports_by_site(site_id, self.RECENT_REPORT_LIMIT)
+        else:
+            loaders['recent_reports'] = lambda: db_client.get_field_reports_by_user(user_id, self.RECENT_REPORT_LIMIT)
+        
+        return loaders
+    
+    async def _load(self, key: str, loader) -> Any:
+        """
+        Return data prefetched for this request, or load it now.
+        
+        Args:
+            key: Prefetch key (see PREFETCH_KEYS)
+            loader: Blocking callable that loads the data directly
+            
+        Returns:
+            The loaded data
+        """
+        prefetch = current_prefetch.get()
+        if prefetch is None:
+            return loader()
+        return await prefetch.get(key, loader)
+    
+    async def process_batch(self, items: List[Dict[str, Any]], max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Process many inputs concurrently through process_user_input.
+        
+        The pipeline's database calls are blocking, so each item runs on a worker
+        thread with its own event loop. The threads come from one pool shared by
+        every batch request (nlp_batch_max_concurrency threads), so concurrent
+        batches queue for threads instead of adding more; max_concurrency caps how
+        many of them one batch occupies. LLM calls from all items still share the
+        global single-flight and concurrency limits.
+        
+        Args:
+            items: List of dictionaries with 'user_input' and 'user_context'
+            max_concurrency: Maximum number of items processed at the same time
+            
+        Returns:
+            Dictionary with per-item results (in input order, each with 'elapsed_ms')
+            and the total elapsed time
+        """
+        limit = max_concurrency or settings.nlp_batch_max_concurrency
+        loop = asyncio.get_running_loop()
+        batch_started = time.perf_counter()
+        
+        def _process_item(item: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
             try:
-                return await self.classify_intent_openai(user_input)
+                result = asyncio.run(
+                    self.process_user_input(item['user_input'], item['user_context'], enforce_rate_limit=False)
+                )
             except Exception as e:
-                self.logger.warning(f"OpenAI intent classification failed, using fallback: {e}")
+                self.logger.error(f"Error processing batch item: {e}", exc_info=True)
+                result = {
+                    'success': False,
+                    'response': "Sorry, I encountered an error processing this message.",
+                    'error': str(e)
+                }
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            return result
+        
+        executor = _get_batch_executor()
+        slots = asyncio.Semaphore(limit)
+        
+        async def _run(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with slots:
+                return await loop.run_in_executor(executor, _process_item, item)
+        
+        results = await asyncio.gather(*(_run(item) for item in items))
+        total_elapsed_ms = round((time.perf_counter() - batch_started) * 1000, 2)
         
-        # Fallback to pattern-based classification
-        return self.classify_intent_patterns(user_input)
+        self.logger.info(f"Processed NLP batch of {len(items)} items in {total_elapsed_ms} ms")
+        return {
+            'results': list(results),
+            'total_elapsed_ms': total_elapsed_ms
+        }
+    
+    async def classify_intent(self, user_input: str,
+                              on_escalate: Optional[Callable[[], None]] = None) -> tuple[Intent, float]:
+        """
+        Classify user intent with a local-first cascade.
+        
+        The local pattern classifier runs first. Its answer is used when the top
+        score reaches the intent's threshold (settings.nlp_intent_thresholds, falling
+        back to settings.nlp_confidence_threshold) and beats the runner-up by at least
+        settings.nlp_cascade_margin. Otherwise OpenAI is consulted, and the local
+        answer is kept if that call fails.
+        
+        Args:
+            user_input: User's natural language input
+            on_escalate: Called just before the LLM is consulted
+            
+        Returns:
+            Tuple of (Intent, confidence_score)
+        """
+        ranked = self.rank_intents(user_input)
+        intent, confidence = ranked[0]
+        
+        if not self.openai_enabled:
+            self._record_cascade('local', intent)
+            return intent, confidence
+        
+        escalation = self.cascade_escalation(ranked)
+        if escalation is None:
+            self._record_cascade('local', intent, llm_avoided=True)
+            return intent, confidence
+        
+        if on_escalate:
+            on_escalate()
+        
+        try:
+            llm_intent, llm_confidence = await self.classify_intent_openai(user_input)
+            self._record_cascade('llm', llm_intent, escalation=escalation)
+            return llm_intent, llm_confidence
+        except Exception as e:
+            self.logger.warning(f"OpenAI intent classification failed, using local result: {e}")
+            self._record_cascade('local', intent, escalation=escalation, llm_failed=True)
+            return intent, confidence
+    
+    def cascade_escalation(self, ranked: List[tuple[Intent, float]]) -> Optional[str]:
+        """
+        Decide whether a local ranking needs the LLM.
+        
+        Args:
+            ranked: Output of rank_intents
+            
+        Returns:
+            'escalated_low_confidence', 'escalated_close_margin', or None when the
+            local answer can be used
+        """
+        intent, confidence = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        
+        threshold = settings.nlp_intent_thresholds.get(intent.value, settings.nlp_confidence_threshold)
+        if confidence < threshold:
+            return 'escalated_low_confidence'
+        if confidence - runner_up < settings.nlp_cascade_margin:
+            return 'escalated_close_margin'
+        return None
+    
+    def _record_cascade(self, tier: str, intent: Intent, escalation: Optional[str] = None,
+                        llm_avoided: bool = False, llm_failed: bool = False) -> None:
+        """Update the classifier cascade statistics."""
+        with self._cascade_lock:
+            stats = self._cascade_stats
+            stats['classifications'] += 1
+            stats[tier] += 1
+            stats[f"{tier}_by_intent"][intent.value] = stats[f"{tier}_by_intent"].get(intent.value, 0) + 1
+            if escalation:
+                stats[escalation] += 1
+            if llm_avoided:
+                stats['llm_calls_avoided'] += 1
+            if llm_failed:
+                stats['llm_failures'] += 1
+    
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        """Return classifier cascade statistics for the metrics endpoint."""
+        with self._cascade_lock:
+            stats = dict(self._cascade_stats)
+            stats['local_by_intent'] = dict(stats['local_by_intent'])
+            stats['llm_by_intent'] = dict(stats['llm_by_intent'])
+        
+        total = stats['classifications']
+        stats['local_hit_rate'] = round(stats['local'] / total, 4) if total else None
+        return stats
     
     async def classify_intent_openai(self, user_input: str) -> tuple[Intent, float]:
         """
@@ -218,6 +611,7 @@ class NLPService:
         - query_tasks: Asking about tasks, schedule, or assignments
         - query_lists: Asking about list contents or inventory
         - query_reports: Asking about field reports or logs
+        - query_similar_reports: Asking whether a problem has happened before, or for reports similar to a description
         - update_task_status: Marking tasks complete or updating status
         - general_query: General questions about sites, equipment, or status
         - unknown: Input that doesn't fit any category
@@ -226,18 +620,25 @@ class NLPService:
         Format: intent_name,confidence_score
         """
         
-        try:
+        # Normalize case and whitespace so near-identical messages share one request; the
+        # model is sent the normalized text too, so every coalesced caller gets the answer
+        # to exactly the request it was keyed on
+        normalized_input = ' '.join(user_input.lower().split())
+        
+        async def _classify() -> str:
             response = await openai.ChatCompletion.acreate(
                 model=settings.openai_model,
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input}
+                    {"role": "user", "content": normalized_input}
                 ],
                 max_tokens=50,
                 temperature=0.1
             )
-            
-            result = response.choices[0].message.content.strip()
+            return response.choices[0].message.content.strip()
+        
+        try:
+            result = await self._call_llm('classify_intent', normalized_input, _classify)
             intent_str, confidence_str = result.split(',')
             
             # Map string to Intent enum
@@ -253,83 +654,153 @@ class NLPService:
             self.logger.error(f"OpenAI intent classification error: {e}")
             raise
     
-    def classify_intent_patterns(self, user_input: str) -> tuple[Intent, float]:
+    async def _call_llm(self, operation: str, cache_input: str, call) -> str:
         """
-        Fallback intent classification using regex patterns.
+        Execute an LLM request through the single-flight layer.
+        
+        Concurrent requests with the same operation, model and input share one
+        upstream call; timeouts and errors are propagated to every waiter. The
+        upstream call itself holds one of the global LLM concurrency slots, so
+        coalesced waiters never occupy capacity.
+        
+        Args:
+            operation: Name of the LLM operation (part of the cache key)
+            cache_input: Input text identifying the request
+            call: Zero-argument coroutine factory performing the OpenAI request
+            
+        Returns:
+            Raw response content from the LLM
+        """
+        async def _limited_call() -> str:
+            async with llm_concurrency.slot(timeout=settings.llm_queue_timeout):
+                return await call()
+        
+        with pipeline_metrics.span(f"llm.{operation}"):
+            if not settings.llm_single_flight_enabled:
+                return await asyncio.wait_for(_limited_call(), settings.llm_request_timeout)
+            
+            key = SingleFlight.make_key(operation, settings.openai_model, cache_input)
+            return await llm_single_flight.do(key, _limited_call, timeout=settings.llm_request_timeout)
+    
+    def rank_intents(self, user_input: str) -> List[tuple[Intent, float]]:
+        """
+        Score every intent with the local pattern classifier.
+        
+        An intent scores 0.7 plus a bonus for pattern specificity (longer patterns)
+        and for each additional pattern that matches, capped at 0.95. When only
+        weak_patterns match, the base is 0.55 instead, below the default threshold.
         
         Args:
             user_input: User's natural language input
             
         Returns:
-            Tuple of (Intent, confidence_score)
+            (Intent, score) pairs, best first; [(Intent.UNKNOWN, 0.1)] if nothing matched
         """
         user_input_lower = user_input.lower()
+        scores = []
         
-        # Check each intent pattern
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, user_input_lower):
-                    # Calculate simple confidence based on pattern specificity
-                    confidence = 0.7 + (len(pattern) / 1000)  # Longer patterns = higher confidence
-                    confidence = min(confidence, 0.9)  # Cap at 0.9 for pattern matching
-                    return intent, confidence
+        for intent, patterns in self._compiled_patterns.items():
+            matched = [pattern.pattern for pattern in patterns if pattern.search(user_input_lower)]
+            if matched:
+                base = 0.55 if all(pattern in self.weak_patterns for pattern in matched) else 0.7
+                score = base + max(len(pattern) for pattern in matched) / 1000 + 0.05 * (len(matched) - 1)
+                scores.append((intent, round(min(score, 0.95), 3)))
         
-        # No patterns matched
-        return Intent.UNKNOWN, 0.1
+        if not scores:
+            return [(Intent.UNKNOWN, 0.1)]
+        
+        # Stable sort: equal scores keep the declaration order of intent_patterns
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+    
+    def classify_intent_patterns(self, user_input: str) -> tuple[Intent, float]:
+        """
+        Local intent classification using regex patterns.
+        
+        Args:
+            user_input: User's natural language input
+            
+        Returns:
+            Tuple of (Intent, confidence_score)
+        """
+        return self.rank_intents(user_input)[0]
     
     async def handle_task_creation(self, user_input: str, user_context: Dict[str, Any], intent: Intent) -> Dict[str, Any]:
         """
-        Handle task and reminder creation using Todoist API for NLP processing.
+        Handle task and reminder creation.
         
-        According to the system design, tasks and reminders are processed through
-        Todoist's Quick Add feature for natural language parsing, then structured
-        data is stored in Supabase.
+        Due dates, times and recurrence are parsed locally in the user's timezone and
+        the task is stored in Supabase straight away. Todoist is only a mirror: an
+        outbox row is written with the task and delivered by the outbox dispatcher.
         """
         try:
-            # Use Todoist API for natural language parsing
-            todoist_result = await todoist_service.create_task_from_nlp(user_input)
+            with pipeline_metrics.span('date_parser'):
+                parsed = date_parser.parse(user_input, user_context.get('timezone'))
+            priority, title = self.extract_task_priority(parsed['title'])
+            
+            # "remind me tonight at 9" names nothing but the time
+            if not title and intent == Intent.CREATE_REMINDER and parsed['due_date']:
+                title = 'Reminder'
             
-            if not todoist_result['success']:
+            if not title:
                 return {
                     'success': False,
                     'response': "I couldn't parse that task request. Please try rephrasing it.",
                     'intent': intent.value
                 }
             
-            # Extract structured data from Todoist
             task_data = {
-                'task_title': todoist_result['task_title'],
-                'task_description_detailed': todoist_result.get('description', user_input),
+                'task_title': title[:255],
+                'task_description_detailed': user_input,
                 'assigned_to_user_id': user_context['flrts_user_id'],
                 'site_id': user_context.get('primary_site_id'),
-                'due_date': todoist_result.get('due_date'),
-                'priority': todoist_result.get('priority', 'Medium'),
+                'due_date': parsed['due_date'],
+                'priority': priority,
                 'status': 'To Do',
-                'todoist_task_id': todoist_result.get('todoist_id'),
                 'created_by_user_id': user_context['flrts_user_id']
             }
             
-            # Store in Supabase database
-            created_task = db_client.create_task(task_data)
+            # Store in Supabase database; the Todoist copy is queued in the same transaction
+            if todoist_outbox.enabled:
+                created_task = db_client.create_task_with_outbox(
+                    task_data, 'create_task', build_create_payload(task_data, parsed)
+                )
+                todoist_outbox.notify()
+            else:
+                created_task = db_client.create_task(task_data)
             
             # Create reminder if this was a reminder intent
-            if intent == Intent.CREATE_REMINDER and todoist_result.get('due_datetime'):
+            if intent == Intent.CREATE_REMINDER and parsed['due_datetime']:
                 reminder_data = {
                     'reminder_title': task_data['task_title'],
-                    'reminder_date_time': todoist_result['due_datetime'],
+                    'reminder_date_time': parsed['due_datetime'],
                     'user_to_remind_id': user_context['flrts_user_id'],
                     'related_task_id': created_task['id'],
                     'related_site_id': user_context.get('primary_site_id'),
                     'status': 'Scheduled',
                     'notification_channels': ['Telegram'],
+                    'is_recurring': parsed['is_recurring'],
+                    'recurrence_rule': parsed['recurrence_rule'],
                     'created_by_user_id': user_context['flrts_user_id']
                 }
                 
-                db_client.supabase.table('reminders').insert(reminder_data).execute()
+                created_reminder = db_client.create_reminder(reminder_data)
+                
+                # Reminders due within the engine's loaded window would otherwise wait for its next poll
+                if user_context.get('telegram_user_id'):
+                    reminder_engine.schedule(dict(
+                        created_reminder,
+                        telegram_id=user_context['telegram_user_id'],
+                        timezone=user_context.get('timezone')
+                    ))
             
             response_text = f"✅ Created task: {created_task['task_title']}"
-            if todoist_result.get('due_date'):
-                response_text += f"\\nDue: {todoist_result['due_date']}"
+            if parsed['due_datetime']:
+                due = datetime.fromisoformat(parsed['due_datetime'])
+                response_text += f"\\nDue: {due.strftime('%Y-%m-%d %H:%M')}"
+            elif parsed['due_date']:
+                response_text += f"\\nDue: {parsed['due_date']}"
+            if parsed['recurrence_text']:
+                response_text += f"\\nRepeats: {parsed['recurrence_text']}"
             
             return {
                 'success': True,
@@ -349,14 +820,91 @@ class NLPService:
                 'error': str(e)
             }
     
-    async def handle_field_report_creation(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
+    def located_site(self, user_context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Site the user is standing at, from a location they shared.
+        
+        The Telegram handler passes the site the user's latest location message
+        resolved to; API callers may pass latitude/longitude instead.
+        
+        Args:
+            user_context: User context (located_site_id/located_site_name or latitude/longitude)
+        
+        Returns:
+            Site with id and site_name, or None
+        """
+        if user_context.get('located_site_id'):
+            return {'id': user_context['located_site_id'], 'site_name': user_context.get('located_site_name')}
+        
+        latitude, longitude = user_context.get('latitude'), user_context.get('longitude')
+        if latitude is None or longitude is None:
+            return None
+        
+        try:
+            return site_locator.resolve(float(latitude), float(longitude))
+        except Exception as e:
+            self.logger.warning(f"Could not resolve a site for location {latitude}, {longitude}: {e}")
+            return None
+    
+    def mentioned_site(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """
+        Site named in report text ("Site Alpha: ...", "at site Beta"), by name or alias.
+        
+        Args:
+            user_input: Natural language field report
+        
+        Returns:
+            Site record, or None when no known site is named
+        """
+        match = SITE_MENTION_PATTERN.search(user_input)
+        if not match:
+            return None
+        
+        try:
+            for identifier in (f"Site {match.group(1)}", match.group(1)):
+                site = db_client.get_site_by_name_or_alias(identifier)
+                if site:
+                    return site
+        except Exception as e:
+            self.logger.warning(f"Could not look up the site named in a report: {e}")
+        return None
+
+    async def handle_field_report_creation(self, user_input: str, user_context: Dict[str, Any],
+                                           site_identifier: Optional[str] = None) -> Dict[str, Any]:
         """
         Handle field report creation using OpenAI for natural language processing.
         
         Field reports are processed by OpenAI to extract structured information
-        from narrative text input.
+        from narrative text input. A site given explicitly (e.g. by the /report
+        command) takes precedence over any site mentioned in the text.
+        
+        A resend of a report the user logged moments ago is answered with the
+        existing report before any extraction runs. Resends are only matched
+        within one site, so the site named in the text is looked up first.
         """
+        claim = None
         try:
+            site = None
+            if site_identifier:
+                site = db_client.get_site_by_name_or_alias(site_identifier)
+                if not site:
+                    return {
+                        'success': False,
+                        'response': f"I couldn't find a site called '{site_identifier}'. Please check the site name.",
+                        'intent': Intent.CREATE_FIELD_REPORT.value
+                    }
+            
+            # A site named in the text beats where the user is standing, which beats their primary site
+            inferred = None if site else (self.mentioned_site(user_input) or self.located_site(user_context))
+            fallback_site_id = inferred['id'] if inferred else user_context.get('primary_site_id')
+            
+            with pipeline_metrics.span('report_dedup'):
+                claim = await report_deduplicator.claim(
+                    user_context['flrts_user_id'], site['id'] if site else fallback_site_id, user_input
+                )
+            if claim.duplicate_of:
+                return self._duplicate_report_response(claim.duplicate_of)
+            
             # Use OpenAI to structure the field report
             if self.openai_enabled:
                 structured_report = await self.extract_field_report_data(user_input, user_context)
@@ -364,6 +912,17 @@ class NLPService:
                 # Fallback structured data extraction
                 structured_report = self.extract_field_report_fallback(user_input, user_context)
             
+            # Equipment always comes from the lexicon, which resolves mentions to records
+            if 'equipment_matches' not in structured_report:
+                structured_report.update(self.extract_equipment_mentions(user_input))
+            
+            if site:
+                structured_report['site_id'] = site['id']
+                structured_report['site_name'] = site['site_name']
+            elif inferred and not structured_report.get('site_id'):
+                structured_report['site_id'] = inferred['id']
+                structured_report['site_name'] = inferred['site_name']
+            
             # Create field report in database
             report_data = {
                 'site_id': structured_report.get('site_id') or user_context.get('primary_site_id'),
@@ -376,10 +935,38 @@ class NLPService:
             }
             
             created_report = db_client.create_field_report(report_data)
+            report_deduplicator.complete(claim, created_report)
+            
+            try:
+                report_similarity_index.add_report(dict(created_report, site_name=structured_report.get('site_name')))
+            except Exception as e:
+                self.logger.warning(f"Could not index report {created_report['id']} for similarity search: {e}")
+            
+            # Link recognised equipment/ASICs; the report itself is already saved
+            mentions = structured_report.get('equipment_matches', [])
+            if mentions:
+                try:
+                    links = equipment_lexicon.resolve_links(mentions, report_data['site_id'])
+                    db_client.link_field_report_equipment(
+                        created_report['id'], links['equipment_ids'], links['asic_ids']
+                    )
+                except Exception as e:
+                    self.logger.warning(f"Could not link equipment to report {created_report['id']}: {e}")
+            
+            # Photos and documents sent just before the report belong to it
+            attachments = 0
+            try:
+                attachments = report_attachments.claim_unassigned(user_context['flrts_user_id'], created_report['id'])
+            except Exception as e:
+                self.logger.warning(f"Could not link attachments to report {created_report['id']}: {e}")
             
             response_text = f"📝 Field report logged: {created_report['report_title_summary']}"
             if structured_report.get('site_name'):
                 response_text += f"\\nSite: {structured_report['site_name']}"
+            if structured_report.get('equipment_mentioned'):
+                response_text += f"\\nEquipment: {', '.join(structured_report['equipment_mentioned'])}"
+            if attachments:
+                response_text += f"\\nAttachments: {attachments}"
             
             return {
                 'success': True,
@@ -398,6 +985,23 @@ class NLPService:
                 'intent': Intent.CREATE_FIELD_REPORT.value,
                 'error': str(e)
             }
+        
+        finally:
+            report_deduplicator.release(claim)
+    
+    def _duplicate_report_response(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a resent field report with the report that was already logged."""
+        return {
+            'success': True,
+            'response': (
+                f"📝 You already logged this report: {report['report_title_summary']} "
+                f"({report['report_id_display']}). I didn't log it again."
+            ),
+            'intent': Intent.CREATE_FIELD_REPORT.value,
+            'action_taken': 'duplicate_report_collapsed',
+            'report_id': report['id'],
+            'duplicate_of': report['report_id_display']
+        }
     
     async def extract_field_report_data(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -416,14 +1020,13 @@ class NLPService:
         - title: Brief summary (max 100 chars)
         - report_type: One of: Daily Operational Summary, Incident Report, Maintenance Log, Safety Observation, Equipment Check, Security Update, Visitor Log, Other
         - site_name: Site name if mentioned
-        - equipment_mentioned: List of equipment/systems mentioned
         - priority_level: High, Medium, or Low based on content
         - requires_followup: true/false
         
         Only include fields that can be determined from the text.
         """
         
-        try:
+        async def _extract() -> str:
             response = await openai.ChatCompletion.acreate(
                 model=settings.openai_model,
                 messages=[
@@ -433,9 +1036,11 @@ class NLPService:
                 max_tokens=200,
                 temperature=0.1
             )
-            
-            import json
-            result = json.loads(response.choices[0].message.content)
+            return response.choices[0].message.content
+        
+        try:
+            # Each caller parses its own copy so shared results are never mutated
+            result = json.loads(await self._call_llm('extract_field_report', user_input, _extract))
             
             # Map site name to site ID if possible
             if result.get('site_name'):
@@ -463,8 +1068,7 @@ class NLPService:
         result = {}
         
         # Extract site name from patterns like "Site Alpha:" or "at Site Beta"
-        site_pattern = r'\b(?:site\s+|at\s+site\s+)(\w+)'
-        site_match = re.search(site_pattern, user_input, re.IGNORECASE)
+        site_match = SITE_MENTION_PATTERN.search(user_input)
         if site_match:
             result['site_name'] = site_match.group(1)
         
@@ -482,13 +1086,36 @@ class NLPService:
         # Generate simple title
         result['title'] = f"Field Report - {datetime.now().strftime('%Y-%m-%d')}"
         
+        # Spot known equipment and ASICs by name, model, serial number or display ID
+        result.update(self.extract_equipment_mentions(user_input))
+        
         return result
     
-    async def handle_list_item_addition(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle adding items to lists using OpenAI for item extraction."""
+    def extract_equipment_mentions(self, user_input: str) -> Dict[str, Any]:
+        """
+        Extract equipment and ASIC mentions using the equipment lexicon.
+        
+        Args:
+            user_input: Natural language field report
+            
+        Returns:
+            Dictionary with equipment_mentioned (display names) and equipment_matches
+            (raw lexicon matches used to link the report to equipment records)
+        """
+        with pipeline_metrics.span('equipment_lexicon'):
+            matches = equipment_lexicon.find_mentions(user_input)
+        
+        return {
+            'equipment_mentioned': list(dict.fromkeys(match['name'] for match in matches if match['name'])),
+            'equipment_matches': matches
+        }
+    
+    async def handle_list_item_addition(self, user_input: str, user_context: Dict[str, Any],
+                                        list_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Handle adding items to lists, using list_info when it was already parsed (e.g. /add)."""
         try:
             # Extract list type and items from input
-            list_info = self.extract_list_item_info(user_input)
+            list_info = list_info or self.extract_list_item_info(user_input)
             
             if not list_info.get('items'):
                 return {
@@ -497,42 +1124,40 @@ class NLPService:
                     'intent': Intent.ADD_LIST_ITEM.value
                 }
             
-            # Determine list type
             list_type = list_info.get('list_type', 'general')
             site_id = user_context.get('primary_site_id')
+            if not site_id:
+                return {
+                    'success': False,
+                    'response': "You don't have a primary site assigned, so I don't know which list to add to.",
+                    'intent': Intent.ADD_LIST_ITEM.value
+                }
             
-            # Add items to the appropriate list
-            added_items = []
-            for item in list_info['items']:
-                try:
-                    # Create list item in database
-                    item_data = {
-                        'item_name': item,
-                        'list_type': list_type,
-                        'site_id': site_id,
-                        'added_by_user_id': user_context['flrts_user_id'],
-                        'status': 'Active'
-                    }
-                    # Note: You'll need to add a create_list_item method to db_client
-                    # result = db_client.create_list_item(item_data)
-                    added_items.append(item)
-                except Exception as e:
-                    self.logger.error(f"Error adding list item {item}: {e}")
+            # Resolve the target list once, then add every item in a single statement
+            site_lists = await self._load('site_lists', lambda: db_client.get_site_lists(site_id))
+            target_list = self.resolve_target_list(site_lists, list_type)
+            if not target_list:
+                return {
+                    'success': False,
+                    'response': f"There is no active {list_type} list for your site yet.",
+                    'intent': Intent.ADD_LIST_ITEM.value
+                }
+            
+            created = db_client.add_list_items(target_list['id'], list_info['items'])
+            added_items = [item['item_name_primary_text'] for item in created]
             
             if added_items:
                 items_text = ", ".join(added_items)
-                response_text = f"✅ Added to {list_type} list: {items_text}"
-                if site_id:
-                    site = db_client.get_site_by_id(site_id)
-                    if site:
-                        response_text += f"\nSite: {site['site_name']}"
+                response_text = f"✅ Added to {target_list['list_name']}: {items_text}"
                 
                 return {
                     'success': True,
                     'response': response_text,
                     'intent': Intent.ADD_LIST_ITEM.value,
                     'action_taken': 'list_items_added',
-                    'items_added': added_items
+                    'list_id': target_list['id'],
+                    'items_added': added_items,
+                    'list_item_ids': [item['id'] for item in created]
                 }
             else:
                 return {
@@ -554,7 +1179,7 @@ class NLPService:
         """Handle task queries and status requests."""
         try:
             # Get user's tasks
-            tasks = db_client.get_tasks_for_user(user_context['flrts_user_id'])
+            tasks = await self._load('open_tasks', lambda: db_client.get_tasks_for_user(user_context['flrts_user_id']))
             
             if not tasks:
                 return {
@@ -580,7 +1205,11 @@ class NLPService:
                 'success': True,
                 'response': response_text,
                 'intent': Intent.QUERY_TASKS.value,
-                'use_markdown': True
+                'use_markdown': True,
+                'tasks': [
+                    {'id': task['id'], 'task_id_display': task['task_id_display'], 'task_title': task['task_title']}
+                    for task in pending_tasks[:5]
+                ]
             }
             
         except Exception as e:
@@ -628,14 +1257,16 @@ class NLPService:
         try:
             # Determine query parameters
             site_id = user_context.get('primary_site_id')
-            limit = 5  # Show recent 5 reports
+            limit = self.RECENT_REPORT_LIMIT  # Show recent 5 reports
             
             # Get field reports
             if site_id:
-                reports = db_client.get_field_reports_by_site(site_id, limit)
+                reports = await self._load('recent_reports', lambda: db_client.get_field_reports_by_site(site_id, limit))
             else:
                 # Get reports submitted by user
-                reports = db_client.get_field_reports_by_user(user_context['flrts_user_id'], limit)
+                reports = await self._load(
+                    'recent_reports', lambda: db_client.get_field_reports_by_user(user_context['flrts_user_id'], limit)
+                )
             
             if not reports:
                 return {
@@ -671,11 +1302,62 @@ class NLPService:
                 'intent': Intent.QUERY_REPORTS.value
             }
     
-    async def handle_task_status_update(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle task status updates and completion."""
+    async def handle_similar_report_query(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
+        """Find field reports from any site that resemble the problem described."""
+        try:
+            description = self.extract_similarity_query(user_input)
+            if not description:
+                return {
+                    'success': False,
+                    'response': "Describe the problem and I'll look for similar field reports, e.g. \"has a pump seal leak happened before?\"",
+                    'intent': Intent.QUERY_SIMILAR_REPORTS.value
+                }
+            
+            with pipeline_metrics.span('report_similarity'):
+                # The first search loads the index, so keep it off the event loop
+                reports = await asyncio.to_thread(
+                    report_similarity_index.search, description, limit=self.SIMILAR_REPORT_LIMIT
+                )
+            
+            if not reports:
+                return {
+                    'success': True,
+                    'response': "I couldn't find any similar field reports.",
+                    'intent': Intent.QUERY_SIMILAR_REPORTS.value,
+                    'reports': []
+                }
+            
+            response_text = "*Similar Field Reports:*\\n\\n"
+            for report in reports:
+                emoji = self.get_report_type_emoji(report.get('report_type') or 'Other')
+                response_text += f"{emoji} *{report['report_title_summary']}* ({report['score']:.0%} match)\\n"
+                response_text += f"   Date: {report.get('report_date') or 'N/A'}\\n"
+                if report.get('site_name'):
+                    response_text += f"   Site: {report['site_name']}\\n"
+                response_text += "\\n"
+            
+            return {
+                'success': True,
+                'response': response_text,
+                'intent': Intent.QUERY_SIMILAR_REPORTS.value,
+                'use_markdown': True,
+                'reports': reports
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error searching similar reports: {e}")
+            return {
+                'success': False,
+                'response': "Sorry, I couldn't search past field reports right now.",
+                'intent': Intent.QUERY_SIMILAR_REPORTS.value
+            }
+    
+    async def handle_task_status_update(self, user_input: str, user_context: Dict[str, Any],
+                                        task_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Handle task status updates and completion, using task_info when it was already parsed (e.g. /done)."""
         try:
             # Extract task reference and new status from input
-            task_info = self.extract_task_update_info(user_input)
+            task_info = task_info or self.extract_task_update_info(user_input)
             
             if not task_info.get('task_reference'):
                 return {
@@ -685,14 +1367,25 @@ class NLPService:
                 }
             
             # Find the task
-            tasks = db_client.get_tasks_for_user(user_context['flrts_user_id'])
-            matching_task = None
+            match = self.match_task_reference(user_context['flrts_user_id'], task_info['task_reference'])
+            matching_task = match['task']
             
-            for task in tasks:
-                if (task_info['task_reference'].lower() in task['task_title'].lower() or 
-                    task_info['task_reference'] == task.get('task_id_display', '')):
-                    matching_task = task
-                    break
+            if match['ambiguous']:
+                response_text = f"I found several tasks matching '{task_info['task_reference']}'. Which one did you mean?\\n"
+                for candidate in match['candidates'][:3]:
+                    response_text += f"• {candidate['task_id_display']}: {candidate['task_title']}\\n"
+                response_text += "Reply with the task ID, e.g. 'complete TASK-...'"
+                
+                return {
+                    'success': False,
+                    'response': response_text,
+                    'intent': Intent.UPDATE_TASK_STATUS.value,
+                    'needs_clarification': True,
+                    'candidates': [
+                        {'id': candidate['id'], 'task_id_display': candidate['task_id_display'], 'task_title': candidate['task_title']}
+                        for candidate in match['candidates'][:3]
+                    ]
+                }
             
             if not matching_task:
                 return {
@@ -713,22 +1406,19 @@ class NLPService:
             if new_status == 'Completed':
                 update_data['completion_date'] = datetime.now().isoformat()
             
-            # Update in database
-            result = db_client.supabase.table('tasks').update(
-                update_data
-            ).eq('id', matching_task['id']).execute()
+            # Update in database, queueing the Todoist completion in the same transaction
+            mirror_completion = new_status == 'Completed' and todoist_outbox.enabled
+            updated_task = db_client.update_task_status(
+                matching_task['id'], update_data, 'complete_task' if mirror_completion else None
+            )
             
-            if result.data:
+            if updated_task:
                 emoji = "✅" if new_status == 'Completed' else "🔄"
                 response_text = f"{emoji} Task updated: {matching_task['task_title']}\\n"
                 response_text += f"Status: {new_status}"
                 
-                # Also update in Todoist if linked
-                if matching_task.get('todoist_task_id') and new_status == 'Completed':
-                    try:
-                        await todoist_service.complete_task(matching_task['todoist_task_id'])
-                    except Exception as e:
-                        self.logger.warning(f"Failed to update Todoist task: {e}")
+                if mirror_completion:
+                    todoist_outbox.notify()
                 
                 return {
                     'success': True,
@@ -750,6 +1440,54 @@ class NLPService:
                 'error': str(e)
             }
     
+    def match_task_reference(self, user_id: str, reference: str) -> Dict[str, Any]:
+        """
+        Resolve a task reference (task ID or partial title) to one of the user's open tasks.
+        
+        Candidates come from the database already filtered and scored by title
+        similarity; a small recency bonus breaks near-ties in favour of recently
+        touched tasks. An exact task ID always wins.
+        
+        Args:
+            user_id: UUID of the user whose tasks are searched
+            reference: Task ID display or part of the task title
+            
+        Returns:
+            Dictionary with the matched task (or None), ranked candidates, and
+            ambiguous=True when the top two candidates score too close to pick one
+        """
+        candidates = db_client.find_task_candidates(user_id, reference.strip().strip('"\''))
+        
+        if candidates and candidates[0].get('exact_id_match'):
+            return {'task': candidates[0], 'candidates': candidates[:1], 'ambiguous': False}
+        
+        now = datetime.now().astimezone()
+        for candidate in candidates:
+            touched = candidate.get('updated_at') or candidate.get('created_at')
+            age_days = (now - datetime.fromisoformat(touched)).total_seconds() / 86400 if touched else 365
+            # Recency bonus halves every week since the task was last touched
+            candidate['rank_score'] = candidate['match_score'] + settings.task_match_recency_weight * 0.5 ** (max(age_days, 0) / 7)
+        
+        ranked = sorted(
+            (candidate for candidate in candidates if candidate['match_score'] >= settings.task_match_min_score),
+            key=lambda candidate: candidate['rank_score'],
+            reverse=True
+        )
+        
+        if not ranked:
+            return {'task': None, 'candidates': [], 'ambiguous': False}
+        
+        ambiguous = (
+            len(ranked) > 1
+            and ranked[0]['rank_score'] - ranked[1]['rank_score'] < settings.task_match_ambiguity_margin
+        )
+        
+        return {
+            'task': None if ambiguous else ranked[0],
+            'candidates': ranked,
+            'ambiguous': ambiguous
+        }
+    
     async def handle_general_query(self, user_input: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
         """Handle general queries about sites, status, etc."""
         # Implementation placeholder
@@ -777,13 +1515,37 @@ class NLPService:
         add_pattern = r'add\s+(.+?)(?:\s+to\s+(?:the\s+)?(?:equipment|supply|safety|list))?$'
         match = re.search(add_pattern, user_input, re.IGNORECASE)
         if match:
-            items_text = match.group(1)
-            # Split by common delimiters
-            items = re.split(r',\s*|\s+and\s+', items_text)
-            result['items'] = [item.strip() for item in items if item.strip()]
+            result['items'] = self.split_list_items(match.group(1))
         
         return result
     
+    def resolve_target_list(self, site_lists: List[Dict[str, Any]], list_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Pick the site list an extracted list type refers to.
+        
+        Args:
+            site_lists: Active lists for the site
+            list_type: Extracted list type (equipment, supplies, safety or general)
+            
+        Returns:
+            The matching list record, or None if the site has no such list
+        """
+        for target_type in self.LIST_TYPE_TARGETS.get(list_type, self.LIST_TYPE_TARGETS['general']):
+            for site_list in site_lists:
+                if site_list.get('list_type') == target_type:
+                    return site_list
+        return None
+    
+    def extract_similarity_query(self, user_input: str) -> str:
+        """Strip the "has this happened before?" phrasing, leaving the problem description."""
+        description = self.SIMILARITY_TRIGGER_PATTERN.sub(' ', user_input)
+        return re.sub(r'\s+', ' ', description).strip(' \t:;,.?!-')
+    
+    def split_list_items(self, items_text: str) -> List[str]:
+        """Split "X, Y and Z" into individual list items."""
+        items = re.split(r',\s*|\s+and\s+', items_text)
+        return [item.strip() for item in items if item.strip()]
+    
     def extract_list_type(self, user_input: str) -> str:
         """Extract list type from query."""
         if any(word in user_input.lower() for word in ['equipment', 'tool', 'gear']):
@@ -808,6 +1570,31 @@ class NLPService:
         }
         return emoji_map.get(report_type, '📝')
     
+    def extract_task_priority(self, title: str) -> tuple[str, str]:
+        """
+        Extract a priority marker from a task title.
+        
+        Supports Todoist-style p1-p4 markers and urgency words.
+        
+        Args:
+            title: Task title with date expressions already removed
+            
+        Returns:
+            Tuple of (FLRTS priority, title without the priority marker)
+        """
+        priority = 'Medium'
+        
+        marker = re.search(r'\s*\b[pP]([1-4])\b', title)
+        if marker:
+            priority = {'1': 'High', '2': 'High', '3': 'Medium', '4': 'Low'}[marker.group(1)]
+            title = (title[:marker.start()] + title[marker.end():]).strip()
+        elif re.search(r'\b(urgent|asap|emergency|high priority)\b', title, re.IGNORECASE):
+            priority = 'High'
+        elif re.search(r'\blow priority\b', title, re.IGNORECASE):
+            priority = 'Low'
+        
+        return priority, title
+    
     def extract_task_update_info(self, user_input: str) -> Dict[str, Any]:
         """Extract task reference and new status from input."""
         result = {}
@@ -829,7 +1616,7 @@ class NLPService:
                 return result
         
         # Check for other status updates
-        status_pattern = r'(?:update|change)\s+(?:task\s+)?(.+?)\s+(?:to|status\s+to)\s+(\w+)'
+        status_pattern = r'(?:update|change)\s+(?:task\s+)?(.+?)\s+(?:to|status\s+to)\s+([\w-]+)'
         match = re.search(status_pattern, user_input, re.IGNORECASE)
         if match:
             result['task_reference'] = match.group(1).strip()
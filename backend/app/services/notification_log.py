@@ -0,0 +1,301 @@
+"""
+10NetZero-FLRTS Notification Log Writer
+
+Every outbound notification is recorded in `notifications_log`. Writing one row per
+Telegram send through PostgREST would add a second network round trip to every
+message, so rows are buffered in memory per worker and written in multi-row inserts:
+
+1. A batch is flushed as soon as `notification_log_batch_size` rows are waiting, or
+   once the oldest row has waited `notification_log_flush_seconds`
+2. A failed insert is retried with exponential backoff; a batch that fails
+   `notification_log_max_attempts` times in a row is dropped and counted. When the
+   database rejects the rows themselves (a foreign key or length violation), the
+   batch is split instead, so only the offending rows are dropped
+3. At most `notification_log_max_buffered` rows are held; beyond that new rows are
+   dropped and counted rather than growing memory while the database is down
+4. Remaining rows are flushed when the worker shuts down
+
+recent_for_user() answers "what have we sent this user" from the table plus any rows
+still waiting in the buffer.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+
+
+class NotificationLogWriter:
+    """
+    Buffers notifications_log rows and writes them in batches from a daemon thread.
+    
+    record() is safe to call from any thread or event loop; it never touches the
+    database itself.
+    """
+    
+    def __init__(self):
+        """Initialize the writer from settings; the flush thread starts on first use."""
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = settings.notification_log_batch_size
+        self.flush_seconds = settings.notification_log_flush_seconds
+        self.max_buffered = settings.notification_log_max_buffered
+        self.max_attempts = settings.notification_log_max_attempts
+        self.backoff_base = 1.0
+        self.backoff_max = 60.0
+        
+        # (monotonic time recorded, row)
+        self._buffer: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self._in_flight: List[Dict[str, Any]] = []
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._full = False
+        self._retry_at = 0.0
+        self._failures = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._exit_hook = False
+        
+        self._stats = {
+            'recorded': 0,
+            'written': 0,
+            'batches': 0,
+            'retries': 0,
+            'dropped_full': 0,
+            'dropped_failed': 0,
+            'dropped_rejected': 0
+        }
+    
+    @property
+    def running(self) -> bool:
+        """True if the flush thread is alive in this process."""
+        return bool(self._thread and self._thread.is_alive() and self._pid == os.getpid())
+    
+    def start(self) -> bool:
+        """
+        Start the flush thread (idempotent, and restarted in forked workers).
+        
+        Returns:
+            True if the writer is running
+        """
+        with self._start_lock:
+            if self.running:
+                return True
+            
+            with self._condition:
+                self._stopping = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='notification-log', daemon=True)
+            self._thread.start()
+            
+            if not self._exit_hook:
+                atexit.register(self.stop)
+                self._exit_hook = True
+        
+        self.logger.info(
+            f"Notification log writer started (batches of {self.batch_size}, "
+            f"every {self.flush_seconds:g}s, up to {self.max_buffered} rows buffered)"
+        )
+        return True
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still buffered (one attempt per batch) and stop the thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self.running:
+            self._thread.join(timeout)
+    
+    def record(self, row: Dict[str, Any]) -> bool:
+        """
+        Buffer a notifications_log row.
+        
+        Args:
+            row: notifications_log columns (timestamp_sent, recipient_user_id, channel,
+                notification_type, message_content, status, ...)
+        
+        Returns:
+            True if the row was buffered, False if it was dropped because the buffer is full
+        """
+        if not self.running:
+            self.start()
+        
+        with self._condition:
+            if len(self._buffer) + len(self._in_flight) >= self.max_buffered:
+                self._stats['dropped_full'] += 1
+                if not self._full:
+                    self._full = True
+                    self.logger.warning(f"Notification log buffer full ({self.max_buffered} rows), dropping new rows")
+                return False
+            
+            self._full = False
+            self._buffer.append((time.monotonic(), row))
+            self._stats['recorded'] += 1
+            # The flush thread sleeps without a timeout while the buffer is empty
+            if len(self._buffer) == 1 or len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        return True
+    
+    def _next_batch(self) -> Optional[List[Dict[str, Any]]]:
+        """Wait until a batch is due and take it; None once stopped with nothing left."""
+        with self._condition:
+            while True:
+                if self._stopping:
+                    if not self._buffer:
+                        return None
+                    break
+                
+                now = time.monotonic()
+                if self._buffer and now >= self._retry_at:
+                    age = now - self._buffer[0][0]
+                    if len(self._buffer) >= self.batch_size or age >= self.flush_seconds:
+                        break
+                    timeout = self.flush_seconds - age
+                elif self._buffer:
+                    timeout = self._retry_at - now
+                else:
+                    timeout = None
+                self._condition.wait(timeout)
+            
+            count = min(self.batch_size, len(self._buffer))
+            self._in_flight = [self._buffer.popleft()[1] for _ in range(count)]
+            return self._in_flight
+    
+    def _run(self) -> None:
+        """Flush loop: write batches as they become due, retrying failed ones with backoff."""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            
+            written, rejected, unwritten, error = self._write(batch)
+            with self._condition:
+                self._stats['written'] += written
+                self._stats['dropped_rejected'] += rejected
+            
+            if unwritten:
+                self._failed(unwritten, error)
+                continue
+            
+            with self._condition:
+                self._in_flight = []
+                self._failures = 0
+                self._stats['batches'] += 1
+    
+    def _write(self, batch: List[Dict[str, Any]]) -> Tuple[int, int, List[Dict[str, Any]], Optional[Exception]]:
+        """
+        Insert a batch, splitting it in halves around rows the database rejects.
+        
+        Args:
+            batch: notifications_log rows
+        
+        Returns:
+            (rows written, rows rejected and dropped, rows left unwritten, the error
+            that stopped the write) - rows are left unwritten only when an insert
+            failed for another reason, e.g. the database is unreachable
+        """
+        written = rejected = 0
+        pending = [batch]
+        while pending:
+            rows = pending.pop()
+            try:
+                get_db_client().log_notifications(rows)
+                written += len(rows)
+            except Exception as e:
+                if not _rejects_rows(e):
+                    return written, rejected, rows + [row for part in reversed(pending) for row in part], e
+                if len(rows) == 1:
+                    rejected += 1
+                    self.logger.error(f"Dropping a notifications_log row the database rejected: {e}")
+                else:
+                    middle = len(rows) // 2
+                    pending.extend((rows[middle:], rows[:middle]))
+        return written, rejected, [], None
+    
+    def _failed(self, batch: List[Dict[str, Any]], error: Exception) -> None:
+        """Put a failed batch back at the front of the buffer, or drop it after too many attempts."""
+        with self._condition:
+            self._in_flight = []
+            self._failures += 1
+            
+            if self._stopping or self._failures >= self.max_attempts:
+                self._failures = 0
+                self._stats['dropped_failed'] += len(batch)
+                self.logger.error(f"Dropping {len(batch)} notifications_log rows after failed insert: {error}")
+                return
+            
+            now = time.monotonic()
+            self._buffer.extendleft((now, row) for row in reversed(batch))
+            self._retry_at = now + min(self.backoff_base * 2 ** (self._failures - 1), self.backoff_max)
+            self._stats['retries'] += 1
+            self.logger.warning(
+                f"Could not write {len(batch)} notifications_log rows (attempt {self._failures}), "
+                f"retrying in {self._retry_at - now:.1f}s: {error}"
+            )
+    
+    def recent_for_user(self, user_id: str, limit: int = 20,
+                        notification_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Most recent notifications sent to a user, including rows not yet written.
+        
+        Args:
+            user_id: flrts_users ID of the recipient
+            limit: Maximum number of notifications
+            notification_type: Only return this notification_type
+        
+        Returns:
+            Notification rows, newest first; rows still buffered have pending=True
+        """
+        with self._condition:
+            pending = [
+                dict(row, pending=True)
+                for row in self._in_flight + [row for _, row in self._buffer]
+                if row.get('recipient_user_id') == user_id
+                and (notification_type is None or row.get('notification_type') == notification_type)
+            ]
+        
+        stored = get_db_client().get_recent_notifications(user_id, limit, notification_type)
+        rows = sorted(pending + stored, key=lambda row: _sent_at(row.get('timestamp_sent')), reverse=True)
+        return rows[:limit]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return buffer and write statistics for the metrics endpoint."""
+        with self._condition:
+            return dict(
+                self._stats,
+                running=self.running,
+                buffered=len(self._buffer) + len(self._in_flight),
+                capacity=self.max_buffered,
+                consecutive_failures=self._failures
+            )
+
+
+def _rejects_rows(error: BaseException) -> bool:
+    """True if PostgreSQL refused the rows themselves (SQLSTATE class 22 data exception or 23 constraint violation)."""
+    while error is not None:
+        code = getattr(error, 'code', None)
+        if isinstance(code, str) and code[:2] in ('22', '23'):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _sent_at(value: Any) -> datetime:
+    """Sort key for timestamp_sent values, which may be datetimes or ISO strings."""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return datetime.min.replace(tzinfo=timezone.utc)
+
+
+# Global notification log writer instance
+notification_log = NotificationLogWriter()
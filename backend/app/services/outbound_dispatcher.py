@@ -0,0 +1,367 @@
+"""
+10NetZero-FLRTS Outbound Telegram Dispatcher
+
+Bot replies used to be sent inline from the handlers with `context.bot.send_message`.
+Under bursts (many users at once, broadcasts, digests) that runs into Telegram's
+limits - roughly 30 messages per second per bot and about one per second per chat -
+and a 429 or a network blip simply lost the message.
+
+Handlers now enqueue replies here and return. The dispatcher runs on its own event
+loop in a daemon thread and:
+1. Keeps one ordered lane per chat, so a chat's messages arrive in the order sent
+2. Paces each chat with a small token bucket and all chats with a global one
+3. Honours `retry_after` on 429 by pausing all sends (up to
+   `telegram_send_max_rate_limited_attempts` times per message), and retries
+   network errors and chat migrations up to `telegram_send_max_attempts`; a reply whose
+   Markdown/HTML cannot be parsed (user text with `_`, `*`, `[`) is resent once
+   as plain text
+4. Records sends to registered users in `notifications_log` through the buffered
+   notification log writer
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
+
+from config.settings import settings
+from app.services.notification_log import notification_log
+from app.services.pipeline_metrics import LatencyHistogram
+from app.services.rate_limiter import InMemoryTokenBucketBackend
+
+
+GLOBAL_BUCKET = 'telegram:global'
+
+
+@dataclass(eq=False)
+class OutboundMessage:
+    """A queued reply and what to record about it once it is sent."""
+    chat_id: int
+    text: str
+    options: Dict[str, Any] = field(default_factory=dict)
+    recipient_user_id: Optional[str] = None
+    notification_type: str = 'Other'
+    subject: Optional[str] = None
+    related_task_id: Optional[str] = None
+    related_field_report_id: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    attempts: int = 0
+    rate_limited: int = 0
+    result: concurrent.futures.Future = field(default_factory=concurrent.futures.Future)
+
+
+class TelegramDispatcher:
+    """
+    Rate-limited, retrying sender for outbound Telegram messages.
+    
+    enqueue() is safe to call from any thread; sends always happen on the
+    dispatcher's own loop, which owns the Bot and its HTTP connection pool.
+    """
+    
+    def __init__(self, sender: Optional[Callable[[OutboundMessage], Awaitable[Any]]] = None):
+        """
+        Initialize the dispatcher from settings; the loop thread starts in start().
+        
+        Args:
+            sender: Coroutine function that delivers one message (defaults to Bot.send_message)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.rate_per_second = settings.telegram_send_rate_per_second
+        self.chat_interval = settings.telegram_send_chat_interval_seconds
+        self.chat_burst = settings.telegram_send_chat_burst
+        self.concurrency = settings.telegram_send_concurrency
+        self.max_queue = settings.telegram_send_queue_size
+        self.max_attempts = settings.telegram_send_max_attempts
+        self.max_rate_limited = settings.telegram_send_max_rate_limited_attempts
+        
+        self._sender = sender
+        self._bot: Optional[Bot] = None
+        self._buckets = InMemoryTokenBucketBackend()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lanes: Dict[int, Deque[OutboundMessage]] = {}
+        self._paused_until = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        
+        self._stats_lock = threading.Lock()
+        self._depth = 0
+        self._latency = LatencyHistogram()
+        self._stats = {
+            'enqueued': 0,
+            'sent': 0,
+            'failed': 0,
+            'dropped': 0,
+            'retried': 0,
+            'rate_limited': 0,
+            'plain_text_fallbacks': 0
+        }
+    
+    @property
+    def running(self) -> bool:
+        """True if the loop thread is alive in this process."""
+        return bool(self._thread and self._thread.is_alive() and self._pid == os.getpid())
+    
+    def start(self, timeout: float = 5.0) -> bool:
+        """
+        Start the loop thread (idempotent, and restarted in forked workers).
+        
+        Args:
+            timeout: Seconds to wait for the loop to come up
+        
+        Returns:
+            True if the dispatcher is running
+        """
+        with self._start_lock:
+            if self.running:
+                return True
+            
+            self._ready.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run_loop, name='telegram-outbound', daemon=True)
+            self._thread.start()
+        
+        if not self._ready.wait(timeout):
+            self.logger.error("Telegram outbound loop did not start in time")
+            return False
+        
+        self.logger.info(
+            f"Telegram dispatcher started ({self.rate_per_second:g} msg/s, "
+            f"{self.chat_interval:g}s per chat, {self.concurrency} concurrent sends)"
+        )
+        return True
+    
+    def _run_loop(self) -> None:
+        """Thread body: own an event loop for the life of the process."""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._lanes = {}
+        self._ready.set()
+        
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+    
+    def enqueue(self, chat_id: int, text: str, recipient_user_id: Optional[str] = None,
+                notification_type: str = 'Other', subject: Optional[str] = None,
+                related_task_id: Optional[str] = None, related_field_report_id: Optional[str] = None,
+                **options) -> Optional[concurrent.futures.Future]:
+        """
+        Queue a message for delivery.
+        
+        Args:
+            chat_id: Telegram chat to send to
+            text: Message text
+            recipient_user_id: flrts_users.id of the recipient; sends are logged only when set
+            notification_type: notifications_log.notification_type of the message
+            subject: Optional notifications_log.subject_or_title
+            related_task_id: Task the message is about, if any
+            related_field_report_id: Field report the message is about, if any
+            options: Further send_message arguments (parse_mode, reply_markup, ...)
+        
+        Returns:
+            Future resolving to the sent message (or raising the final error), or
+            None if the queue is full and the message was dropped
+        """
+        if not self.running and not self.start():
+            return None
+        
+        with self._stats_lock:
+            if self._depth >= self.max_queue:
+                self._stats['dropped'] += 1
+                self.logger.warning(f"Telegram outbound queue full, dropping message to chat {chat_id}")
+                return None
+            self._depth += 1
+            self._stats['enqueued'] += 1
+        
+        message = OutboundMessage(
+            chat_id=chat_id,
+            text=text,
+            options={key: value for key, value in options.items() if value is not None},
+            recipient_user_id=recipient_user_id,
+            notification_type=notification_type,
+            subject=subject,
+            related_task_id=related_task_id,
+            related_field_report_id=related_field_report_id
+        )
+        self._loop.call_soon_threadsafe(self._dispatch, message)
+        return message.result
+    
+    def _dispatch(self, message: OutboundMessage) -> None:
+        """Append a message to its chat's lane, starting the lane if needed (runs on the loop)."""
+        lane = self._lanes.get(message.chat_id)
+        if lane is not None:
+            lane.append(message)
+            return
+        
+        self._lanes[message.chat_id] = deque([message])
+        self._loop.create_task(self._drain(message.chat_id))
+    
+    async def _drain(self, chat_id: int) -> None:
+        """Send one chat's messages in order, then retire the lane."""
+        lane = self._lanes[chat_id]
+        try:
+            while lane:
+                message = lane.popleft()
+                await self._deliver(message)
+        finally:
+            # _dispatch runs on this loop too, so nothing can be appended after the last check
+            del self._lanes[chat_id]
+    
+    async def _wait_for_turn(self, chat_id: int) -> None:
+        """Wait for the chat's pacing, any 429 pause, and a global send token."""
+        _, wait = self._buckets.reserve(
+            f"telegram:chat:{chat_id}", 1.0 / self.chat_interval, float(self.chat_burst), 1.0, float('inf')
+        )
+        if wait > 0:
+            await asyncio.sleep(wait)
+        
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        
+        _, wait = self._buckets.reserve(GLOBAL_BUCKET, self.rate_per_second, self.rate_per_second, 1.0, float('inf'))
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    async def _deliver(self, message: OutboundMessage) -> None:
+        """Send one message, retrying 429s and transient errors, and resolve its future."""
+        while True:
+            await self._wait_for_turn(message.chat_id)
+            message.attempts += 1
+            
+            try:
+                async with self._slots:
+                    sent = await self._send(message)
+            
+            except RetryAfter as e:
+                # Telegram's flood control applies to the bot as a whole
+                self._paused_until = max(self._paused_until, time.monotonic() + float(e.retry_after))
+                self._record('rate_limited')
+                self.logger.warning(f"Telegram rate limit hit, pausing sends for {e.retry_after}s")
+                message.rate_limited += 1
+                if message.rate_limited >= self.max_rate_limited:
+                    self._finish(message, error=e)
+                    return
+                continue
+            
+            except ChatMigrated as e:
+                if message.attempts - message.rate_limited >= self.max_attempts:
+                    self._finish(message, error=e)
+                    return
+                message.chat_id = e.new_chat_id
+                self._record('retried')
+                continue
+            
+            except BadRequest as e:
+                # Permanent for this message (BadRequest subclasses NetworkError), except that
+                # user-supplied titles often break Markdown and the text is still worth sending
+                if message.options.get('parse_mode') and "can't parse entities" in str(e).lower():
+                    message.options.pop('parse_mode')
+                    self._record('plain_text_fallbacks')
+                    self.logger.warning(f"Resending message to chat {message.chat_id} without formatting: {e}")
+                    continue
+                self._finish(message, error=e)
+                return
+            
+            except Forbidden as e:
+                # The user blocked the bot or left the chat
+                self._finish(message, error=e)
+                return
+            
+            except NetworkError as e:
+                if message.attempts - message.rate_limited >= self.max_attempts:
+                    self._finish(message, error=e)
+                    return
+                self._record('retried')
+                await asyncio.sleep(min(2 ** (message.attempts - 1), 30))
+                continue
+            
+            except Exception as e:
+                self._finish(message, error=e)
+                return
+            
+            self._finish(message, sent=sent)
+            return
+    
+    async def _send(self, message: OutboundMessage) -> Any:
+        """Deliver a message through the configured sender or the dispatcher's Bot."""
+        if self._sender:
+            return await self._sender(message)
+        
+        if self._bot is None:
+            bot = Bot(settings.telegram_bot_token, request=HTTPXRequest(connection_pool_size=self.concurrency))
+            await bot.initialize()
+            self._bot = bot
+        
+        return await self._bot.send_message(chat_id=message.chat_id, text=message.text, **message.options)
+    
+    def _finish(self, message: OutboundMessage, sent: Any = None, error: Optional[BaseException] = None) -> None:
+        """Resolve a message's future, update counters and record its notifications_log row."""
+        with self._stats_lock:
+            self._depth -= 1
+            self._stats['failed' if error else 'sent'] += 1
+            if not error:
+                self._latency.observe((time.perf_counter() - message.enqueued_at) * 1000)
+        
+        if error:
+            level = logging.WARNING if isinstance(error, TelegramError) else logging.ERROR
+            self.logger.log(level, f"Telegram send to chat {message.chat_id} failed after {message.attempts} attempts: {error}")
+            message.result.set_exception(error)
+        else:
+            message.result.set_result(sent)
+        
+        if message.recipient_user_id:
+            notification_log.record({
+                'timestamp_sent': datetime.now(timezone.utc).isoformat(),
+                'recipient_user_id': message.recipient_user_id,
+                'channel': 'Telegram',
+                'notification_type': message.notification_type,
+                'subject_or_title': message.subject[:255] if message.subject else None,
+                'message_content': message.text,
+                'status': 'Failed' if error else 'Sent',
+                'related_task_id': message.related_task_id,
+                'related_field_report_id': message.related_field_report_id
+            })
+    
+    def _record(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[counter] += amount
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the loop; queued messages are discarded."""
+        if self._loop and self.running:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue, retry and latency statistics for the metrics endpoint."""
+        with self._stats_lock:
+            return dict(
+                self._stats,
+                running=self.running,
+                queue_depth=self._depth,
+                queue_capacity=self.max_queue,
+                active_chats=len(self._lanes),
+                paused_seconds=round(max(0.0, self._paused_until - time.monotonic()), 1),
+                send_latency=self._latency.snapshot()
+            )
+
+
+# Global outbound Telegram dispatcher instance
+telegram_dispatcher = TelegramDispatcher()
@@ -0,0 +1,224 @@
+"""
+10NetZero-FLRTS Pipeline Latency Metrics
+
+This module times the stages of the NLP pipeline (rate limiting, intent
+classification, LLM calls, date parsing, database calls, ...) so a slow reply can be
+attributed to the stage that caused it.
+
+A trace is started per request in NLPService.process_user_input and held in a
+context variable, so spans opened anywhere below it - including database client
+methods and code run through asyncio.to_thread - attach to the right request.
+When the request finishes, its spans are folded into fixed-bucket histograms keyed
+by (intent, stage) under a single lock acquisition. Outside a trace a span is a
+no-op, which keeps the overhead on other code paths to one context variable lookup.
+"""
+
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is unbounded)
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Request header that asks /api/nlp/process to return stage timings
+DEBUG_HEADER = 'X-FLRTS-Debug'
+
+
+class PipelineTrace:
+    """Spans recorded for a single pipeline request."""
+    
+    __slots__ = ('started', 'spans', 'intent')
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.intent: Optional[str] = None
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the spans in completion order with the total request time."""
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'stages': [{'stage': stage, 'ms': round(ms, 3)} for stage, ms in self.spans]
+        }
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+    
+    __slots__ = ('buckets', 'count', 'total_ms', 'max_ms')
+    
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def observe(self, ms: float) -> None:
+        """Record one duration."""
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+    
+    def percentile(self, quantile: float) -> float:
+        """Estimate a percentile as the upper bound of its bucket (capped at the maximum)."""
+        if not self.count:
+            return 0.0
+        
+        rank = quantile * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and index < len(BUCKET_BOUNDS_MS):
+                return round(min(float(BUCKET_BOUNDS_MS[index]), self.max_ms), 3)
+        return round(self.max_ms, 3)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return summary statistics and the raw bucket counts."""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(0.50),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': {
+                (f"le_{bound}" if index < len(BUCKET_BOUNDS_MS) else 'inf'): self.buckets[index]
+                for index, bound in enumerate(BUCKET_BOUNDS_MS + (None,))
+            }
+        }
+
+
+class PipelineMetrics:
+    """
+    Per-intent, per-stage latency histograms for the NLP pipeline.
+    
+    Usage:
+        token = pipeline_metrics.start_trace()
+        with pipeline_metrics.span('classify_intent'):
+            ...
+        pipeline_metrics.set_intent('create_task')
+        timings = pipeline_metrics.finish_trace(token)
+    """
+    
+    def __init__(self):
+        self._current: contextvars.ContextVar[Optional[PipelineTrace]] = contextvars.ContextVar(
+            'flrts_pipeline_trace', default=None
+        )
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+    
+    def start_trace(self) -> contextvars.Token:
+        """
+        Start timing a request in the current context.
+        
+        Returns:
+            Token to pass to finish_trace()
+        """
+        return self._current.set(PipelineTrace())
+    
+    def set_intent(self, intent: str) -> None:
+        """Label the current trace with the classified intent."""
+        trace = self._current.get()
+        if trace is not None:
+            trace.intent = intent
+    
+    def finish_trace(self, token: contextvars.Token) -> Dict[str, Any]:
+        """
+        End the current trace and fold its spans into the histograms.
+        
+        Requests that end before classification (e.g. rate limited) are
+        recorded under the 'unclassified' intent.
+        
+        Args:
+            token: Token returned by start_trace()
+        
+        Returns:
+            Stage timings of the finished request
+        """
+        trace = self._current.get()
+        self._current.reset(token)
+        if trace is None:
+            return {'total_ms': 0.0, 'stages': []}
+        
+        timings = trace.as_dict()
+        intent_key = trace.intent or 'unclassified'
+        
+        with self._lock:
+            stages = self._histograms.setdefault(intent_key, {})
+            for stage, ms in trace.spans:
+                histogram = stages.get(stage)
+                if histogram is None:
+                    histogram = stages[stage] = LatencyHistogram()
+                histogram.observe(ms)
+            
+            total = stages.get('total')
+            if total is None:
+                total = stages['total'] = LatencyHistogram()
+            total.observe(timings['total_ms'])
+        
+        return timings
+    
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """
+        Time a block as a pipeline stage (no-op outside a trace).
+        
+        Args:
+            stage: Stage name, e.g. 'classify_intent' or 'db.create_task'
+        """
+        trace = self._current.get()
+        if trace is None:
+            yield
+            return
+        
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.spans.append((stage, (time.perf_counter() - started) * 1000))
+    
+    def timed(self, stage: str):
+        """
+        Decorator that times every call of a synchronous function as a stage.
+        
+        Args:
+            stage: Stage name recorded for each call
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                trace = self._current.get()
+                if trace is None:
+                    return func(*args, **kwargs)
+                
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    trace.spans.append((stage, (time.perf_counter() - started) * 1000))
+            return wrapper
+        return decorator
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return histogram snapshots grouped by intent, then stage."""
+        with self._lock:
+            return {
+                intent: {stage: histogram.snapshot() for stage, histogram in stages.items()}
+                for intent, stages in self._histograms.items()
+            }
+    
+    def reset(self) -> None:
+        """Discard all recorded histograms."""
+        with self._lock:
+            self._histograms.clear()
+
+
+# Global pipeline metrics instance
+pipeline_metrics = PipelineMetrics()
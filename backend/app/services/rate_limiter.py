@@ -0,0 +1,377 @@
+"""
+10NetZero-FLRTS Rate Limiting Service
+
+This module enforces request rate limits and bounds concurrent LLM usage so that a
+single user (or a single API integration) cannot saturate the shared OpenAI quota.
+
+It provides:
+1. Token buckets keyed per user and per API key (settings.rate_limit_per_minute)
+2. Bounded queueing - requests that would exceed the rate wait for a token when the
+   wait is short, and are rejected with a retry hint when it is not
+3. A global concurrency limiter around LLM calls, usable from any event loop
+4. An in-memory backend (per worker) and an optional Redis backend shared by all
+   workers of a deployment (configured with RATE_LIMIT_REDIS_URL)
+"""
+
+import asyncio
+import collections
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from config.settings import settings
+
+try:
+    import redis
+except ImportError:  # Redis is optional; the in-memory backend is always available
+    redis = None
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request exceeds its rate limit and cannot be queued."""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMCapacityError(RateLimitExceeded):
+    """Raised when no LLM concurrency slot becomes available in time."""
+    pass
+
+
+class InMemoryTokenBucketBackend:
+    """
+    Token bucket state held in worker memory.
+    
+    Each bucket refills continuously at `rate` tokens per second up to `capacity`.
+    Reservations may take the balance below zero (up to the maximum wait), which
+    is what allows callers to queue for a token instead of being rejected.
+    """
+    
+    name = 'memory'
+    max_buckets = 10000
+    
+    def __init__(self):
+        """Initialize empty bucket storage."""
+        self._lock = threading.Lock()
+        # key -> [tokens, updated, rate, capacity]; one backend holds buckets of different rates
+        self._buckets: Dict[str, list] = {}
+    
+    def reserve(self, key: str, rate: float, capacity: float, cost: float, max_wait: float) -> Tuple[bool, float]:
+        """
+        Reserve tokens from a bucket.
+        
+        Args:
+            key: Bucket key (e.g. "user:<uuid>")
+            rate: Refill rate in tokens per second
+            capacity: Maximum number of stored tokens (burst size)
+            cost: Tokens required by this request
+            max_wait: Longest acceptable wait for the tokens, in seconds
+        
+        Returns:
+            Tuple of (granted, seconds). When granted, seconds is how long the caller
+            must wait before proceeding; otherwise it is the suggested retry delay.
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._evict_full_buckets(now)
+                bucket = [capacity, now, rate, capacity]
+                self._buckets[key] = bucket
+            
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1:] = [now, rate, capacity]
+            remaining = tokens - cost
+            wait = -remaining / rate if remaining < 0 else 0.0
+            
+            if wait > max_wait:
+                bucket[0] = tokens
+                return False, wait
+            
+            bucket[0] = remaining
+            return True, wait
+    
+    def _evict_full_buckets(self, now: float) -> None:
+        """Drop buckets that have refilled completely at their own rate; they carry no state."""
+        idle = [key for key, (tokens, updated, rate, capacity) in self._buckets.items()
+                if tokens + (now - updated) * rate >= capacity]
+        for key in idle:
+            del self._buckets[key]
+
+
+class RedisTokenBucketBackend:
+    """
+    Token bucket state shared across workers and hosts through Redis.
+    
+    The refill-and-reserve step runs as a Lua script so it is atomic, and uses the
+    Redis server clock so that hosts with skewed clocks agree on refill timing.
+    """
+    
+    name = 'redis'
+    
+    RESERVE_SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local max_wait = tonumber(ARGV[4])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    
+    local remaining = tokens - cost
+    local wait = 0
+    if remaining < 0 then
+        wait = -remaining / rate
+    end
+    
+    local granted = 1
+    if wait > max_wait then
+        granted = 0
+        remaining = tokens
+    end
+    
+    redis.call('HSET', KEYS[1], 'tokens', tostring(remaining), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + math.ceil(max_wait) + 1)
+    return {granted, tostring(wait)}
+    """
+    
+    def __init__(self, url: str, key_prefix: str = 'flrts:ratelimit:'):
+        """
+        Initialize the Redis backend.
+        
+        Args:
+            url: Redis connection URL
+            key_prefix: Prefix applied to every bucket key
+        """
+        if redis is None:
+            raise RuntimeError("The redis package is required for the shared rate limit backend")
+        
+        self.client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+        self._script = self.client.register_script(self.RESERVE_SCRIPT)
+    
+    def reserve(self, key: str, rate: float, capacity: float, cost: float, max_wait: float) -> Tuple[bool, float]:
+        """Reserve tokens from a shared bucket (see InMemoryTokenBucketBackend.reserve)."""
+        granted, wait = self._script(
+            keys=[f"{self.key_prefix}{key}"],
+            args=[rate, capacity, cost, max_wait]
+        )
+        return bool(int(granted)), float(wait)
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the number of concurrent operations across threads and event loops.
+    
+    asyncio.Semaphore is bound to a single event loop, but LLM calls are issued
+    from Flask request loops and the Telegram processing loop at the same time.
+    This limiter keeps its state under a thread lock and wakes waiters on their
+    own loop, handing released slots over in FIFO order.
+    """
+    
+    def __init__(self, name: str, limit: int):
+        """
+        Initialize the limiter.
+        
+        Args:
+            name: Name used in logs and statistics
+            limit: Maximum number of concurrent holders
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.limit = max(1, limit)
+        
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = collections.deque()
+        self._stats = {'acquired': 0, 'queued': 0, 'timeouts': 0, 'max_wait_seconds': 0.0}
+    
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Acquire a slot, waiting up to `timeout` seconds.
+        
+        Raises:
+            LLMCapacityError: If no slot became available in time
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self._stats['acquired'] += 1
+                return
+            
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+            self._stats['queued'] += 1
+        
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                except ValueError:
+                    # A slot was handed over while timing out; _grant passes it on
+                    pass
+                self._stats['timeouts'] += 1
+            raise LLMCapacityError(
+                f"No {self.name} capacity available within {timeout}s",
+                retry_after=timeout or 1.0
+            )
+        
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats['acquired'] += 1
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], round(waited, 3))
+    
+    def release(self) -> None:
+        """Release a slot, handing it to the oldest waiter if there is one."""
+        with self._lock:
+            if self._waiters:
+                loop, waiter = self._waiters.popleft()
+            else:
+                self._active -= 1
+                return
+        
+        # The slot transfers to the waiter; _active stays unchanged
+        loop.call_soon_threadsafe(self._grant, waiter)
+    
+    def _grant(self, waiter: asyncio.Future) -> None:
+        """Complete a waiter on its own loop, or pass the slot on if it gave up."""
+        if waiter.done():
+            self.release()
+        else:
+            waiter.set_result(True)
+    
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None):
+        """Async context manager holding one slot for the duration of the block."""
+        await self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return limiter statistics for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'active': self._active, 'waiting': len(self._waiters), 'limit': self.limit})
+        return stats
+
+
+class RateLimiter:
+    """
+    Per-user and per-API-key rate limiting for the FLRTS backend.
+    
+    Uses the shared Redis backend when RATE_LIMIT_REDIS_URL is configured and
+    falls back to per-worker memory otherwise (or when Redis is unreachable).
+    """
+    
+    def __init__(self):
+        """Initialize the limiter with the configured backend."""
+        self.logger = logging.getLogger(__name__)
+        self.local_backend = InMemoryTokenBucketBackend()
+        self.shared_backend = None
+        
+        if settings.rate_limit_redis_url:
+            try:
+                self.shared_backend = RedisTokenBucketBackend(settings.rate_limit_redis_url)
+                self.logger.info("Rate limiter using shared Redis backend")
+            except Exception as e:
+                self.logger.warning(f"Shared rate limit backend unavailable, using in-memory buckets: {e}")
+        
+        self._lock = threading.Lock()
+        self._stats = {'allowed': 0, 'queued': 0, 'rejected': 0, 'backend_errors': 0}
+    
+    def _reserve(self, key: str, cost: float, max_wait: float,
+                 per_minute: Optional[int] = None, burst: Optional[int] = None) -> Tuple[bool, float]:
+        """Reserve tokens from the active backend."""
+        rate = (per_minute or settings.rate_limit_per_minute) / 60.0
+        capacity = float(burst or settings.rate_limit_burst)
+        
+        if self.shared_backend is not None:
+            try:
+                return self.shared_backend.reserve(key, rate, capacity, cost, max_wait)
+            except Exception as e:
+                self.logger.warning(f"Shared rate limit backend error, falling back to memory: {e}")
+                self._record('backend_errors')
+        
+        return self.local_backend.reserve(key, rate, capacity, cost, max_wait)
+    
+    async def acquire(self, key: str, cost: float = 1.0, max_wait: Optional[float] = None, **limits) -> float:
+        """
+        Take tokens for a request, queueing briefly if the bucket is empty.
+        
+        Args:
+            key: Bucket key, e.g. "user:<flrts_user_id>" or "api_key:<key>"
+            cost: Tokens consumed by this request
+            max_wait: Longest acceptable queueing delay in seconds
+            limits: Optional per_minute / burst overrides for this bucket
+        
+        Returns:
+            Number of seconds spent waiting for the tokens
+        
+        Raises:
+            RateLimitExceeded: If the request cannot be served within max_wait
+        """
+        if max_wait is None:
+            max_wait = settings.rate_limit_max_wait_seconds
+        
+        granted, wait = self._reserve(key, cost, max_wait, **limits)
+        
+        if not granted:
+            self._record('rejected')
+            raise RateLimitExceeded(f"Rate limit exceeded for {key}", retry_after=wait)
+        
+        if wait > 0:
+            self._record('queued')
+            await asyncio.sleep(wait)
+        
+        self._record('allowed')
+        return wait
+    
+    def try_acquire(self, key: str, cost: float = 1.0, **limits) -> None:
+        """
+        Take tokens without waiting (for synchronous request handlers).
+        
+        Raises:
+            RateLimitExceeded: If the bucket does not hold enough tokens
+        """
+        granted, wait = self._reserve(key, cost, 0.0, **limits)
+        
+        if not granted:
+            self._record('rejected')
+            raise RateLimitExceeded(f"Rate limit exceeded for {key}", retry_after=wait)
+        
+        self._record('allowed')
+    
+    def _record(self, counter: str) -> None:
+        """Increment a statistics counter."""
+        with self._lock:
+            self._stats[counter] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return rate limiting statistics for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+        
+        stats['backend'] = self.shared_backend.name if self.shared_backend else self.local_backend.name
+        return stats
+
+
+# Global rate limiting instances
+rate_limiter = RateLimiter()
+llm_concurrency = ConcurrencyLimiter('llm', settings.llm_max_concurrency)
@@ -0,0 +1,387 @@
+"""
+10NetZero-FLRTS Reminder Engine
+
+Task creation stores reminders as `Scheduled` rows in the `reminders` table; this
+module delivers them through Telegram when they fall due.
+
+A daemon thread per worker process loads the reminders due within the next
+`reminder_window_seconds` (a range read on idx_reminders_datetime, so each poll costs
+the same however large the table grows) into a heap ordered by due time, and sleeps
+until the earliest one. Due reminders are claimed in one statement that only succeeds
+for rows still Scheduled at the time they were loaded, so several workers never
+deliver the same reminder twice. One-off reminders become `Sent`; recurring ones are
+expanded lazily - only the next occurrence of `recurrence_rule` is computed, in the
+user's timezone, and written back as the new reminder_date_time. Sends that finally
+fail are marked `Error` in batches.
+
+Reminders that are more than `reminder_max_lateness_seconds` overdue (e.g. created
+before delivery existed, or due while no worker was up) are not sent: the periodic
+`reminder_expiry` job marks one-off ones `Error` and moves recurring ones on to their
+next future occurrence.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from dateutil.rrule import rrulestr
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+from app.services.date_parser import date_parser
+from app.services.outbound_dispatcher import telegram_dispatcher
+
+
+def next_occurrence(reminder: Dict[str, Any], after: datetime) -> Optional[datetime]:
+    """
+    Compute the next occurrence of a recurring reminder.
+    
+    The rule is evaluated in the recipient's timezone so "every monday at 9am"
+    stays at 9am local time across DST changes.
+    
+    Args:
+        reminder: Reminder row (reminder_date_time, is_recurring, recurrence_rule, timezone)
+        after: Return the first occurrence strictly after this moment
+    
+    Returns:
+        Next occurrence in UTC, or None if the reminder does not recur (any more)
+    """
+    if not reminder.get('is_recurring') or not reminder.get('recurrence_rule'):
+        return None
+    
+    zone = date_parser.get_timezone(reminder.get('timezone'))
+    start = reminder['reminder_date_time'].astimezone(zone)
+    
+    try:
+        rule = rrulestr(reminder['recurrence_rule'], dtstart=start)
+    except (ValueError, TypeError) as e:
+        logging.getLogger(__name__).warning(
+            f"Invalid recurrence rule on reminder {reminder.get('id')}: {reminder['recurrence_rule']} ({e})"
+        )
+        return None
+    
+    upcoming = rule.after(after.astimezone(zone))
+    return upcoming.astimezone(timezone.utc) if upcoming else None
+
+
+class ReminderEngine:
+    """
+    Loads upcoming reminders in windows and fires them from an in-memory heap.
+    """
+    
+    CLAIM_RETRY_SECONDS = 5.0
+    
+    def __init__(self):
+        """Initialize the engine from settings; the thread starts in start()."""
+        self.logger = logging.getLogger(__name__)
+        self.window = timedelta(seconds=settings.reminder_window_seconds)
+        self.poll_interval = settings.reminder_poll_seconds
+        self.max_lateness = timedelta(seconds=settings.reminder_max_lateness_seconds)
+        self.batch_size = settings.reminder_batch_size
+        
+        self._heap: List[Tuple[float, str]] = []
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._loaded_until: Optional[datetime] = None
+        self._failed: List[str] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'polls': 0,
+            'loaded': 0,
+            'fired': 0,
+            'claim_conflicts': 0,
+            'rescheduled': 0,
+            'send_failures': 0,
+            'expired': 0,
+            'errors': 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """Delivery needs the engine switched on and a direct PostgreSQL connection."""
+        return settings.reminder_engine_enabled and bool(settings.database_url or settings.postgres_password)
+    
+    def start(self) -> bool:
+        """
+        Start the engine thread (idempotent).
+        
+        Returns:
+            True if the engine is running
+        """
+        if not self.enabled:
+            self.logger.info("Reminder engine disabled")
+            return False
+        
+        if self._thread and self._thread.is_alive():
+            return True
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='reminder-engine', daemon=True)
+        self._thread.start()
+        self.logger.info(
+            f"Reminder engine started (window {self.window.total_seconds():g}s, poll {self.poll_interval:g}s)"
+        )
+        return True
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the engine thread; unfired reminders stay Scheduled in the database."""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def schedule(self, reminder: Dict[str, Any]) -> bool:
+        """
+        Add a reminder created in this process without waiting for the next poll.
+        
+        Reminders due after the loaded window are left to a later poll.
+        
+        Args:
+            reminder: Reminder row including telegram_id (and timezone for recurring ones)
+        
+        Returns:
+            True if the reminder was put on the heap
+        """
+        due = reminder['reminder_date_time']
+        if isinstance(due, str):
+            due = datetime.fromisoformat(due)
+        if due.tzinfo is None:
+            due = due.replace(tzinfo=timezone.utc)
+        
+        with self._condition:
+            if self._loaded_until is None or due >= self._loaded_until or reminder['id'] in self._pending:
+                return False
+            self._push(dict(reminder, reminder_date_time=due))
+            self._condition.notify()
+        return True
+    
+    def _push(self, reminder: Dict[str, Any]) -> None:
+        """Track a reminder and put it on the heap (called with the condition held)."""
+        self._pending[reminder['id']] = reminder
+        heapq.heappush(self._heap, (reminder['reminder_date_time'].timestamp(), reminder['id']))
+    
+    def _run(self) -> None:
+        """Engine loop: poll windows, fire due reminders, sleep until the next event."""
+        next_poll = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_poll:
+                    next_poll = time.monotonic() + self.poll_interval
+                    self.load_window()
+                
+                self.fire_due()
+                self.flush_failures()
+            except Exception as e:
+                self._record('errors')
+                self.logger.error(f"Reminder engine pass failed: {e}")
+            
+            with self._condition:
+                timeout = next_poll - time.monotonic()
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - time.time())
+                if timeout > 0 and not self._stop.is_set():
+                    self._condition.wait(timeout)
+    
+    def load_window(self, now: Optional[datetime] = None) -> int:
+        """
+        Load every Scheduled reminder due before now + window onto the heap.
+        
+        Args:
+            now: Current time (defaults to the clock)
+        
+        Returns:
+            Number of reminders newly added
+        """
+        now = now or datetime.now(timezone.utc)
+        end = now + self.window
+        db = get_db_client()
+        added = 0
+        after = None
+        
+        while True:
+            page = db.get_scheduled_reminders(end=end, start=now - self.max_lateness, limit=self.batch_size, after=after)
+            with self._condition:
+                for reminder in page:
+                    if reminder['id'] not in self._pending:
+                        self._push(reminder)
+                        added += 1
+            if len(page) < self.batch_size:
+                break
+            after = (page[-1]['reminder_date_time'], page[-1]['id'])
+        
+        with self._condition:
+            self._loaded_until = end
+        
+        with self._stats_lock:
+            self._stats['polls'] += 1
+            self._stats['loaded'] += added
+        return added
+    
+    def fire_due(self, now: Optional[datetime] = None) -> int:
+        """
+        Claim every reminder that is due and hand it to the Telegram dispatcher.
+        
+        Args:
+            now: Current time (defaults to the clock)
+        
+        Returns:
+            Number of reminders sent to the dispatcher
+        """
+        now = now or datetime.now(timezone.utc)
+        due: List[Dict[str, Any]] = []
+        
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now.timestamp():
+                _, reminder_id = heapq.heappop(self._heap)
+                reminder = self._pending.pop(reminder_id, None)
+                if reminder is not None:
+                    due.append(reminder)
+        
+        if not due:
+            return 0
+        
+        next_times = {reminder['id']: next_occurrence(reminder, now) for reminder in due}
+        try:
+            claimed = set(get_db_client().claim_reminders([
+                (reminder['id'], reminder['reminder_date_time'], next_times[reminder['id']])
+                for reminder in due
+            ]))
+        except Exception as e:
+            self._record('errors')
+            self.logger.error(f"Could not claim {len(due)} due reminders, retrying: {e}")
+            retry_at = now + timedelta(seconds=self.CLAIM_RETRY_SECONDS)
+            with self._condition:
+                for reminder in due:
+                    self._pending[reminder['id']] = reminder
+                    heapq.heappush(self._heap, (retry_at.timestamp(), reminder['id']))
+            return 0
+        
+        fired = 0
+        for reminder in due:
+            if reminder['id'] not in claimed:
+                # Delivered by another worker, or changed since it was loaded
+                self._record('claim_conflicts')
+                continue
+            
+            self._send(reminder)
+            fired += 1
+            
+            following = next_times[reminder['id']]
+            if following is not None:
+                self._record('rescheduled')
+                with self._condition:
+                    if self._loaded_until and following < self._loaded_until:
+                        self._push(dict(reminder, reminder_date_time=following))
+        
+        self._record('fired', fired)
+        return fired
+    
+    def _send(self, reminder: Dict[str, Any]) -> None:
+        """Queue a reminder message; failed one-off reminders are collected for an Error update."""
+        result = None
+        telegram_id = str(reminder.get('telegram_id') or '')
+        if telegram_id.lstrip('-').isdigit():
+            result = telegram_dispatcher.enqueue(
+                int(telegram_id),
+                f"⏰ Reminder: {reminder['reminder_title']}",
+                recipient_user_id=reminder['user_to_remind_id'],
+                notification_type='Task Reminder',
+                subject=reminder['reminder_title'],
+                related_task_id=reminder.get('related_task_id'),
+                related_field_report_id=reminder.get('related_field_report_id')
+            )
+        
+        if result is None:
+            self._send_failed(reminder)
+            return
+        
+        def done(future) -> None:
+            if future.exception() is not None:
+                self._send_failed(reminder)
+        
+        result.add_done_callback(done)
+    
+    def _send_failed(self, reminder: Dict[str, Any]) -> None:
+        """Record a reminder that could not be delivered."""
+        self._record('send_failures')
+        self.logger.warning(f"Reminder {reminder.get('reminder_id_display') or reminder['id']} could not be delivered")
+        if not reminder.get('is_recurring'):
+            with self._condition:
+                self._failed.append(reminder['id'])
+    
+    def flush_failures(self) -> None:
+        """Mark undeliverable one-off reminders as Error in one statement."""
+        with self._condition:
+            failed, self._failed = self._failed, []
+        if not failed:
+            return
+        
+        try:
+            get_db_client().set_reminders_status(failed, 'Error')
+        except Exception:
+            with self._condition:
+                self._failed.extend(failed)
+            raise
+    
+    def expire_stale(self, now: Optional[datetime] = None) -> int:
+        """
+        Retire reminders that were due longer ago than the allowed lateness.
+        
+        Args:
+            now: Current time (defaults to the clock)
+        
+        Returns:
+            Number of reminders retired or moved to their next occurrence
+        """
+        now = now or datetime.now(timezone.utc)
+        db = get_db_client()
+        handled = 0
+        
+        while True:
+            page = db.get_scheduled_reminders(end=now - self.max_lateness, limit=self.batch_size)
+            if not page:
+                break
+            
+            next_times = [(reminder, next_occurrence(reminder, now)) for reminder in page]
+            db.set_reminders_status([reminder['id'] for reminder, following in next_times if following is None], 'Error')
+            db.claim_reminders([
+                (reminder['id'], reminder['reminder_date_time'], following)
+                for reminder, following in next_times if following is not None
+            ])
+            handled += len(page)
+            
+            if len(page) < self.batch_size:
+                break
+        
+        if handled:
+            self._record('expired', handled)
+            self.logger.warning(f"Retired {handled} reminders that were overdue by more than {self.max_lateness}")
+        return handled
+    
+    def _record(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[counter] += amount
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return engine statistics for the metrics endpoint."""
+        with self._condition:
+            pending = len(self._pending)
+            next_due = self._heap[0][0] - time.time() if self._heap else None
+        with self._stats_lock:
+            return dict(
+                self._stats,
+                running=bool(self._thread and self._thread.is_alive()),
+                pending=pending,
+                next_due_seconds=round(next_due, 1) if next_due is not None else None
+            )
+
+
+# Global reminder engine instance
+reminder_engine = ReminderEngine()
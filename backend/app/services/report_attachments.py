@@ -0,0 +1,543 @@
+"""
+10NetZero-FLRTS Field Report Attachments
+
+Photos and documents sent to the Telegram bot are stored and attached to field
+reports without a whole file ever being held in worker memory:
+
+1. The file is streamed from Telegram's file endpoint in `attachment_chunk_bytes`
+   chunks into a staging file under `attachment_storage_dir`, hashed as it goes.
+   python-telegram-bot's own File.download_* methods read the whole body into memory
+   first, so they are not used. Files Telegram declares larger than
+   `attachment_max_bytes` are refused up front, and a download that grows past
+   it is aborted
+2. At most `attachment_max_concurrent_downloads` downloads run per worker; further
+   ones wait up to `attachment_queue_timeout_seconds` for a slot
+3. The attachment row is written and the user answered as soon as the download has
+   finished. Moving the file into storage (a local directory or a Google Drive
+   folder, uploaded in resumable chunks) and rendering its thumbnail happen on a
+   small thread pool off the update path; at most `attachment_max_pending` files
+   wait there before new attachments are refused
+
+Attachments are linked to the report created from their caption, to the report the
+user logged within the last `attachment_link_window_seconds`, or, if there is none
+yet, to the next report they log within that window.
+
+Thumbnails need Pillow; without it attachments are stored without one. Tests and
+benchmarks can pass a LocalAttachmentStorage under a temporary directory in place
+of the configured backend.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+import weakref
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseUpload
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+from app.services.external_apis import google_drive_service
+from app.services.rate_limiter import ConcurrencyLimiter, RateLimitExceeded
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+
+class AttachmentError(Exception):
+    """Raised when an attachment is refused; the message can be shown to the user."""
+    pass
+
+
+class AttachmentDownloadError(Exception):
+    """Raised when a file cannot be fetched from Telegram; the message never contains the file URL."""
+    pass
+
+
+@dataclass(frozen=True)
+class IncomingAttachment:
+    """A file announced by a Telegram message, before it is downloaded."""
+    file_id: str
+    file_unique_id: str
+    file_name: str
+    mime_type: Optional[str]
+    file_size: Optional[int]  # Size declared by Telegram, if known
+    kind: str  # 'photo' or 'document'
+
+
+class LocalAttachmentStorage:
+    """
+    Stores attachments in a directory on the worker's filesystem (or a shared mount).
+    """
+    
+    name = 'local'
+    
+    def __init__(self, root: str):
+        """
+        Initialize the backend.
+        
+        Args:
+            root: Storage directory; keys are paths relative to it
+        """
+        self.root = os.path.abspath(root)
+    
+    def save(self, source_path: str, key: str, mime_type: Optional[str]) -> str:
+        """
+        Move a staged file into storage.
+        
+        Args:
+            source_path: Staged file, which is consumed
+            key: Relative storage path
+            mime_type: MIME type of the file (unused locally)
+        
+        Returns:
+            Storage path recorded for the file
+        """
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source_path, target)
+        return key
+    
+    def path(self, key: str) -> str:
+        """Absolute path of a stored file."""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f"Storage key escapes the storage directory: {key}")
+        return path
+
+
+class DriveAttachmentStorage:
+    """
+    Uploads attachments to a Google Drive folder with resumable, chunked uploads.
+    """
+    
+    name = 'drive'
+    
+    def __init__(self, folder_id: str, chunk_bytes: int):
+        """
+        Initialize the backend.
+        
+        Args:
+            folder_id: Drive folder the files are uploaded into
+            chunk_bytes: Upload chunk size (a multiple of 256KB)
+        """
+        if not folder_id:
+            raise RuntimeError("ATTACHMENT_DRIVE_FOLDER_ID is required for the drive attachment backend")
+        if not google_drive_service.enabled:
+            raise RuntimeError("Google Drive credentials are not configured")
+        
+        self.folder_id = folder_id
+        self.chunk_bytes = max(256 * 1024, chunk_bytes // (256 * 1024) * (256 * 1024))
+    
+    def save(self, source_path: str, key: str, mime_type: Optional[str]) -> str:
+        """
+        Upload a staged file and remove it.
+        
+        Returns:
+            Drive file ID
+        """
+        # Discovery documents ship with the client and httplib2 is not thread safe,
+        # so each upload builds its own service
+        service = build('drive', 'v3', credentials=google_drive_service._get_credentials(), cache_discovery=False)
+        
+        with open(source_path, 'rb') as source:
+            media = MediaIoBaseUpload(
+                source, mimetype=mime_type or 'application/octet-stream',
+                chunksize=self.chunk_bytes, resumable=True
+            )
+            request = service.files().create(
+                body={'name': key.replace('/', '_'), 'parents': [self.folder_id]},
+                media_body=media,
+                fields='id'
+            )
+            response = None
+            while response is None:
+                _, response = request.next_chunk()
+        
+        os.remove(source_path)
+        return response['id']
+
+
+def storage_from_settings():
+    """Build the attachment storage backend selected by ATTACHMENT_STORAGE_BACKEND."""
+    if settings.attachment_storage_backend == 'drive':
+        return DriveAttachmentStorage(settings.attachment_drive_folder_id, settings.attachment_chunk_bytes)
+    if settings.attachment_storage_backend != 'local':
+        raise ValueError(f"Unknown attachment storage backend: {settings.attachment_storage_backend}")
+    return LocalAttachmentStorage(settings.attachment_storage_dir)
+
+
+class ReportAttachmentService:
+    """
+    Streams Telegram files into attachment storage and links them to field reports.
+    """
+    
+    def __init__(self, storage=None, staging_dir: Optional[str] = None):
+        """
+        Initialize the service from settings.
+        
+        Args:
+            storage: Storage backend (default: the one selected in settings, built on first use)
+            staging_dir: Directory downloads are streamed into (default: .incoming under
+                attachment_storage_dir, so local storage can rename instead of copy)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_bytes = settings.attachment_max_bytes
+        self.chunk_bytes = settings.attachment_chunk_bytes
+        self.max_pending = settings.attachment_max_pending
+        self.queue_timeout = settings.attachment_queue_timeout_seconds
+        self.thumbnail_px = settings.attachment_thumbnail_px
+        self.link_window = timedelta(seconds=settings.attachment_link_window_seconds)
+        self.allowed_types = [
+            mime_type.strip().lower() for mime_type in settings.attachment_allowed_types.split(',') if mime_type.strip()
+        ]
+        self.staging_dir = staging_dir or os.path.join(settings.attachment_storage_dir, '.incoming')
+        
+        self._storage = storage
+        self.downloads = ConcurrencyLimiter('attachment download', settings.attachment_max_concurrent_downloads)
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+        self._pid: Optional[int] = None
+        self._pending = 0
+        
+        self._lock = threading.Lock()
+        self._stats = {
+            'received': 0,
+            'stored': 0,
+            'failed': 0,
+            'thumbnails': 0,
+            'bytes_received': 0,
+            'rejected_too_large': 0,
+            'rejected_type': 0,
+            'rejected_busy': 0
+        }
+    
+    @property
+    def storage(self):
+        """Storage backend, built from settings on first use."""
+        if self._storage is None:
+            self._storage = storage_from_settings()
+        return self._storage
+    
+    @staticmethod
+    def from_message(message) -> Optional[IncomingAttachment]:
+        """
+        Describe the photo or document carried by a Telegram message.
+        
+        For photos, the largest size Telegram generated is used.
+        
+        Returns:
+            The attachment, or None if the message carries neither
+        """
+        if message.photo:
+            photo = message.photo[-1]
+            return IncomingAttachment(
+                photo.file_id, photo.file_unique_id, f"photo_{photo.file_unique_id}.jpg",
+                'image/jpeg', photo.file_size, 'photo'
+            )
+        
+        document = message.document
+        if document:
+            return IncomingAttachment(
+                document.file_id, document.file_unique_id, document.file_name or f"file_{document.file_unique_id}",
+                document.mime_type, document.file_size, 'document'
+            )
+        return None
+    
+    async def receive(self, bot, incoming: IncomingAttachment, user_id: str,
+                      report_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Download an attachment and record it; storage and thumbnail follow in the background.
+        
+        Args:
+            bot: Telegram bot used to resolve the file
+            incoming: Attachment announced by the message
+            user_id: flrts_users ID of the sender
+            report_id: Field report to attach it to, if already known
+        
+        Returns:
+            The field_report_attachments row (status 'Received')
+        
+        Raises:
+            AttachmentError: If the file is too large, of a refused type, or no capacity is available
+            AttachmentDownloadError: If Telegram does not deliver the file
+        """
+        self._check(incoming)
+        
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['rejected_busy'] += 1
+                raise AttachmentError("Too many files are being saved right now. Please send it again in a minute.")
+            self._pending += 1
+        
+        staged_path = None
+        try:
+            try:
+                async with self.downloads.slot(timeout=self.queue_timeout):
+                    telegram_file = await bot.get_file(incoming.file_id)
+                    staged_path, size, digest = await self.download(telegram_file.file_path)
+            except RateLimitExceeded:
+                with self._lock:
+                    self._stats['rejected_busy'] += 1
+                raise AttachmentError("Too many files are being uploaded right now. Please send it again in a minute.")
+            
+            attachment = get_db_client().create_field_report_attachment({
+                'field_report_id': report_id,
+                'uploaded_by_user_id': user_id,
+                'telegram_file_id': incoming.file_id,
+                'telegram_file_unique_id': incoming.file_unique_id,
+                'file_name': incoming.file_name[:255],
+                'mime_type': incoming.mime_type,
+                'size_bytes': size,
+                'sha256': digest,
+                'storage_backend': self.storage.name,
+                'status': 'Received'
+            })
+            
+            self._submit(attachment, staged_path)
+            staged_path = None
+            
+            with self._lock:
+                self._stats['received'] += 1
+                self._stats['bytes_received'] += size
+            return attachment
+        
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        
+        finally:
+            if staged_path:
+                _remove(staged_path)
+    
+    def _check(self, incoming: IncomingAttachment) -> None:
+        """Refuse files that are declared too large or are of a type that is not accepted."""
+        if incoming.file_size and incoming.file_size > self.max_bytes:
+            with self._lock:
+                self._stats['rejected_too_large'] += 1
+            raise AttachmentError(
+                f"That file is {incoming.file_size / 1048576:.1f} MB; "
+                f"attachments are limited to {self.max_bytes / 1048576:.0f} MB."
+            )
+        
+        mime_type = (incoming.mime_type or '').lower()
+        if incoming.kind == 'document' and not any(
+            mime_type == allowed or (allowed.endswith('/') and mime_type.startswith(allowed))
+            for allowed in self.allowed_types
+        ):
+            with self._lock:
+                self._stats['rejected_type'] += 1
+            raise AttachmentError(f"I can't attach {mime_type or 'files of that type'} to field reports.")
+    
+    async def download(self, url: str) -> Tuple[str, int, str]:
+        """
+        Stream a file into the staging directory.
+        
+        Args:
+            url: Telegram file URL (or a local path when a local Bot API server is used)
+        
+        Returns:
+            Staged file path, size in bytes and SHA-256 hex digest
+        
+        Raises:
+            AttachmentError: If the file turns out larger than attachment_max_bytes
+            AttachmentDownloadError: If Telegram does not deliver the file
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        staged_path = os.path.join(self.staging_dir, f"{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        size = 0
+        
+        try:
+            with open(staged_path, 'wb') as staged:
+                async for chunk in self._chunks(url):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        with self._lock:
+                            self._stats['rejected_too_large'] += 1
+                        raise AttachmentError(f"That file is larger than {self.max_bytes / 1048576:.0f} MB.")
+                    digest.update(chunk)
+                    staged.write(chunk)
+        except BaseException:
+            _remove(staged_path)
+            raise
+        
+        return staged_path, size, digest.hexdigest()
+    
+    async def _chunks(self, url: str):
+        """Yield a file's content in chunks without reading it whole."""
+        if not url.startswith(('http://', 'https://')):
+            with open(url, 'rb') as source:
+                while chunk := source.read(self.chunk_bytes):
+                    yield chunk
+            return
+        
+        # Telegram file URLs carry the bot token, so httpx errors (which quote the URL) are not passed on
+        try:
+            async with self._client().stream('GET', url) as response:
+                response.raise_for_status()
+                declared = int(response.headers.get('content-length') or 0)
+                if declared > self.max_bytes:
+                    with self._lock:
+                        self._stats['rejected_too_large'] += 1
+                    raise AttachmentError(f"That file is larger than {self.max_bytes / 1048576:.0f} MB.")
+                async for chunk in response.aiter_bytes(self.chunk_bytes):
+                    yield chunk
+        except httpx.HTTPStatusError as e:
+            raise AttachmentDownloadError(f"File download failed with HTTP {e.response.status_code}") from None
+        except httpx.RequestError as e:
+            raise AttachmentDownloadError(f"File download failed ({type(e).__name__})") from None
+    
+    def _client(self) -> httpx.AsyncClient:
+        """HTTP client of the running event loop (connections cannot be shared between loops)."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=settings.attachment_max_concurrent_downloads)
+            )
+            self._clients[loop] = client
+        return client
+    
+    def _submit(self, attachment: Dict[str, Any], staged_path: str) -> None:
+        """Queue storing and thumbnailing a downloaded attachment on the worker pool."""
+        if self._executor is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=settings.attachment_workers, thread_name_prefix='attachments'
+            )
+        self._executor.submit(self._store, attachment, staged_path)
+    
+    def _store(self, attachment: Dict[str, Any], staged_path: str) -> None:
+        """Render the thumbnail, move the file into storage and record where it went."""
+        created = datetime.now(timezone.utc)
+        base_key = f"{created:%Y/%m}/{attachment['id']}"
+        update = {}
+        
+        try:
+            if Image is not None and (attachment.get('mime_type') or '').startswith('image/'):
+                update['thumbnail_path'] = self._thumbnail(staged_path, f"{base_key}_thumb.jpg")
+            
+            update['storage_path'] = self.storage.save(
+                staged_path, base_key + _extension(attachment['file_name']), attachment.get('mime_type')
+            )
+            update.update({'status': 'Stored', 'stored_at': datetime.now(timezone.utc).isoformat()})
+            outcome = 'stored'
+        
+        except Exception as e:
+            self.logger.error(f"Could not store attachment {attachment['id']}: {e}")
+            _remove(staged_path)
+            update.update({'status': 'Failed', 'error': str(e)[:1000]})
+            outcome = 'failed'
+        
+        try:
+            get_db_client().update_field_report_attachment(attachment['id'], update)
+        except Exception as e:
+            self.logger.error(f"Could not record storage of attachment {attachment['id']}: {e}")
+        
+        with self._lock:
+            self._pending -= 1
+            self._stats[outcome] += 1
+            if update.get('thumbnail_path'):
+                self._stats['thumbnails'] += 1
+    
+    def _thumbnail(self, source_path: str, key: str) -> Optional[str]:
+        """Store a JPEG thumbnail of an image; a failure only costs the thumbnail."""
+        thumbnail_path = f"{source_path}.thumb.jpg"
+        try:
+            with Image.open(source_path) as image:
+                # JPEGs are decoded straight at a reduced scale instead of full resolution
+                image.draft('RGB', (self.thumbnail_px, self.thumbnail_px))
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((self.thumbnail_px, self.thumbnail_px))
+                image.convert('RGB').save(thumbnail_path, 'JPEG', quality=80)
+            return self.storage.save(thumbnail_path, key, 'image/jpeg')
+        except Exception as e:
+            self.logger.warning(f"Could not render a thumbnail for {key}: {e}")
+            _remove(thumbnail_path)
+            return None
+    
+    def attach(self, attachment_id: str, report_id: str) -> None:
+        """Link an attachment to a field report."""
+        get_db_client().update_field_report_attachment(attachment_id, {'field_report_id': report_id})
+    
+    def recent_report(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The user's latest field report, if they logged it within the link window.
+        
+        Returns:
+            Field report record (with sites.site_name), or None
+        """
+        reports = get_db_client().get_field_reports_by_user(user_id, 1)
+        if not reports:
+            return None
+        
+        submitted = _timestamp(reports[0].get('submission_timestamp'))
+        if submitted is None or submitted < datetime.now(timezone.utc) - self.link_window:
+            return None
+        return reports[0]
+    
+    def claim_unassigned(self, user_id: str, report_id: str) -> int:
+        """
+        Link the user's attachments still waiting for a report to a report they just logged.
+        
+        Returns:
+            Number of attachments linked
+        """
+        since = (datetime.now(timezone.utc) - self.link_window).isoformat()
+        return get_db_client().link_unassigned_attachments(user_id, report_id, since)
+    
+    def for_report(self, report_id: str) -> List[Dict[str, Any]]:
+        """Attachments of a field report, oldest first."""
+        return get_db_client().get_field_report_attachments(report_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return attachment statistics for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats, pending=self._pending, thumbnails_enabled=Image is not None)
+        stats['downloads'] = self.downloads.get_stats()
+        return stats
+
+
+def _extension(file_name: str) -> str:
+    """File extension safe to use in a storage key ('' if there is none)."""
+    extension = os.path.splitext(file_name)[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,10}', extension) else ''
+
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    """Parse a timestamptz value returned by PostgREST."""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _remove(path: str) -> None:
+    """Delete a staged file if it is still there."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Global report attachment service instance
+report_attachments = ReportAttachmentService()
@@ -0,0 +1,266 @@
+"""
+10NetZero-FLRTS Field Report Deduplication
+
+Technicians often resend a field report when the bot is slow to answer. Each resend
+would otherwise run another LLM extraction and insert another `field_reports` row.
+This module recognises near-identical reports from the same submitter and site
+within a short window, before extraction starts, so a resend is answered with the
+report that already exists.
+
+Report text is reduced to character shingles and a MinHash signature; signatures
+are bucketed with locality-sensitive hashing (banding) so only likely matches are
+compared. A report still being processed is registered as pending, and a resend
+that arrives meanwhile waits for it instead of starting a second extraction.
+
+The index is per process and only covers reports submitted through this worker.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+
+
+class MinHasher:
+    """MinHash signatures over character shingles of normalised text."""
+    
+    SHINGLE_SIZE = 5
+    PRIME = (1 << 31) - 1
+    
+    def __init__(self, num_perm: int, seed: int = 1):
+        """
+        Create a hasher with fixed random permutations.
+        
+        Args:
+            num_perm: Signature length
+            seed: Seed for the permutation coefficients
+        """
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, self.PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, self.PRIME, size=num_perm, dtype=np.uint64)
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase and reduce punctuation and whitespace runs to single spaces."""
+        return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+    
+    def shingles(self, text: str) -> np.ndarray:
+        """Return the distinct hashed character shingles of the text."""
+        normalized = self.normalize(text)
+        if len(normalized) <= self.SHINGLE_SIZE:
+            pieces = {normalized}
+        else:
+            pieces = {normalized[i:i + self.SHINGLE_SIZE] for i in range(len(normalized) - self.SHINGLE_SIZE + 1)}
+        return np.fromiter((zlib.crc32(piece.encode('utf-8')) for piece in pieces), dtype=np.uint64)
+    
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of the text.
+        
+        Args:
+            text: Report text
+        
+        Returns:
+            uint32 array of length num_perm
+        """
+        hashed = self.shingles(text)
+        permuted = (self._a[:, None] * hashed[None, :] + self._b[:, None]) % self.PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+    
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimate the Jaccard similarity of two signatures."""
+        return float(np.mean(first == second))
+
+
+@dataclass(eq=False)
+class DedupEntry:
+    """A report registered in the index; pending until its database row exists."""
+    scope: Tuple[Optional[str], Optional[str]]
+    signature: np.ndarray
+    registered_at: float
+    result: concurrent.futures.Future = field(default_factory=concurrent.futures.Future)
+
+
+@dataclass
+class DedupClaim:
+    """
+    Outcome of checking a new report.
+    
+    Either duplicate_of holds the existing report (and similarity its estimated
+    Jaccard similarity), or entry is the pending registration for the new report.
+    """
+    duplicate_of: Optional[Dict[str, Any]] = None
+    similarity: float = 0.0
+    entry: Optional[DedupEntry] = None
+
+
+class ReportDeduplicator:
+    """
+    Windowed MinHash/LSH index of recent field reports per submitter and site.
+    """
+    
+    NUM_PERM = 64
+    BANDS = 16  # 4 rows per band: pairs above ~0.5 Jaccard almost always share a bucket
+    
+    def __init__(self):
+        """Initialize an empty index."""
+        self.logger = logging.getLogger(__name__)
+        self.enabled = settings.report_dedup_enabled
+        self.threshold = settings.report_dedup_threshold
+        self.window_seconds = settings.report_dedup_window_seconds
+        self.wait_timeout = settings.llm_request_timeout
+        
+        self.hasher = MinHasher(self.NUM_PERM)
+        self._rows = self.NUM_PERM // self.BANDS
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[Any, int, bytes], List[DedupEntry]] = {}
+        self._entries: Deque[DedupEntry] = deque()
+        
+        self._stats = {
+            'checks': 0,
+            'duplicates': 0,
+            'pending_waits': 0,
+            'released': 0
+        }
+    
+    def _band_keys(self, scope: Tuple[Optional[str], Optional[str]], signature: np.ndarray) -> List[Tuple[Any, int, bytes]]:
+        """LSH bucket keys of a signature within a scope."""
+        return [
+            (scope, band, signature[band * self._rows:(band + 1) * self._rows].tobytes())
+            for band in range(self.BANDS)
+        ]
+    
+    def _expire(self, now: float) -> None:
+        """Drop entries older than the window (called with the lock held)."""
+        while self._entries and now - self._entries[0].registered_at > self.window_seconds:
+            self._remove(self._entries.popleft())
+    
+    def _remove(self, entry: DedupEntry) -> None:
+        """Remove an entry from its buckets (called with the lock held)."""
+        for key in self._band_keys(entry.scope, entry.signature):
+            bucket = self._buckets.get(key)
+            if bucket and entry in bucket:
+                bucket.remove(entry)
+                if not bucket:
+                    del self._buckets[key]
+    
+    def _best_match(self, scope: Tuple[Optional[str], Optional[str]],
+                    signature: np.ndarray) -> Tuple[Optional[DedupEntry], float]:
+        """Find the most similar entry in the scope above the threshold (called with the lock held)."""
+        best, best_similarity = None, 0.0
+        seen = set()
+        
+        for key in self._band_keys(scope, signature):
+            for entry in self._buckets.get(key, ()):
+                if id(entry) in seen:
+                    continue
+                seen.add(id(entry))
+                similarity = self.hasher.similarity(signature, entry.signature)
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+        
+        return best, best_similarity
+    
+    async def claim(self, submitter_id: str, site_id: Optional[str], text: str) -> DedupClaim:
+        """
+        Check a new report against recent ones and register it if it is new.
+        
+        If the closest match is still being processed, waits for it: a match that
+        ends up stored is returned as the duplicate, while one that fails is
+        forgotten and the check is repeated.
+        
+        Args:
+            submitter_id: flrts_users.id of the submitter
+            site_id: Site the report is for, if known before extraction
+            text: Report text as sent
+        
+        Returns:
+            DedupClaim; pass claims with an entry to complete() or release()
+        """
+        if not self.enabled:
+            return DedupClaim()
+        
+        scope = (submitter_id, site_id)
+        signature = self.hasher.signature(text)
+        
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                self._stats['checks'] += 1
+                match, similarity = self._best_match(scope, signature)
+                
+                if match is None:
+                    entry = DedupEntry(scope, signature, now)
+                    for key in self._band_keys(scope, signature):
+                        self._buckets.setdefault(key, []).append(entry)
+                    self._entries.append(entry)
+                    return DedupClaim(entry=entry)
+                
+                if not match.result.done():
+                    self._stats['pending_waits'] += 1
+            
+            try:
+                # Shielded so a timeout here does not cancel the other submission's result
+                report = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(match.result)), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning("Timed out waiting for a matching report in progress; treating as new")
+                return DedupClaim()
+            
+            if report is not None:
+                with self._lock:
+                    self._stats['duplicates'] += 1
+                return DedupClaim(duplicate_of=report, similarity=similarity)
+    
+    def complete(self, claim: DedupClaim, report: Dict[str, Any]) -> None:
+        """
+        Record the stored report for a claim so later resends resolve to it.
+        
+        Args:
+            claim: Claim returned by claim()
+            report: Created field report record
+        """
+        if claim.entry and not claim.entry.result.done():
+            claim.entry.result.set_result(report)
+    
+    def release(self, claim: Optional[DedupClaim]) -> None:
+        """
+        Forget a claim whose report was not stored; does nothing once completed.
+        
+        Args:
+            claim: Claim returned by claim()
+        """
+        if not claim or not claim.entry or claim.entry.result.done():
+            return
+        
+        with self._lock:
+            self._remove(claim.entry)
+            try:
+                self._entries.remove(claim.entry)
+            except ValueError:
+                pass
+            self._stats['released'] += 1
+        
+        # Wake any resend waiting on this report so it is processed on its own
+        claim.entry.result.set_result(None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return deduplication statistics for the metrics endpoint."""
+        with self._lock:
+            return dict(self._stats, enabled=self.enabled, tracked_reports=len(self._entries))
+
+
+# Global field report deduplicator instance
+report_deduplicator = ReportDeduplicator()
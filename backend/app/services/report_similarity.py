@@ -0,0 +1,328 @@
+"""
+10NetZero-FLRTS Field Report Similarity Index
+
+Answers "has this happened before at any site?" by finding field reports whose text
+resembles a description, without an embedding service, GPU or network access.
+
+Report text is turned into a fixed-size vector with the hashing trick: word unigrams,
+word bigrams and in-word character trigrams are hashed (with a random sign) into
+`report_similarity_dimensions` buckets, which acts as a sparse random projection of
+the bag-of-features. Vectors are L2-normalised and kept in one contiguous numpy
+matrix, so a query is a single matrix-vector product followed by a partial sort.
+
+The index is loaded from `field_reports` on first use, extended as reports are
+created in this process, and periodically caught up in the background with reports
+submitted through other workers. Reports edited after indexing keep their original
+vector until the process restarts.
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+
+
+class HashingVectorizer:
+    """
+    Stateless text vectorizer based on feature hashing.
+    
+    No vocabulary is learned, so vectors for new reports can be computed at any time
+    and stay comparable with every vector already in the index.
+    """
+    
+    TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+    STOP_WORDS = frozenset({
+        'a', 'an', 'and', 'are', 'as', 'at', 'be', 'been', 'but', 'by', 'for', 'from', 'had',
+        'has', 'have', 'he', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'our',
+        'she', 'so', 'that', 'the', 'their', 'them', 'there', 'they', 'this', 'to', 'up', 'was',
+        'we', 'were', 'with', 'you'
+    })
+    TRIGRAM_WEIGHT = 0.25
+    
+    def __init__(self, dimensions: int):
+        """
+        Create a vectorizer.
+        
+        Args:
+            dimensions: Vector size; a power of two
+        """
+        if dimensions < 16 or dimensions & (dimensions - 1):
+            raise ValueError("report_similarity_dimensions must be a power of two of at least 16")
+        
+        self.dimensions = dimensions
+        self._mask = dimensions - 1
+    
+    def features(self, text: str) -> Dict[str, float]:
+        """
+        Extract weighted features from text.
+        
+        Args:
+            text: Report or query text
+        
+        Returns:
+            Mapping of feature string to weight (sublinear term frequency)
+        """
+        tokens = [
+            token for token in self.TOKEN_PATTERN.findall(text.lower())
+            if token not in self.STOP_WORDS
+        ]
+        counts: Dict[str, float] = {}
+        
+        for index, token in enumerate(tokens):
+            counts['w:' + token] = counts.get('w:' + token, 0.0) + 1.0
+            if index:
+                bigram = f"b:{tokens[index - 1]} {token}"
+                counts[bigram] = counts.get(bigram, 0.0) + 1.0
+            if len(token) > 3 and not token.isdigit():
+                padded = f"<{token}>"
+                for start in range(len(padded) - 2):
+                    trigram = 'c:' + padded[start:start + 3]
+                    counts[trigram] = counts.get(trigram, 0.0) + self.TRIGRAM_WEIGHT
+        
+        return {
+            feature: (1.0 + math.log(count)) if count >= 1.0 else count
+            for feature, count in counts.items()
+        }
+    
+    def transform(self, text: str) -> np.ndarray:
+        """
+        Vectorize text.
+        
+        Args:
+            text: Report or query text
+        
+        Returns:
+            L2-normalised float32 vector (all zeros if the text has no features)
+        """
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        
+        for feature, weight in self.features(text).items():
+            hashed = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            vector[hashed & self._mask] += sign * weight
+        
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+
+class ReportSimilarityIndex:
+    """
+    In-memory nearest-neighbour index over field report text.
+    
+    Writers append under a lock into preallocated rows; readers take a snapshot of
+    the matrix and row count and score it without holding the lock, since rows below
+    the count are never modified.
+    """
+    
+    PAGE_SIZE = 1000
+    SNIPPET_LENGTH = 160
+    
+    def __init__(self):
+        """Initialize an empty index; reports are loaded on first use."""
+        self.logger = logging.getLogger(__name__)
+        self.vectorizer = HashingVectorizer(settings.report_similarity_dimensions)
+        self.refresh_interval = settings.report_similarity_refresh_seconds
+        
+        self._vectors = np.zeros((0, self.vectorizer.dimensions), dtype=np.float32)
+        self._site_codes = np.zeros(0, dtype=np.int32)
+        self._count = 0
+        self._reports: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._site_code_by_id: Dict[Optional[str], int] = {}
+        self._write_lock = threading.Lock()
+        
+        self._loaded = False
+        self._synced_at = 0.0
+        self._latest_submission: Optional[str] = None
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+    
+    @staticmethod
+    def report_text(report: Dict[str, Any]) -> str:
+        """Text a report is indexed by: its title followed by its full content."""
+        return f"{report.get('report_title_summary') or ''}\n{report.get('report_content_full') or ''}"
+    
+    def add_report(self, report: Dict[str, Any]) -> bool:
+        """
+        Index a report; reports already in the index are ignored.
+        
+        Args:
+            report: Field report record (id, site_id, report_title_summary, report_content_full, ...)
+        
+        Returns:
+            True if the report was added
+        """
+        if report.get('id') in self._positions:
+            return False
+        
+        vector = self.vectorizer.transform(self.report_text(report))
+        sites = report.get('sites') or {}
+        content = report.get('report_content_full') or ''
+        entry = {
+            'id': report['id'],
+            'report_id_display': report.get('report_id_display'),
+            'site_id': report.get('site_id'),
+            'site_name': report.get('site_name') or sites.get('site_name'),
+            'report_date': report.get('report_date'),
+            'report_type': report.get('report_type'),
+            'report_title_summary': report.get('report_title_summary'),
+            'snippet': content[:self.SNIPPET_LENGTH]
+        }
+        
+        with self._write_lock:
+            if report['id'] in self._positions:
+                return False
+            
+            if self._count == len(self._vectors):
+                self._grow()
+            
+            position = self._count
+            site_code = self._site_code_by_id.setdefault(entry['site_id'], len(self._site_code_by_id))
+            self._vectors[position] = vector
+            self._site_codes[position] = site_code
+            self._reports.append(entry)
+            self._positions[entry['id']] = position
+            self._count = position + 1
+        
+        return True
+    
+    def _grow(self) -> None:
+        """Double the matrix capacity (called with the write lock held)."""
+        capacity = max(64, len(self._vectors) * 2)
+        vectors = np.zeros((capacity, self.vectorizer.dimensions), dtype=np.float32)
+        vectors[:self._count] = self._vectors[:self._count]
+        site_codes = np.zeros(capacity, dtype=np.int32)
+        site_codes[:self._count] = self._site_codes[:self._count]
+        
+        # Readers holding the old arrays keep scoring them safely
+        self._vectors = vectors
+        self._site_codes = site_codes
+    
+    def sync(self) -> int:
+        """
+        Load reports submitted since the last sync (everything on the first call).
+        
+        Returns:
+            Number of reports added to the index
+        """
+        started = time.perf_counter()
+        db = get_db_client()
+        since = self._latest_submission
+        added = 0
+        offset = 0
+        
+        while True:
+            page = db.get_field_reports_for_similarity(since=since, offset=offset, limit=self.PAGE_SIZE)
+            for report in page:
+                added += self.add_report(report)
+                submitted = report.get('submission_timestamp')
+                if submitted and (self._latest_submission is None or submitted > self._latest_submission):
+                    self._latest_submission = submitted
+            if len(page) < self.PAGE_SIZE:
+                break
+            offset += self.PAGE_SIZE
+        
+        self._loaded = True
+        self._synced_at = time.monotonic()
+        
+        self.logger.info(
+            f"Report similarity index synced: {added} new reports, {self._count} total in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return added
+    
+    def _ensure_fresh(self) -> None:
+        """Load on first use and schedule background catch-ups when stale."""
+        if not self._loaded:
+            with self._build_lock:
+                if not self._loaded:
+                    self.sync()
+            return
+        
+        if time.monotonic() - self._synced_at > self.refresh_interval and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._background_sync, name='report-similarity-sync', daemon=True).start()
+    
+    def _background_sync(self) -> None:
+        """Catch up without blocking callers; keep serving the current index on failure."""
+        try:
+            with self._build_lock:
+                self.sync()
+        except Exception as e:
+            self.logger.warning(f"Report similarity sync failed, keeping current index: {e}")
+            self._synced_at = time.monotonic()
+        finally:
+            self._refreshing = False
+    
+    def search(self, text: Optional[str] = None, report_id: Optional[str] = None, limit: int = 5,
+               site_id: Optional[str] = None, min_score: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Find the reports most similar to a description or to an indexed report.
+        
+        Args:
+            text: Free-text description of the problem
+            report_id: UUID of an indexed report to use as the query instead of text
+            limit: Maximum number of results
+            site_id: Only return reports from this site
+            min_score: Minimum cosine similarity (defaults to settings.report_similarity_min_score)
+        
+        Returns:
+            Report summaries (id, report_id_display, site_id, site_name, report_date,
+            report_type, report_title_summary, snippet) with a 'score', best first
+        
+        Raises:
+            KeyError: If report_id is not in the index
+        """
+        self._ensure_fresh()
+        threshold = settings.report_similarity_min_score if min_score is None else min_score
+        
+        with self._write_lock:
+            vectors, site_codes, count = self._vectors, self._site_codes, self._count
+            site_code = self._site_code_by_id.get(site_id) if site_id else None
+            query_position = self._positions[report_id] if report_id else None
+        
+        if not count or limit <= 0 or (site_id and site_code is None):
+            return []
+        
+        query = vectors[query_position] if query_position is not None else self.vectorizer.transform(text or '')
+        if not query.any():
+            return []
+        
+        scores = vectors[:count] @ query
+        if site_code is not None:
+            scores[site_codes[:count] != site_code] = -np.inf
+        if query_position is not None:
+            scores[query_position] = -np.inf
+        
+        top = min(limit, count)
+        candidates = np.argpartition(-scores, top - 1)[:top]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        
+        return [
+            dict(self._reports[position], score=round(float(scores[position]), 4))
+            for position in candidates
+            if scores[position] >= threshold
+        ]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return index statistics for the metrics endpoint."""
+        return {
+            'reports': self._count,
+            'dimensions': self.vectorizer.dimensions,
+            'memory_bytes': int(self._vectors.nbytes + self._site_codes.nbytes),
+            'age_seconds': round(time.monotonic() - self._synced_at, 1) if self._loaded else None
+        }
+
+
+# Global report similarity index instance
+report_similarity_index = ReportSimilarityIndex()
@@ -0,0 +1,183 @@
+"""
+10NetZero-FLRTS Single-Flight Request Coalescing
+
+This module provides a single-flight layer for expensive upstream calls (primarily
+OpenAI requests made by the NLP pipeline). When several identical requests are in
+flight at the same time - for example a whole crew at one site sending "what are my
+tasks today" within a few seconds - only the first caller (the leader) reaches the
+upstream API. Every other caller with the same key awaits the leader's shared future
+and receives the same result, timeout, or error.
+
+The shared future is a thread-safe concurrent.futures.Future so that waiters can live
+on different event loops. Flask runs each async view on its own loop, and Telegram
+updates are processed on a separate loop, so an asyncio-only future is not enough.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+
+class SingleFlightError(Exception):
+    """Custom exception raised to waiters when the leader call was abandoned."""
+    pass
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share the same key into one upstream call.
+    
+    The first caller for a key becomes the leader and executes the call. Callers
+    arriving while the leader is still running wait on the leader's future instead
+    of calling upstream themselves. Once the leader finishes, the key is released
+    and the next call for it starts a fresh upstream request (this is not a cache).
+    """
+    
+    def __init__(self, name: str):
+        """
+        Initialize the single-flight group.
+        
+        Args:
+            name: Name of the group, used in logs and exported statistics
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, concurrent.futures.Future] = {}
+        self._stats = {
+            'calls': 0,
+            'upstream_calls': 0,
+            'suppressed_duplicates': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'waiter_timeouts': 0
+        }
+    
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        Build a stable cache key from the parts that define an upstream request.
+        
+        Args:
+            parts: JSON-serializable values (operation name, model, prompt input...)
+        
+        Returns:
+            Hex digest identifying the request
+        """
+        serialized = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+    
+    async def do(self, key: str, call: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """
+        Execute the call, or join an identical call that is already in flight.
+        
+        Args:
+            key: Cache key identifying the request (see make_key)
+            call: Zero-argument coroutine factory performing the upstream request
+            timeout: Optional maximum number of seconds to wait for the result
+        
+        Returns:
+            Result of the upstream call
+        
+        Raises:
+            asyncio.TimeoutError: If the call does not complete within the timeout
+            Exception: Any error raised by the leader's upstream call
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            
+            if is_leader:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+                self._stats['upstream_calls'] += 1
+            else:
+                self._stats['suppressed_duplicates'] += 1
+        
+        if is_leader:
+            return await self._lead(key, future, call, timeout)
+        
+        self.logger.debug(f"Single-flight '{self.name}': joined in-flight request {key[:12]}")
+        return await self._wait(future, timeout)
+    
+    async def _lead(self, key: str, future: concurrent.futures.Future,
+                    call: Callable[[], Awaitable[T]], timeout: Optional[float]) -> T:
+        """Run the upstream call as leader and publish the outcome to all waiters."""
+        try:
+            result = await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError:
+            self._record('timeouts')
+            error = asyncio.TimeoutError(f"Upstream call timed out after {timeout}s")
+            self._complete(key, future, error=error)
+            raise error
+        except asyncio.CancelledError:
+            # The leader's task was cancelled; waiters must not hang forever
+            self._record('errors')
+            self._complete(key, future, error=SingleFlightError("Leader request was cancelled"))
+            raise
+        except Exception as e:
+            self._record('errors')
+            self._complete(key, future, error=e)
+            raise
+        
+        self._complete(key, future, result=result)
+        return result
+    
+    async def _wait(self, future: concurrent.futures.Future, timeout: Optional[float]) -> Any:
+        """Await the leader's future without letting a waiter's timeout cancel it."""
+        shared = asyncio.wrap_future(future)
+        # Mark the outcome as retrieved even if this waiter gives up before it arrives
+        shared.add_done_callback(lambda f: f.cancelled() or f.exception())
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(shared), timeout)
+        except asyncio.TimeoutError:
+            self._record('waiter_timeouts')
+            raise
+    
+    def _complete(self, key: str, future: concurrent.futures.Future,
+                  result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Release the key and resolve the shared future."""
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        
+        if future.done():
+            return
+        
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def _record(self, counter: str) -> None:
+        """Increment a statistics counter."""
+        with self._lock:
+            self._stats[counter] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return coalescing statistics for the metrics endpoint.
+        
+        Returns:
+            Dictionary of counters plus the number of requests currently in flight
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+        
+        stats['name'] = self.name
+        return stats
+
+
+# Global single-flight group for LLM requests
+llm_single_flight = SingleFlight('llm')
@@ -0,0 +1,371 @@
+"""
+10NetZero-FLRTS Site Locator
+
+Resolves a GPS position - a Telegram location message, or lat/lon on the API - to the
+nearest sites, so a technician standing on a pad does not have to name it.
+
+Coordinates come from the `sites` directory (site_latitude/site_longitude) and are
+kept in memory as numpy arrays, bucketed into a grid of `site_locator_cell_degrees`
+cells. A lookup visits rings of cells outward from the query's cell, computing the
+haversine distances of each ring's sites in one vectorised step, and stops as soon as
+no unvisited cell can hold a closer site. Lookups take microseconds and touch only the
+sites near the query. The grid is rebuilt from the database every
+`site_locator_refresh_seconds` in the background.
+
+The site a user's latest location resolved to is remembered for
+`site_location_ttl_seconds` and used for their field reports that name no site, ahead
+of their primary site. This memory is per worker process.
+"""
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Directories up to this size are scanned in full: one vectorised pass beats the grid walk
+BRUTE_FORCE_SITES = 1024
+
+# Walking one grid cell in Python costs about as much as scoring this many sites in numpy
+CELL_COST_IN_SITES = 8
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distances from one point to many.
+    
+    Args:
+        lat: Query latitude in radians
+        lon: Query longitude in radians
+        lats: Latitudes in radians
+        lons: Longitudes in radians
+    
+    Returns:
+        Distances in kilometres
+    """
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+@dataclass
+class SiteGrid:
+    """Immutable snapshot of the site directory, bucketed into lat/lon cells."""
+    cell_degrees: float
+    sites: List[Dict[str, Any]] = field(default_factory=list)
+    lats: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    lons: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    cells: Dict[Tuple[int, int], np.ndarray] = field(default_factory=dict)
+    
+    @property
+    def columns(self) -> int:
+        """Number of longitude cells around the globe."""
+        return math.ceil(360.0 / self.cell_degrees)
+    
+    def cell_of(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Grid cell containing a position (in degrees)."""
+        return (
+            math.floor((latitude + 90.0) / self.cell_degrees),
+            math.floor((longitude + 180.0) / self.cell_degrees) % self.columns
+        )
+    
+    @classmethod
+    def build(cls, sites: List[Dict[str, Any]], cell_degrees: float) -> 'SiteGrid':
+        """
+        Build a grid from site records; sites without coordinates are left out.
+        
+        Args:
+            sites: Site records with site_latitude and site_longitude
+            cell_degrees: Cell size in degrees
+        
+        Returns:
+            The grid
+        """
+        grid = cls(cell_degrees=cell_degrees)
+        located = []
+        for site in sites:
+            try:
+                latitude, longitude = float(site['site_latitude']), float(site['site_longitude'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0:
+                located.append((latitude, longitude, site))
+        
+        grid.sites = [
+            {
+                'id': site['id'],
+                'site_id_display': site.get('site_id_display'),
+                'site_name': site.get('site_name'),
+                'site_latitude': latitude,
+                'site_longitude': longitude
+            }
+            for latitude, longitude, site in located
+        ]
+        grid.lats = np.radians([latitude for latitude, _, _ in located]).astype(np.float64)
+        grid.lons = np.radians([longitude for _, longitude, _ in located]).astype(np.float64)
+        
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for position, (latitude, longitude, _) in enumerate(located):
+            buckets.setdefault(grid.cell_of(latitude, longitude), []).append(position)
+        grid.cells = {cell: np.array(positions, dtype=np.intp) for cell, positions in buckets.items()}
+        return grid
+
+
+class SiteLocator:
+    """
+    Nearest-site lookups over an in-memory grid of site coordinates.
+    
+    The grid is replaced wholesale on refresh, so lookups read a consistent snapshot
+    without taking a lock.
+    """
+    
+    def __init__(self):
+        """Initialize an empty locator; sites are loaded on first use."""
+        self.logger = logging.getLogger(__name__)
+        self.cell_degrees = settings.site_locator_cell_degrees
+        self.max_distance_km = settings.site_locator_max_distance_km
+        self.refresh_interval = settings.site_locator_refresh_seconds
+        self.location_ttl = settings.site_location_ttl_seconds
+        
+        self._grid = SiteGrid(cell_degrees=self.cell_degrees)
+        self._loaded = False
+        self._synced_at = 0.0
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+        
+        # user key -> (expiry, site)
+        self._locations: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._locations_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'lookups': 0,
+            'resolved': 0,
+            'out_of_range': 0
+        }
+    
+    def load(self) -> int:
+        """
+        Rebuild the grid from the active sites in the database.
+        
+        Returns:
+            Number of sites with coordinates
+        """
+        started = time.perf_counter()
+        grid = SiteGrid.build(get_db_client().get_sites(active_only=True), self.cell_degrees)
+        self._grid = grid
+        self._loaded = True
+        self._synced_at = time.monotonic()
+        
+        self.logger.info(
+            f"Site locator loaded {len(grid.sites)} sites into {len(grid.cells)} cells in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return len(grid.sites)
+    
+    def _ensure_fresh(self) -> None:
+        """Load on first use and schedule background reloads when stale."""
+        if not self._loaded:
+            with self._build_lock:
+                if not self._loaded:
+                    self.load()
+            return
+        
+        if time.monotonic() - self._synced_at > self.refresh_interval and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._background_load, name='site-locator-load', daemon=True).start()
+    
+    def _background_load(self) -> None:
+        """Reload without blocking callers; keep serving the current grid on failure."""
+        try:
+            with self._build_lock:
+                self.load()
+        except Exception as e:
+            self.logger.warning(f"Site locator reload failed, keeping current grid: {e}")
+            self._synced_at = time.monotonic()
+        finally:
+            self._refreshing = False
+    
+    def nearest(self, latitude: float, longitude: float, limit: int = 1,
+                max_distance_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Find the sites nearest to a position.
+        
+        Args:
+            latitude: Latitude in degrees
+            longitude: Longitude in degrees
+            limit: Maximum number of sites
+            max_distance_km: Only return sites within this distance
+        
+        Returns:
+            Sites (id, site_id_display, site_name, site_latitude, site_longitude) with
+            distance_km, nearest first
+        
+        Raises:
+            ValueError: If the position is not a valid latitude/longitude
+        """
+        if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+            raise ValueError(f"Invalid position: {latitude}, {longitude}")
+        
+        self._ensure_fresh()
+        self._record('lookups')
+        grid = self._grid
+        if not grid.sites or limit <= 0:
+            return []
+        
+        positions, distances = self._search(grid, latitude, longitude, limit, max_distance_km)
+        return [
+            dict(grid.sites[position], distance_km=round(float(distance), 3))
+            for position, distance in zip(positions, distances)
+            if max_distance_km is None or distance <= max_distance_km
+        ]
+    
+    def _search(self, grid: SiteGrid, latitude: float, longitude: float, limit: int,
+                max_distance_km: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Ring search over the grid; returns the best positions and distances, nearest first."""
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        
+        # Small directories are scored in one vectorised pass, faster than walking cells
+        if len(grid.sites) <= BRUTE_FORCE_SITES:
+            return self._closest(np.arange(len(grid.sites)), haversine_km(lat, lon, grid.lats, grid.lons), limit)
+        
+        row, column = grid.cell_of(latitude, longitude)
+        columns = grid.columns
+        cell = math.radians(grid.cell_degrees)
+        positions = np.zeros(0, dtype=np.intp)
+        distances = np.zeros(0)
+        ring = 0
+        
+        while True:
+            # Once a ring costs more to walk than scoring every site, score every site
+            if 8 * ring * CELL_COST_IN_SITES > len(grid.sites) or ring * cell >= math.pi:
+                return self._closest(np.arange(len(grid.sites)), haversine_km(lat, lon, grid.lats, grid.lons), limit)
+            
+            found = [
+                grid.cells[key] for key in self._ring_cells(row, column, ring, columns) if key in grid.cells
+            ]
+            if found:
+                candidates = np.concatenate(found)
+                positions = np.concatenate((positions, candidates))
+                distances = np.concatenate((distances, haversine_km(lat, lon, grid.lats[candidates], grid.lons[candidates])))
+                if len(distances) > limit:
+                    positions, distances = self._closest(positions, distances, limit, ordered=False)
+            
+            # Nothing beyond this ring is closer than `bound`: it is at least `ring` whole
+            # cells away in latitude or in longitude (at the most poleward latitude reached)
+            poleward = min(math.pi / 2, abs(lat) + (ring + 1) * cell)
+            bound = EARTH_RADIUS_KM * min(ring * cell, 2 * math.asin(min(1.0, math.cos(poleward) * math.sin(ring * cell / 2))))
+            if len(distances) >= limit and bound >= distances.max():
+                break
+            if max_distance_km is not None and bound > max_distance_km:
+                break
+            ring += 1
+        
+        return self._closest(positions, distances, limit)
+    
+    @staticmethod
+    def _ring_cells(row: int, column: int, ring: int, columns: int):
+        """Cells exactly `ring` steps (Chebyshev distance) from a cell, wrapping in longitude."""
+        if ring == 0:
+            yield row, column
+            return
+        for d_column in range(-ring, ring + 1):
+            yield row - ring, (column + d_column) % columns
+            yield row + ring, (column + d_column) % columns
+        for d_row in range(-ring + 1, ring):
+            yield row + d_row, (column - ring) % columns
+            yield row + d_row, (column + ring) % columns
+    
+    @staticmethod
+    def _closest(positions: np.ndarray, distances: np.ndarray, limit: int,
+                 ordered: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep the `limit` smallest distances (sorted nearest first unless ordered=False)."""
+        if len(distances) > limit:
+            keep = np.argpartition(distances, limit - 1)[:limit]
+            positions, distances = positions[keep], distances[keep]
+        if ordered:
+            order = np.argsort(distances)
+            positions, distances = positions[order], distances[order]
+        return positions, distances
+
+    def resolve(self, latitude: float, longitude: float) -> Optional[Dict[str, Any]]:
+        """
+        The site a position is at: the nearest one within site_locator_max_distance_km.
+        
+        Args:
+            latitude: Latitude in degrees
+            longitude: Longitude in degrees
+        
+        Returns:
+            Site with distance_km, or None if no site is close enough
+        """
+        nearest = self.nearest(latitude, longitude, limit=1, max_distance_km=self.max_distance_km)
+        self._record('resolved' if nearest else 'out_of_range')
+        return nearest[0] if nearest else None
+    
+    def remember(self, user_key: str, site: Optional[Dict[str, Any]]) -> None:
+        """
+        Remember (or with None, forget) the site a user's latest location resolved to.
+        
+        Args:
+            user_key: flrts_users ID
+            site: Resolved site
+        """
+        now = time.monotonic()
+        with self._locations_lock:
+            if site is None:
+                self._locations.pop(user_key, None)
+                return
+            
+            self._locations[user_key] = (now + self.location_ttl, site)
+            if len(self._locations) > 10000:
+                for key in [key for key, (expires, _) in self._locations.items() if expires <= now]:
+                    del self._locations[key]
+    
+    def located_site(self, user_key: str) -> Optional[Dict[str, Any]]:
+        """
+        The site a user's recent location resolved to, if it has not expired.
+        
+        Args:
+            user_key: flrts_users ID
+        
+        Returns:
+            Site, or None
+        """
+        with self._locations_lock:
+            entry = self._locations.get(user_key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._locations[user_key]
+                return None
+            return entry[1]
+    
+    def _record(self, counter: str) -> None:
+        with self._stats_lock:
+            self._stats[counter] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return locator statistics for the metrics endpoint."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._locations_lock:
+            stats['located_users'] = len(self._locations)
+        grid = self._grid
+        stats.update(
+            sites=len(grid.sites),
+            cells=len(grid.cells),
+            age_seconds=round(time.monotonic() - self._synced_at, 1) if self._loaded else None
+        )
+        return stats
+
+
+# Global site locator instance
+site_locator = SiteLocator()
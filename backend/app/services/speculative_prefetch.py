@@ -0,0 +1,124 @@
+"""
+10NetZero-FLRTS Speculative Context Prefetch
+
+Intent classification can take a full LLM round trip, and almost every handler then
+starts with the same blocking database reads (the user's open tasks, their primary
+site, recent field reports). This module starts those reads in worker threads while
+classification is still running, so database latency overlaps LLM latency instead
+of adding to it.
+
+Once the intent is known, loads the handler will not use are cancelled. A load that
+has already started in its worker thread cannot be interrupted; its result is simply
+discarded. Handlers that find no prefetched value load the data themselves.
+"""
+
+import asyncio
+import contextvars
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class SpeculativePrefetch:
+    """
+    A set of named blocking loads started ahead of need for one request.
+    
+    Must be created, consumed and closed on the same event loop.
+    """
+    
+    def __init__(self, loaders: Dict[str, Callable[[], Any]], stats: 'PrefetchStats'):
+        """
+        Start every loader in a worker thread.
+        
+        Args:
+            loaders: Mapping of key to zero-argument blocking callable
+            stats: Statistics collector shared by all requests
+        """
+        self.stats = stats
+        self._tasks: Dict[str, asyncio.Task] = {
+            key: asyncio.ensure_future(asyncio.to_thread(loader)) for key, loader in loaders.items()
+        }
+        self.stats.record('started', len(self._tasks))
+    
+    def keep_only(self, keys: Iterable[str]) -> None:
+        """
+        Cancel the loads that will not be used.
+        
+        Args:
+            keys: Keys the selected handler may consume
+        """
+        wanted = set(keys)
+        for key in [key for key in self._tasks if key not in wanted]:
+            self._discard(self._tasks.pop(key))
+    
+    async def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return a prefetched value, or load it directly if it was not prefetched.
+        
+        Errors from a prefetched load are raised here exactly as a direct call would
+        raise them.
+        
+        Args:
+            key: Prefetch key
+            loader: Blocking callable used when nothing was prefetched
+        
+        Returns:
+            The loaded value
+        """
+        task = self._tasks.pop(key, None)
+        if task is None:
+            self.stats.record('misses')
+            return loader()
+        
+        self.stats.record('hits' if task.done() else 'partial_hits')
+        return await task
+    
+    def close(self) -> None:
+        """Cancel whatever is left once the handler has finished."""
+        for task in self._tasks.values():
+            self._discard(task)
+        self._tasks.clear()
+    
+    def _discard(self, task: asyncio.Task) -> None:
+        """Cancel a load, or drop its finished result without leaking its exception."""
+        if task.done():
+            if not task.cancelled():
+                task.exception()
+            self.stats.record('wasted')
+        else:
+            task.cancel()
+            self.stats.record('cancelled')
+
+
+class PrefetchStats:
+    """Thread-safe counters describing how useful speculative loads are."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            'started': 0,
+            'hits': 0,
+            'partial_hits': 0,
+            'misses': 0,
+            'cancelled': 0,
+            'wasted': 0
+        }
+    
+    def record(self, counter: str, amount: int = 1) -> None:
+        """Increment a statistics counter."""
+        with self._lock:
+            self._stats[counter] += amount
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return prefetch statistics for the metrics endpoint."""
+        with self._lock:
+            return dict(self._stats)
+
+
+# Prefetch belonging to the request being processed in the current context
+current_prefetch: contextvars.ContextVar[Optional[SpeculativePrefetch]] = contextvars.ContextVar(
+    'flrts_speculative_prefetch', default=None
+)
+
+
+# Global speculative prefetch statistics instance
+prefetch_stats = PrefetchStats()
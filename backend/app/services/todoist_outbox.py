@@ -0,0 +1,282 @@
+"""
+10NetZero-FLRTS Todoist Outbox Dispatcher
+
+Todoist is a mirror of the tasks stored in Supabase, not part of the request path.
+Request handlers write the task and a `todoist_outbox` row in the same transaction
+(see DatabaseClient.create_task_with_outbox / update_task_status); this module drains
+the outbox in a background thread.
+
+Each pass claims a batch of due rows (FOR UPDATE SKIP LOCKED, so every worker process
+can run a dispatcher), sends them to the Todoist Sync API as a single request, and
+records the outcome: delivered rows are marked Done and new Todoist IDs are written
+back to tasks.todoist_task_id, failed rows are retried with exponential backoff, and
+rows that keep failing are dead-lettered for inspection.
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import settings
+from app.services.database_client import get_db_client
+from app.services.external_apis import todoist_service, TodoistRateLimitError
+
+
+# Todoist accepts at most 100 commands per sync request
+MAX_SYNC_COMMANDS = 100
+
+
+def build_create_payload(task_data: Dict[str, Any], parsed: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the Todoist item_add arguments for a task.
+    
+    Args:
+        task_data: Task record or insert data
+        parsed: Optional date parser output (used for due times and recurrence)
+    
+    Returns:
+        Arguments for a Sync API item_add command
+    """
+    args = {
+        'content': task_data['task_title'],
+        'description': task_data.get('task_description_detailed') or '',
+        'priority': {'High': 4, 'Medium': 2, 'Low': 1}.get(task_data.get('priority'), 1)
+    }
+    
+    if parsed and parsed.get('is_recurring'):
+        # Todoist only repeats tasks whose due date it parsed from a string itself
+        args['due'] = {'string': ' '.join(parsed['matched']), 'lang': 'en'}
+    elif parsed and parsed.get('due_datetime'):
+        due = datetime.fromisoformat(parsed['due_datetime']).astimezone(timezone.utc)
+        args['due'] = {'date': due.strftime('%Y-%m-%dT%H:%M:%SZ')}
+    elif task_data.get('due_date'):
+        args['due'] = {'date': str(task_data['due_date'])}
+    
+    return args
+
+
+class TodoistOutboxDispatcher:
+    """
+    Background dispatcher that drains the todoist_outbox table to Todoist.
+    
+    One daemon thread per worker process polls for due rows and is woken early by
+    notify() when a request handler has just enqueued something.
+    """
+    
+    def __init__(self):
+        """Initialize the dispatcher from settings; the thread starts in start()."""
+        self.logger = logging.getLogger(__name__)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        
+        self.batch_size = min(settings.todoist_outbox_batch_size, MAX_SYNC_COMMANDS)
+        self.poll_interval = settings.todoist_outbox_poll_seconds
+        self.max_attempts = settings.todoist_outbox_max_attempts
+        self.backoff_base = settings.todoist_outbox_backoff_seconds
+        self.backoff_max = settings.todoist_outbox_max_backoff_seconds
+        self.lock_timeout = settings.todoist_outbox_lock_timeout_seconds
+        
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'delivered': 0,
+            'retried': 0,
+            'deferred': 0,
+            'dead_lettered': 0,
+            'request_failures': 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """Mirroring needs Todoist credentials and a direct PostgreSQL connection."""
+        return (
+            settings.todoist_mirror_enabled
+            and todoist_service.enabled
+            and bool(settings.database_url or settings.postgres_password)
+        )
+    
+    def start(self) -> bool:
+        """
+        Start the dispatcher thread (idempotent).
+        
+        Returns:
+            True if the dispatcher is running
+        """
+        if not self.enabled:
+            self.logger.info("Todoist outbox dispatcher disabled")
+            return False
+        
+        if self._thread and self._thread.is_alive():
+            return True
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='todoist-outbox', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Todoist outbox dispatcher started ({self.worker_id})")
+        return True
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the dispatcher thread after its current batch."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def notify(self) -> None:
+        """Wake the dispatcher early because new rows were enqueued."""
+        self._wake.set()
+    
+    def _run(self) -> None:
+        """Dispatch loop: drain full batches back to back, otherwise wait for work."""
+        while not self._stop.is_set():
+            try:
+                claimed = self.dispatch_once()
+            except Exception as e:
+                self.logger.error(f"Todoist outbox dispatch failed: {e}")
+                claimed = 0
+            
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+    
+    def dispatch_once(self) -> int:
+        """
+        Claim one batch of due rows, send it to Todoist and record the results.
+        
+        Returns:
+            Number of rows claimed
+        """
+        db_client = get_db_client()
+        rows = db_client.claim_todoist_outbox(self.worker_id, self.batch_size, self.lock_timeout)
+        if not rows:
+            return 0
+        
+        commands, sent_rows, done, retry = self._build_commands(rows)
+        dead: List[Tuple[int, str]] = []
+        todoist_ids: Dict[str, str] = {}
+        
+        if commands:
+            try:
+                response = todoist_service.sync_commands(commands)
+                self._record('batches')
+            except TodoistRateLimitError as e:
+                self._record('request_failures')
+                self._fail_all(sent_rows, str(e), retry, dead, delay=e.retry_after)
+                response = None
+            except Exception as e:
+                self._record('request_failures')
+                self._fail_all(sent_rows, str(e), retry, dead)
+                response = None
+            
+            if response is not None:
+                self._apply_response(response, sent_rows, done, retry, dead, todoist_ids)
+        
+        db_client.finish_todoist_outbox(done, retry, dead, todoist_ids)
+        
+        self._record('delivered', len(done))
+        self._record('dead_lettered', len(dead))
+        if dead:
+            self.logger.warning(f"Dead-lettered {len(dead)} Todoist outbox rows: {[row_id for row_id, _ in dead]}")
+        
+        return len(rows)
+    
+    def _build_commands(self, rows: List[Dict[str, Any]]):
+        """
+        Turn claimed rows into Sync API commands.
+        
+        A completion for a task whose creation is in the same batch refers to the
+        create command's temp_id; one whose creation is still undelivered elsewhere
+        is deferred without using up an attempt.
+        """
+        commands = []
+        sent_rows: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        done: List[int] = []
+        retry: List[Tuple[int, float, Optional[str], bool]] = []
+        temp_ids: Dict[str, str] = {}
+        
+        for row in rows:
+            command_uuid = str(row['command_uuid'])
+            task_id = str(row['task_id'])
+            
+            if row['operation'] == 'create_task':
+                if row['todoist_task_id']:
+                    # Already mirrored (e.g. response lost after Todoist applied it)
+                    done.append(row['id'])
+                    continue
+                temp_id = str(uuid.uuid4())
+                temp_ids[task_id] = temp_id
+                commands.append({'type': 'item_add', 'uuid': command_uuid, 'temp_id': temp_id, 'args': row['payload']})
+                sent_rows[command_uuid] = (row, temp_id)
+            
+            elif row['operation'] == 'complete_task':
+                todoist_id = row['todoist_task_id'] or temp_ids.get(task_id)
+                if todoist_id:
+                    commands.append({'type': 'item_close', 'uuid': command_uuid, 'args': {'id': todoist_id}})
+                    sent_rows[command_uuid] = (row, None)
+                elif row['create_pending']:
+                    retry.append((row['id'], self.poll_interval, None, False))
+                    self._record('deferred')
+                else:
+                    # The task was never mirrored to Todoist; nothing to complete there
+                    done.append(row['id'])
+        
+        return commands, sent_rows, done, retry
+    
+    def _apply_response(self, response: Dict[str, Any], sent_rows, done, retry, dead, todoist_ids) -> None:
+        """Sort commands into delivered, retried and dead-lettered rows."""
+        sync_status = response.get('sync_status', {})
+        temp_id_mapping = response.get('temp_id_mapping', {})
+        
+        for command_uuid, (row, temp_id) in sent_rows.items():
+            status = sync_status.get(command_uuid)
+            
+            if status == 'ok':
+                done.append(row['id'])
+                if temp_id and temp_id in temp_id_mapping:
+                    todoist_ids[str(row['task_id'])] = str(temp_id_mapping[temp_id])
+            else:
+                error = status.get('error') if isinstance(status, dict) else 'No status returned for command'
+                self._fail(row, str(error), retry, dead)
+    
+    def _fail_all(self, sent_rows, error: str, retry, dead, delay: Optional[float] = None) -> None:
+        """Schedule every sent row for retry after a request-level failure."""
+        for row, _ in sent_rows.values():
+            self._fail(row, error, retry, dead, delay)
+    
+    def _fail(self, row: Dict[str, Any], error: str, retry, dead, delay: Optional[float] = None) -> None:
+        """Retry a failed row with backoff, or dead-letter it once attempts run out."""
+        if row['attempts'] >= self.max_attempts:
+            dead.append((row['id'], error))
+            return
+        
+        retry.append((row['id'], delay if delay is not None else self._backoff(row['attempts']), error, True))
+        self._record('retried')
+    
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with equal jitter (half to all of the step), capped at the configured maximum."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** max(attempts - 1, 0)))
+        return random.uniform(ceiling / 2, ceiling)
+    
+    def _record(self, counter: str, amount: int = 1) -> None:
+        """Increment a statistics counter."""
+        with self._stats_lock:
+            self._stats[counter] += amount
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return dispatcher statistics for the metrics endpoint."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        
+        stats['running'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+
+# Global Todoist outbox dispatcher instance
+todoist_outbox = TodoistOutboxDispatcher()
@@ -0,0 +1,216 @@
+"""
+10NetZero-FLRTS Telegram Update Deduplication
+
+Telegram redelivers a webhook update whenever it does not get a timely 2xx answer,
+so a slow worker can receive the same update several times. Each copy would be
+deserialized, queued and run through the NLP pipeline again, creating duplicate
+tasks and replies.
+
+This module remembers the `update_id`s a deployment has accepted. The webhook checks
+the raw payload's `update_id` before building an Update object, and a redelivery is
+acknowledged without any further work. Each worker keeps a bounded ring of recent
+IDs in memory; when TELEGRAM_UPDATE_DEDUP_REDIS_URL is configured the IDs are also
+recorded in Redis (one short-lived key per update) so retries that land on another
+worker or host are caught too.
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+from config.settings import settings
+
+try:
+    import redis
+except ImportError:  # Redis is optional; the in-memory ring is always available
+    redis = None
+
+
+class InMemorySeenUpdates:
+    """Bounded ring of recently seen update IDs for a single worker process."""
+    
+    name = 'memory'
+    
+    def __init__(self, capacity: int):
+        """
+        Initialize an empty ring.
+        
+        Args:
+            capacity: Number of update IDs remembered; the oldest is forgotten first
+        """
+        self.capacity = max(1, capacity)
+        self._order: Deque[int] = deque()
+        self._ids: Set[int] = set()
+        self._lock = threading.Lock()
+    
+    def add(self, update_id: int) -> bool:
+        """
+        Record an update ID.
+        
+        Args:
+            update_id: Telegram update_id
+        
+        Returns:
+            False if the ID was already in the ring
+        """
+        with self._lock:
+            if update_id in self._ids:
+                return False
+            if len(self._order) >= self.capacity:
+                self._ids.discard(self._order.popleft())
+            self._order.append(update_id)
+            self._ids.add(update_id)
+            return True
+    
+    def discard(self, update_id: int) -> None:
+        """Forget an update ID so a redelivery is accepted again."""
+        with self._lock:
+            if update_id in self._ids:
+                self._ids.discard(update_id)
+                self._order.remove(update_id)
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class RedisSeenUpdates:
+    """
+    Seen update IDs shared across workers and hosts through Redis.
+    
+    Each ID is a key set with NX and an expiry, so claiming is a single atomic
+    round trip and old IDs clean themselves up.
+    """
+    
+    name = 'redis'
+    
+    def __init__(self, url: str, ttl_seconds: int, key_prefix: str = 'flrts:telegram:update:'):
+        """
+        Initialize the Redis backend.
+        
+        Args:
+            url: Redis connection URL
+            ttl_seconds: How long an update ID is remembered
+            key_prefix: Prefix applied to every update key
+        """
+        if redis is None:
+            raise RuntimeError("The redis package is required for the shared update dedup backend")
+        
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self.key_prefix = key_prefix
+    
+    def add(self, update_id: int) -> bool:
+        """Record an update ID (see InMemorySeenUpdates.add)."""
+        return bool(self.client.set(f"{self.key_prefix}{update_id}", 1, nx=True, ex=self.ttl_seconds))
+    
+    def discard(self, update_id: int) -> None:
+        """Forget an update ID so a redelivery is accepted again."""
+        self.client.delete(f"{self.key_prefix}{update_id}")
+
+
+class SeenUpdateStore:
+    """
+    Idempotency check for Telegram webhook deliveries.
+    
+    The local ring answers repeats seen by this worker without a network call; the
+    shared backend, when configured, decides for updates this worker has not seen.
+    If Redis is unreachable the local ring is used alone.
+    """
+    
+    def __init__(self, capacity: Optional[int] = None, redis_url: Optional[str] = None,
+                 ttl_seconds: Optional[int] = None):
+        """
+        Initialize the store with the configured backends.
+        
+        Args:
+            capacity: IDs kept in the local ring (default settings.telegram_seen_update_capacity)
+            redis_url: Shared backend URL (default settings.telegram_update_dedup_redis_url)
+            ttl_seconds: Shared backend expiry (default settings.telegram_seen_update_ttl_seconds)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.local_backend = InMemorySeenUpdates(capacity or settings.telegram_seen_update_capacity)
+        self.shared_backend = None
+        
+        redis_url = redis_url or settings.telegram_update_dedup_redis_url
+        if redis_url:
+            try:
+                self.shared_backend = RedisSeenUpdates(
+                    redis_url, ttl_seconds or settings.telegram_seen_update_ttl_seconds
+                )
+                self.logger.info("Telegram update dedup using shared Redis backend")
+            except Exception as e:
+                self.logger.warning(f"Shared update dedup backend unavailable, using in-memory ring: {e}")
+        
+        self._lock = threading.Lock()
+        self._stats = {'checked': 0, 'accepted': 0, 'suppressed': 0, 'forgotten': 0, 'backend_errors': 0}
+    
+    def _record(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+    
+    def claim(self, update_id: Any) -> bool:
+        """
+        Mark an update as accepted for processing.
+        
+        Args:
+            update_id: update_id from the raw webhook payload
+        
+        Returns:
+            True if the update is new; False if it is a redelivery to drop
+        """
+        self._record('checked')
+        if not isinstance(update_id, int) or isinstance(update_id, bool):
+            # Malformed payloads are left to the Update parser to reject
+            return True
+        
+        if not self.local_backend.add(update_id):
+            self._record('suppressed')
+            return False
+        
+        if self.shared_backend is not None:
+            try:
+                if not self.shared_backend.add(update_id):
+                    self._record('suppressed')
+                    return False
+            except Exception as e:
+                self.logger.warning(f"Shared update dedup backend error, using in-memory ring only: {e}")
+                self._record('backend_errors')
+        
+        self._record('accepted')
+        return True
+    
+    def forget(self, update_id: Any) -> None:
+        """
+        Undo a claim for an update that was not processed (e.g. refused with a 503),
+        so Telegram's redelivery is accepted.
+        
+        Args:
+            update_id: update_id passed to claim()
+        """
+        if not isinstance(update_id, int) or isinstance(update_id, bool):
+            return
+        
+        self.local_backend.discard(update_id)
+        if self.shared_backend is not None:
+            try:
+                self.shared_backend.discard(update_id)
+            except Exception as e:
+                self.logger.warning(f"Shared update dedup backend error while forgetting {update_id}: {e}")
+                self._record('backend_errors')
+        self._record('forgotten')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return dedup counters for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'backend': self.shared_backend.name if self.shared_backend else self.local_backend.name,
+            'tracked_locally': len(self.local_backend),
+            'capacity': self.local_backend.capacity
+        })
+        return stats
+
+
+# Global seen Telegram update store instance
+seen_update_store = SeenUpdateStore()
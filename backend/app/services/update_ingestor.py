@@ -0,0 +1,255 @@
+"""
+10NetZero-FLRTS Telegram Update Ingestor
+
+The Telegram webhook is a synchronous Flask view, and gunicorn sync workers have no
+running event loop to hand updates to. This module gives each worker process one
+long-lived event loop in a daemon thread, fed by a bounded queue: the webhook only
+deserializes and enqueues the update, and the loop runs it through the bot
+application.
+
+Updates are sharded by chat onto ordered lanes. A lane processes its chat's updates
+strictly one after another, so "create task X" is handled before "mark X done";
+lanes for different chats run in parallel, up to `telegram_update_workers` updates
+at a time. Lanes are created when a chat sends something and reclaimed after
+`telegram_lane_idle_seconds` without traffic.
+
+When the queue is full the update is refused rather than buffered without limit;
+the webhook answers with an error status so Telegram redelivers it later. Queue
+depth, queue wait, processing time and lane counts are exported as metrics.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from config.settings import settings
+from app.services.pipeline_metrics import LatencyHistogram
+
+
+class _Lane:
+    """Pending updates of one chat and the task draining them."""
+    
+    __slots__ = ('items', 'wakeup', 'task')
+    
+    def __init__(self):
+        self.items: Deque[Tuple[Any, float]] = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class UpdateIngestor:
+    """
+    Bounded, chat-ordered update scheduler running on a dedicated event loop.
+    
+    submit() is safe to call from any thread; the handler coroutine always runs on
+    the ingestor's loop, so objects bound to a loop (the bot application, its HTTP
+    client) are created and used on that one loop only.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 lane_idle_seconds: Optional[float] = None):
+        """
+        Initialize the scheduler; the loop thread starts in start().
+        
+        Args:
+            workers: Updates processed at once (default settings.telegram_update_workers)
+            max_queue: Queued updates before submit() refuses (default settings.telegram_update_queue_size)
+            lane_idle_seconds: Idle time before a chat's lane is reclaimed (default settings.telegram_lane_idle_seconds)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_queue = max_queue or settings.telegram_update_queue_size
+        self.workers = workers or settings.telegram_update_workers
+        self.lane_idle_seconds = lane_idle_seconds or settings.telegram_lane_idle_seconds
+        
+        self._handler: Optional[Callable[[Any], Awaitable[None]]] = None
+        self._key: Callable[[Any], Hashable] = lambda update: None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        
+        self._stats_lock = threading.Lock()
+        self._depth = 0
+        self._busy = 0
+        self._wait = LatencyHistogram()
+        self._processing = LatencyHistogram()
+        self._stats = {
+            'enqueued': 0,
+            'processed': 0,
+            'failed': 0,
+            'dropped': 0,
+            'max_depth': 0,
+            'lanes_created': 0,
+            'lanes_reclaimed': 0,
+            'max_lanes': 0
+        }
+    
+    @property
+    def running(self) -> bool:
+        """True if the loop thread is alive in this process."""
+        return bool(self._thread and self._thread.is_alive() and self._pid == os.getpid())
+    
+    def start(self, handler: Optional[Callable[[Any], Awaitable[None]]] = None,
+              key: Optional[Callable[[Any], Hashable]] = None, timeout: float = 5.0) -> bool:
+        """
+        Start the loop thread (idempotent).
+        
+        Also restarts the thread in a forked worker, where the parent's thread
+        does not exist.
+        
+        Args:
+            handler: Coroutine function run for every update (kept for restarts)
+            key: Returns the lane key (chat) of an update; updates with equal keys run in order
+            timeout: Seconds to wait for the loop to come up
+        
+        Returns:
+            True if the ingestor is running
+        """
+        with self._start_lock:
+            if handler:
+                self._handler = handler
+            if key:
+                self._key = key
+            if self.running:
+                return True
+            if not self._handler:
+                raise RuntimeError("Update ingestor has no handler")
+            
+            self._ready.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run_loop, name='telegram-updates', daemon=True)
+            self._thread.start()
+        
+        if not self._ready.wait(timeout):
+            self.logger.error("Telegram update loop did not start in time")
+            return False
+        
+        self.logger.info(f"Telegram update ingestor started ({self.workers} parallel chats, queue {self.max_queue})")
+        return True
+    
+    def _run_loop(self) -> None:
+        """Thread body: own an event loop for the life of the process."""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.workers)
+        self._lanes = {}
+        self._ready.set()
+        
+        try:
+            loop.run_forever()
+        finally:
+            lanes = [lane.task for lane in self._lanes.values() if lane.task]
+            for task in lanes:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*lanes, return_exceptions=True))
+            loop.close()
+    
+    def submit(self, update: Any) -> bool:
+        """
+        Enqueue an update for processing on its chat's lane.
+        
+        Args:
+            update: Deserialized update passed to the handler
+        
+        Returns:
+            False if the queue is full (the update was dropped)
+        """
+        if not self.running and not self.start():
+            return False
+        
+        with self._stats_lock:
+            if self._depth >= self.max_queue:
+                self._stats['dropped'] += 1
+                return False
+            self._depth += 1
+            self._stats['enqueued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._depth)
+        
+        self._loop.call_soon_threadsafe(self._dispatch, self._key(update), update, time.perf_counter())
+        return True
+    
+    def _dispatch(self, key: Hashable, update: Any, enqueued_at: float) -> None:
+        """Append an update to its lane, starting the lane if needed (runs on the loop)."""
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+            with self._stats_lock:
+                self._stats['lanes_created'] += 1
+                self._stats['max_lanes'] = max(self._stats['max_lanes'], len(self._lanes))
+        
+        lane.items.append((update, enqueued_at))
+        lane.wakeup.set()
+        if lane.task is None:
+            lane.task = self._loop.create_task(self._drain(key, lane))
+    
+    async def _drain(self, key: Hashable, lane: _Lane) -> None:
+        """Process one lane's updates in order; retire the lane once it stays idle."""
+        while True:
+            while lane.items:
+                update, enqueued_at = lane.items.popleft()
+                async with self._slots:
+                    await self._process(update, enqueued_at)
+            
+            lane.wakeup.clear()
+            try:
+                await asyncio.wait_for(lane.wakeup.wait(), self.lane_idle_seconds)
+            except asyncio.TimeoutError:
+                # _dispatch runs on this loop too, so nothing can arrive between this check and the removal
+                if not lane.items:
+                    del self._lanes[key]
+                    with self._stats_lock:
+                        self._stats['lanes_reclaimed'] += 1
+                    return
+    
+    async def _process(self, update: Any, enqueued_at: float) -> None:
+        """Run the handler for one update and record its timings."""
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._depth -= 1
+            self._busy += 1
+            self._wait.observe((started - enqueued_at) * 1000)
+        
+        outcome = 'processed'
+        try:
+            await self._handler(update)
+        except Exception as e:
+            outcome = 'failed'
+            self.logger.error(f"Telegram update processing failed: {e}", exc_info=True)
+        finally:
+            with self._stats_lock:
+                self._busy -= 1
+                self._stats[outcome] += 1
+                self._processing.observe((time.perf_counter() - started) * 1000)
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the loop; updates still queued are discarded."""
+        if self._loop and self.running:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue, lane and processing statistics for the metrics endpoint."""
+        with self._stats_lock:
+            return dict(
+                self._stats,
+                running=self.running,
+                workers=self.workers,
+                busy_workers=self._busy,
+                active_lanes=len(self._lanes),
+                queue_depth=self._depth,
+                queue_capacity=self.max_queue,
+                queue_wait=self._wait.snapshot(),
+                processing=self._processing.snapshot()
+            )
+
+
+# Global Telegram update ingestor instance
+telegram_update_ingestor = UpdateIngestor()
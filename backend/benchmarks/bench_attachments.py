@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+10NetZero-FLRTS Field Report Attachment Benchmark
+
+Streams files through ReportAttachmentService.receive() the way the Telegram handler
+does and reports throughput and peak Python memory, next to downloading the same
+files whole (what python-telegram-bot's File.download_* methods do).
+
+A local HTTP server stands in for Telegram's file endpoint and serves generated
+content in small writes; storage is a LocalAttachmentStorage under a temporary
+directory and the database is an in-memory stub. Every stored file is checked
+against the size and SHA-256 recorded for it, and a file over the size limit is
+sent to prove the download is aborted instead of read to the end.
+
+Usage (from the backend directory):
+    python benchmarks/bench_attachments.py [--sizes-mb 1,5,19] [--files 8]
+        [--concurrency 4] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BLOCK = hashlib.sha256(b'flrts').digest() * 2048  # 64KB of file content, repeated
+
+
+def load_attachment_module():
+    """Create the app with placeholder settings and return the report_attachments module."""
+    os.environ.setdefault('SUPABASE_URL', 'https://bench.supabase.co')
+    os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.e30.bench')
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:bench')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE_PATH', os.devnull)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import app  # noqa: F401  (creates the Flask app and the service singletons)
+
+    return sys.modules['app.services.report_attachments']
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """
+    Serves /<bytes> as that many bytes of generated content, written 64KB at a time.
+
+    /<bytes>/unsized omits Content-Length, so the size is only known once read.
+    """
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        size = int(parts[0])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        if parts[1:] != ['unsized']:
+            self.send_header('Content-Length', str(size))
+        self.end_headers()
+        remaining = size
+        try:
+            while remaining:
+                chunk = BLOCK[:min(remaining, len(BLOCK))]
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def expected_digest(size):
+    """SHA-256 of the content the server sends for a file of this size."""
+    digest = hashlib.sha256()
+    remaining = size
+    while remaining:
+        chunk = BLOCK[:min(remaining, len(BLOCK))]
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+class StubDatabase:
+    """Keeps attachment rows in memory."""
+
+    def __init__(self):
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def create_field_report_attachment(self, attachment_data):
+        row = dict(attachment_data, id=str(uuid.uuid4()))
+        with self.lock:
+            self.rows[row['id']] = row
+        return row
+
+    def update_field_report_attachment(self, attachment_id, update_data):
+        with self.lock:
+            self.rows[attachment_id].update(update_data)
+
+
+def stub_bot(base_url):
+    """A bot whose get_file() points at the local file server."""
+    async def get_file(file_id):
+        return SimpleNamespace(file_path=f"{base_url}/{file_id.split(':')[0]}")
+    return SimpleNamespace(get_file=get_file)
+
+
+async def stream_files(module, service, bot, size, files, concurrency):
+    """Receive `files` attachments of `size` bytes with `concurrency` at a time."""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def receive_one(index):
+        incoming = module.IncomingAttachment(
+            f"{size}:{index}", f"bench{index}", f"bench_{index}.bin", 'application/pdf', size, 'document'
+        )
+        async with gate:
+            return await service.receive(bot, incoming, 'bench-user')
+
+    return await asyncio.gather(*(receive_one(index) for index in range(files)))
+
+
+async def buffer_files(base_url, size, files, concurrency):
+    """Download the same files whole into memory, as File.download_to_memory would."""
+    import httpx
+
+    gate = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        async def fetch_one():
+            async with gate:
+                response = await client.get(f"{base_url}/{size}")
+                return len(response.content)
+
+        return await asyncio.gather(*(fetch_one() for _ in range(files)))
+
+
+def wait_for_storage(service, timeout=60.0):
+    """Wait until every received attachment has been moved into storage."""
+    deadline = time.monotonic() + timeout
+    while service.get_stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def measure(coroutine_factory):
+    """Run a coroutine and return (result, seconds, peak traced MB)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = asyncio.run(coroutine_factory())
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1048576
+
+
+def run_size(module, service, db, base_url, storage_root, size, files, concurrency):
+    """Stream and buffer `files` files of one size and compare."""
+    bot = stub_bot(base_url)
+    rows, stream_seconds, stream_peak_mb = measure(
+        lambda: stream_files(module, service, bot, size, files, concurrency)
+    )
+    wait_for_storage(service)
+
+    digest = expected_digest(size)
+    corrupt = 0
+    for row in rows:
+        stored = db.rows[row['id']]
+        path = service.storage.path(stored['storage_path']) if stored.get('storage_path') else None
+        if (stored['status'] != 'Stored' or stored['size_bytes'] != size or stored['sha256'] != digest
+                or not path or os.path.getsize(path) != size):
+            corrupt += 1
+
+    _, buffer_seconds, buffer_peak_mb = measure(lambda: buffer_files(base_url, size, files, concurrency))
+    total_mb = size * files / 1048576
+
+    return {
+        'file_mb': round(size / 1048576, 2),
+        'files': files,
+        'stream_mb_per_second': round(total_mb / stream_seconds, 1),
+        'stream_peak_python_mb': round(stream_peak_mb, 2),
+        'buffered_mb_per_second': round(total_mb / buffer_seconds, 1),
+        'buffered_peak_python_mb': round(buffer_peak_mb, 2),
+        'corrupt': corrupt
+    }
+
+
+def run_oversized(module, service, base_url):
+    """Send a file over the limit whose size nothing declares; the download must be aborted."""
+    size = service.max_bytes + 8 * 1048576
+    incoming = module.IncomingAttachment(f"{size}/unsized:0", 'oversized', 'oversized.pdf', 'application/pdf', None, 'document')
+    before = service.get_stats()['rejected_too_large']
+
+    async def receive():
+        try:
+            await service.receive(stub_bot(base_url), incoming, 'bench-user')
+        except module.AttachmentError:
+            return True
+        return False
+
+    refused = asyncio.run(receive())
+    staged = os.listdir(service.staging_dir) if os.path.isdir(service.staging_dir) else []
+    return {
+        'file_mb': round(size / 1048576, 2),
+        'refused': refused and service.get_stats()['rejected_too_large'] == before + 1,
+        'staged_files_left': len(staged)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mb', default='1,5,19', help='Comma-separated file sizes in MB')
+    parser.add_argument('--files', type=int, default=8, help='Files received per size')
+    parser.add_argument('--concurrency', type=int, default=4, help='Files received at once')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    module = load_attachment_module()
+    db = StubDatabase()
+    module.get_db_client = lambda: db
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as storage_root:
+        service = module.ReportAttachmentService(
+            storage=module.LocalAttachmentStorage(storage_root),
+            staging_dir=os.path.join(storage_root, '.incoming')
+        )
+        sizes = [int(float(size) * 1048576) for size in args.sizes_mb.split(',') if size.strip()]
+
+        report = {
+            'config': {
+                'files': args.files,
+                'concurrency': args.concurrency,
+                'chunk_bytes': service.chunk_bytes,
+                'max_bytes': service.max_bytes,
+                'thumbnails_enabled': module.Image is not None
+            },
+            'runs': [
+                run_size(module, service, db, base_url, storage_root, size, args.files, args.concurrency)
+                for size in sizes
+            ],
+            'oversized': run_oversized(module, service, base_url)
+        }
+
+    server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+
+    if any(run['corrupt'] for run in report['runs']) or not report['oversized']['refused']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+10NetZero-FLRTS Date Parser Benchmark
+
+Checks the local date/time parser against the expected parses in
+date_parser_corpus.json and measures its throughput.
+
+Usage (from the backend directory):
+    python benchmarks/bench_date_parser.py [--iterations 200] [--min-accuracy 0.95]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'date_parser_corpus.json')
+FIELDS = ('title', 'due_date', 'due_datetime', 'recurrence_rule')
+
+
+def load_date_parser_module():
+    """Load the parser module directly so the Flask app is not created on import."""
+    sys.path.insert(0, BACKEND_DIR)
+    spec = importlib.util.spec_from_file_location(
+        'date_parser', os.path.join(BACKEND_DIR, 'app', 'services', 'date_parser.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def check_accuracy(parser, corpus):
+    """Compare every case with its expected parse and report per-field accuracy."""
+    now = datetime.fromisoformat(corpus['reference_time'])
+    field_hits = {field: 0 for field in FIELDS}
+    exact_hits = 0
+    failures = []
+
+    for case in corpus['cases']:
+        result = parser.parse(case['text'], corpus['timezone'], now=now)
+        wrong = {
+            field: {'expected': case['expected'].get(field), 'actual': result[field]}
+            for field in FIELDS if result[field] != case['expected'].get(field)
+        }
+
+        for field in FIELDS:
+            if field not in wrong:
+                field_hits[field] += 1
+
+        if wrong:
+            failures.append({'text': case['text'], 'mismatches': wrong})
+        else:
+            exact_hits += 1
+
+    total = len(corpus['cases'])
+    return {
+        'cases': total,
+        'exact_match_accuracy': round(exact_hits / total, 4),
+        'field_accuracy': {field: round(hits / total, 4) for field, hits in field_hits.items()},
+        'failures': failures
+    }
+
+
+def measure_throughput(parser, corpus, iterations):
+    """Parse the whole corpus repeatedly and report parses per second."""
+    texts = [case['text'] for case in corpus['cases']]
+    timezone_name = corpus['timezone']
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            parser.parse(text, timezone_name)
+    elapsed = time.perf_counter() - started
+
+    parses = iterations * len(texts)
+    return {
+        'parses': parses,
+        'elapsed_seconds': round(elapsed, 3),
+        'parses_per_second': round(parses / elapsed, 1),
+        'mean_microseconds': round(elapsed / parses * 1_000_000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200, help='Corpus passes for the throughput run')
+    parser.add_argument('--min-accuracy', type=float, default=0.0,
+                        help='Exit non-zero if exact-match accuracy is below this value')
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding='utf-8') as corpus_file:
+        corpus = json.load(corpus_file)
+
+    module = load_date_parser_module()
+    date_parser = module.DateParser(corpus['timezone'])
+
+    report = {
+        'accuracy': check_accuracy(date_parser, corpus),
+        'throughput': measure_throughput(date_parser, corpus, args.iterations)
+    }
+    print(json.dumps(report, indent=2))
+
+    if report['accuracy']['exact_match_accuracy'] < args.min_accuracy:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
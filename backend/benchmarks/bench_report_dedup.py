@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+10NetZero-FLRTS Field Report Deduplication Benchmark
+
+Checks that resent field reports are collapsed, and that reports which only look
+alike are not. Then it times claim() against an index of recent reports and
+reports the results as JSON.
+
+The scenarios go through NLPService.handle_field_report_creation with the LLM off,
+backed by an in-memory database with two sites, and count the rows stored:
+
+- a resend, sequential and concurrent, stores one report
+- the same text for Site Alpha and Site Beta stores two reports, one per site
+- the same text from two technicians stores two reports
+
+Usage (from the backend directory):
+    python benchmarks/bench_report_dedup.py [--reports 5000] [--claims 2000]
+        [--seed 7] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_TEXT = (
+    "Field report {site}: Generator running at 80% load, fuel levels good, "
+    "coolant topped off, no alarms on the miners overnight"
+)
+
+TEMPLATES = [
+    "Generator {n} running at {p}% load, fuel at {q} percent, no alarms",
+    "Noticed oil leak near pump {n}, pressure {p} psi, isolated valve {q}",
+    "Replaced air filters on miners {n} through {p}, intake temp {q}F",
+    "Security check done, gate {n} locked, camera {p} offline since {q}:00",
+    "Visitor log: {n} contractors on site for transformer {p} inspection, left at {q}:30"
+]
+
+
+def load_app_modules():
+    """Create the app with placeholder settings and return the nlp_service and report_dedup modules."""
+    os.environ.setdefault('SUPABASE_URL', 'https://bench.supabase.co')
+    os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.e30.bench')
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:bench')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE_PATH', os.devnull)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import app  # noqa: F401  (creates the Flask app and the service singletons)
+
+    return sys.modules['app.services.nlp_service'], sys.modules['app.services.report_dedup']
+
+
+class StubDatabase:
+    """In-memory stand-in for the DatabaseClient calls made while logging a report."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sites = [
+            {'id': str(uuid.uuid4()), 'site_name': 'Site Alpha', 'aliases': ['Alpha']},
+            {'id': str(uuid.uuid4()), 'site_name': 'Site Beta', 'aliases': ['Beta']}
+        ]
+        self.reports = []
+
+    def site(self, name):
+        return next(site for site in self.sites if site['site_name'] == name)
+
+    def get_site_by_name_or_alias(self, site_identifier):
+        identifier = site_identifier.lower()
+        for site in self.sites:
+            if identifier == site['site_name'].lower() or identifier in (alias.lower() for alias in site['aliases']):
+                return site
+        return None
+
+    def create_field_report(self, report_data):
+        with self.lock:
+            report = dict(report_data, id=str(uuid.uuid4()), report_id_display=f"FR-BENCH-{len(self.reports):06d}",
+                          submission_timestamp=datetime.now(timezone.utc).isoformat())
+            self.reports.append(report)
+        return report
+
+    def link_unassigned_attachments(self, user_id, report_id, since):
+        return 0
+
+    def get_equipment_lexicon_source(self):
+        return {'equipment': [], 'asics': []}
+
+    def get_field_reports_for_similarity(self, since=None, offset=0, limit=1000):
+        return []
+
+
+def user_context(user_id, site_id):
+    return {
+        'flrts_user_id': user_id,
+        'primary_site_id': site_id,
+        'user_role': 'Technician',
+        'full_name': 'Bench Technician'
+    }
+
+
+def run_scenarios(nlp_module, dedup_module, db):
+    """Log reports through the NLP service and check how many rows each scenario stores."""
+    service = nlp_module.nlp_service
+    alpha, beta = db.site('Site Alpha'), db.site('Site Beta')
+    first_user, second_user = str(uuid.uuid4()), str(uuid.uuid4())
+    alpha_text, beta_text = REPORT_TEXT.format(site='Site Alpha'), REPORT_TEXT.format(site='Site Beta')
+
+    async def sequential(*submissions):
+        return [await service.handle_field_report_creation(text, context) for text, context in submissions]
+
+    async def concurrent(*submissions):
+        return await asyncio.gather(*(service.handle_field_report_creation(text, context) for text, context in submissions))
+
+    scenarios = [
+        ('resend', sequential, [(alpha_text, user_context(first_user, alpha['id']))] * 2, [alpha['id']]),
+        ('concurrent_resend', concurrent, [(alpha_text, user_context(first_user, alpha['id']))] * 2, [alpha['id']]),
+        # The user's primary site is Alpha both times; only the text names Beta
+        ('same_text_two_sites', sequential, [
+            (alpha_text, user_context(first_user, alpha['id'])),
+            (beta_text, user_context(first_user, alpha['id']))
+        ], [alpha['id'], beta['id']]),
+        ('same_text_two_users', sequential, [
+            (alpha_text, user_context(first_user, alpha['id'])),
+            (alpha_text, user_context(second_user, alpha['id']))
+        ], [alpha['id'], alpha['id']])
+    ]
+
+    results = []
+    for name, runner, submissions, expected_sites in scenarios:
+        nlp_module.report_deduplicator = dedup_module.ReportDeduplicator()
+        nlp_module.report_deduplicator.enabled = True
+        stored_before = len(db.reports)
+
+        responses = asyncio.run(runner(*submissions))
+        stored = db.reports[stored_before:]
+        results.append({
+            'scenario': name,
+            'submitted': len(submissions),
+            'stored': len(stored),
+            'collapsed': sum(1 for response in responses if response.get('action_taken') == 'duplicate_report_collapsed'),
+            'passed': all(response['success'] for response in responses)
+                      and sorted(report['site_id'] for report in stored) == sorted(expected_sites)
+        })
+
+    hasher = dedup_module.MinHasher(dedup_module.ReportDeduplicator.NUM_PERM)
+    text_similarity = hasher.similarity(hasher.signature(alpha_text), hasher.signature(beta_text))
+    return results, round(text_similarity, 3)
+
+
+def synthetic_report(rng):
+    return rng.choice(TEMPLATES).format(n=rng.randint(1, 40), p=rng.randint(10, 99), q=rng.randint(1, 99))
+
+
+def run_claims(dedup_module, reports, claims, rng):
+    """Time claim() for new reports against an index already holding `reports` reports."""
+    deduplicator = dedup_module.ReportDeduplicator()
+    deduplicator.enabled = True
+    deduplicator.window_seconds = 3600
+    users = [str(uuid.uuid4()) for _ in range(50)]
+    sites = [str(uuid.uuid4()) for _ in range(10)]
+
+    async def fill():
+        for index in range(reports):
+            claim = await deduplicator.claim(rng.choice(users), rng.choice(sites), synthetic_report(rng))
+            if claim.entry:
+                deduplicator.complete(claim, {'id': str(index)})
+
+    async def timed():
+        samples = []
+        duplicates = 0
+        for _ in range(claims):
+            started = time.perf_counter()
+            claim = await deduplicator.claim(rng.choice(users), rng.choice(sites), synthetic_report(rng))
+            samples.append((time.perf_counter() - started) * 1000)
+            if claim.duplicate_of:
+                duplicates += 1
+            else:
+                deduplicator.release(claim)
+        return samples, duplicates
+
+    asyncio.run(fill())
+    samples, duplicates = asyncio.run(timed())
+    samples.sort()
+    return {
+        'tracked_reports': deduplicator.get_stats()['tracked_reports'],
+        'claims': claims,
+        'duplicates_found': duplicates,
+        'mean_ms': round(sum(samples) / len(samples), 3),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+        'claims_per_second': round(len(samples) / (sum(samples) / 1000), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=5000, help='Reports in the index before timing')
+    parser.add_argument('--claims', type=int, default=2000, help='New reports checked while timing')
+    parser.add_argument('--seed', type=int, default=7, help='Random seed for the synthetic reports')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    nlp_module, dedup_module = load_app_modules()
+    db = StubDatabase()
+    nlp_module.db_client = db
+    sys.modules['app.services.equipment_lexicon'].get_db_client = lambda: db
+    sys.modules['app.services.report_similarity'].get_db_client = lambda: db
+    sys.modules['app.services.report_attachments'].get_db_client = lambda: db
+    nlp_module.nlp_service.openai_enabled = False
+
+    scenarios, text_similarity = run_scenarios(nlp_module, dedup_module, db)
+    report = {
+        'config': {
+            'threshold': dedup_module.settings.report_dedup_threshold,
+            'num_perm': dedup_module.ReportDeduplicator.NUM_PERM,
+            'bands': dedup_module.ReportDeduplicator.BANDS,
+            'seed': args.seed
+        },
+        'two_sites_text_similarity': text_similarity,
+        'scenarios': scenarios,
+        'claims': run_claims(dedup_module, args.reports, args.claims, random.Random(args.seed))
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+
+    if not all(scenario['passed'] for scenario in scenarios):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
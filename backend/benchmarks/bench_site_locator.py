@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+10NetZero-FLRTS Site Locator Benchmark
+
+Times nearest-site lookups on the in-memory grid against a brute-force haversine
+over every site, for site directories of increasing size, and reports both as JSON.
+
+Sites are clustered the way a real fleet is (pads grouped around a few regions,
+plus a scatter of outliers), and queries are positions near random sites. Every
+grid answer is checked against the brute-force answer, so the run also proves the
+ring search never returns a farther site than the true nearest.
+
+Usage (from the backend directory):
+    python benchmarks/bench_site_locator.py [--sites 50,500,5000,50000]
+        [--queries 2000] [--limit 3] [--seed 7] [--output results.json]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REGIONS = [(31.9, -102.1), (32.4, -103.5), (29.7, -95.4), (40.2, -104.8), (47.8, -103.3)]
+
+
+def load_locator_module():
+    """Create the app with placeholder settings and return the site_locator module."""
+    os.environ.setdefault('SUPABASE_URL', 'https://bench.supabase.co')
+    os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.e30.bench')
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:bench')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE_PATH', os.devnull)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import app  # noqa: F401  (creates the Flask app and the service singletons)
+
+    return sys.modules['app.services.site_locator']
+
+
+def synthetic_sites(count, rng):
+    """Sites clustered around a few regions, with 5% scattered across North America."""
+    sites = []
+    for index in range(count):
+        if rng.random() < 0.05:
+            latitude, longitude = rng.uniform(25, 55), rng.uniform(-125, -65)
+        else:
+            center_lat, center_lon = rng.choice(REGIONS)
+            latitude, longitude = rng.gauss(center_lat, 0.6), rng.gauss(center_lon, 0.6)
+        sites.append({
+            'id': f'site-{index}',
+            'site_id_display': f'SITE-{index:05d}',
+            'site_name': f'Site {index}',
+            'site_latitude': round(latitude, 7),
+            'site_longitude': round(longitude, 7)
+        })
+    return sites
+
+
+def run_scenario(module, site_count, queries, limit, rng):
+    """Build a locator over synthetic sites and time grid and brute-force lookups."""
+    np = module.np
+    sites = synthetic_sites(site_count, rng)
+
+    locator = module.SiteLocator()
+    started = time.perf_counter()
+    locator._grid = module.SiteGrid.build(sites, locator.cell_degrees)
+    build_ms = (time.perf_counter() - started) * 1000
+    locator._loaded = True
+    locator._synced_at = time.monotonic()
+    grid = locator._grid
+
+    points = []
+    for _ in range(queries):
+        site = rng.choice(sites)
+        points.append((site['site_latitude'] + rng.gauss(0, 0.01), site['site_longitude'] + rng.gauss(0, 0.01)))
+
+    started = time.perf_counter()
+    grid_results = [locator.nearest(latitude, longitude, limit=limit) for latitude, longitude in points]
+    grid_us = (time.perf_counter() - started) / queries * 1e6
+
+    started = time.perf_counter()
+    brute_results = []
+    for latitude, longitude in points:
+        distances = module.haversine_km(math.radians(latitude), math.radians(longitude), grid.lats, grid.lons)
+        brute_results.append(np.sort(distances)[:limit])
+    brute_us = (time.perf_counter() - started) / queries * 1e6
+
+    mismatches = sum(
+        not np.allclose([site['distance_km'] for site in found], expected, atol=1e-3)
+        for found, expected in zip(grid_results, brute_results)
+    )
+
+    return {
+        'sites': site_count,
+        'cells': len(grid.cells),
+        'build_ms': round(build_ms, 2),
+        'grid_lookup_us': round(grid_us, 1),
+        'brute_force_lookup_us': round(brute_us, 1),
+        'speedup': round(brute_us / grid_us, 2) if grid_us else None,
+        'mismatches': mismatches
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sites', default='50,500,5000,50000', help='Comma-separated site directory sizes')
+    parser.add_argument('--queries', type=int, default=2000, help='Lookups timed per size')
+    parser.add_argument('--limit', type=int, default=3, help='Nearest sites returned per lookup')
+    parser.add_argument('--seed', type=int, default=7, help='Random seed for sites and queries')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    module = load_locator_module()
+    rng = random.Random(args.seed)
+    sizes = [int(size) for size in args.sites.split(',') if size.strip()]
+
+    report = {
+        'config': {
+            'queries': args.queries,
+            'limit': args.limit,
+            'cell_degrees': module.settings.site_locator_cell_degrees,
+            'seed': args.seed
+        },
+        'runs': [run_scenario(module, size, args.queries, args.limit, rng) for size in sizes]
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+
+    if any(run['mismatches'] for run in report['runs']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
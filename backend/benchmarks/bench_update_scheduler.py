@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+10NetZero-FLRTS Telegram Update Scheduler Benchmark
+
+Feeds synthetic updates through UpdateIngestor and reports how throughput scales
+with the number of chats sending at the same time, as JSON.
+
+Every run submits the same number of updates, spread round-robin over 1, 2, 4, ...
+chats. The handler only sleeps for --handler-ms (standing in for the LLM and
+database round trips of a real update), so the numbers show the scheduler itself:
+one chat is processed strictly in order and cannot go faster than one update per
+handler time, while more chats run in parallel up to --workers at a time.
+
+Each run also checks that no chat ever had two updates in flight or saw them out
+of order, and that every lane was reclaimed once the chats went idle. A final run
+with a single worker shows the fully serial baseline.
+
+Usage (from the backend directory):
+    python benchmarks/bench_update_scheduler.py [--updates 256] [--workers 16]
+        [--handler-ms 20] [--chats 1,2,4,8,16,32,64] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_ingestor_class():
+    """Create the app with placeholder settings and return UpdateIngestor."""
+    os.environ.setdefault('SUPABASE_URL', 'https://bench.supabase.co')
+    os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.e30.bench')
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:bench')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('LOG_FILE_PATH', os.devnull)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import app  # noqa: F401  (creates the Flask app and the service singletons)
+
+    return sys.modules['app.services.update_ingestor'].UpdateIngestor
+
+
+class OrderChecker:
+    """Handler that sleeps like a real update and records per-chat ordering violations."""
+
+    def __init__(self, total, handler_ms):
+        self.total = total
+        self.delay = handler_ms / 1000
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.processed = 0
+        self.in_flight = set()
+        self.last_seen = {}
+        self.overlaps = 0
+        self.out_of_order = 0
+
+    async def handle(self, update):
+        chat, sequence = update
+        with self.lock:
+            if chat in self.in_flight:
+                self.overlaps += 1
+            self.in_flight.add(chat)
+            if sequence != self.last_seen.get(chat, -1) + 1:
+                self.out_of_order += 1
+            self.last_seen[chat] = sequence
+
+        await asyncio.sleep(self.delay)
+
+        with self.lock:
+            self.in_flight.discard(chat)
+            self.processed += 1
+            if self.processed == self.total:
+                self.done.set()
+
+
+def run_scenario(ingestor_class, chats, updates, workers, handler_ms, idle_seconds):
+    """Submit updates spread over the given number of chats and time their processing."""
+    per_chat = max(updates // chats, 1)
+    total = per_chat * chats
+    checker = OrderChecker(total, handler_ms)
+    ingestor = ingestor_class(workers=workers, max_queue=total, lane_idle_seconds=idle_seconds)
+    ingestor.start(checker.handle, key=lambda update: update[0])
+
+    started = time.perf_counter()
+    refused = 0
+    for sequence in range(per_chat):
+        for chat in range(chats):
+            refused += not ingestor.submit((chat, sequence))
+
+    finished = checker.done.wait(timeout=max(60.0, total * handler_ms / 1000 * 2))
+    elapsed = time.perf_counter() - started
+
+    # Give every lane time to notice it is idle
+    time.sleep(idle_seconds + 0.2)
+    stats = ingestor.get_stats()
+    ingestor.stop()
+
+    return {
+        'chats': chats,
+        'workers': workers,
+        'updates': total,
+        'completed': finished,
+        'elapsed_seconds': round(elapsed, 3),
+        'updates_per_second': round(checker.processed / elapsed, 1) if elapsed else None,
+        'ideal_updates_per_second': round(min(chats, workers) / (handler_ms / 1000), 1),
+        'queue_wait_p95_ms': stats['queue_wait']['p95_ms'],
+        'refused': refused,
+        'ordering_violations': checker.overlaps + checker.out_of_order,
+        'lanes_created': stats['lanes_created'],
+        'lanes_reclaimed': stats['lanes_reclaimed'],
+        'active_lanes_after_idle': stats['active_lanes']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=256, help='Updates submitted per run')
+    parser.add_argument('--workers', type=int, default=16, help='Chats processed in parallel')
+    parser.add_argument('--handler-ms', type=float, default=20.0, help='Simulated processing time per update')
+    parser.add_argument('--chats', default='1,2,4,8,16,32,64', help='Comma-separated concurrent chat counts')
+    parser.add_argument('--idle-seconds', type=float, default=0.5, help='Lane idle timeout used for the runs')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    ingestor_class = load_ingestor_class()
+    chat_counts = [int(count) for count in args.chats.split(',') if count.strip()]
+
+    runs = [
+        run_scenario(ingestor_class, chats, args.updates, args.workers, args.handler_ms, args.idle_seconds)
+        for chats in chat_counts
+    ]
+    baseline = runs[0]['updates_per_second'] if runs else None
+    for run in runs:
+        run['speedup_vs_first'] = round(run['updates_per_second'] / baseline, 2) if baseline else None
+
+    serial = run_scenario(ingestor_class, max(chat_counts), args.updates, 1, args.handler_ms, args.idle_seconds)
+
+    report = {
+        'config': {
+            'updates': args.updates,
+            'workers': args.workers,
+            'handler_ms': args.handler_ms,
+            'idle_seconds': args.idle_seconds
+        },
+        'scaling': runs,
+        'serial_baseline': serial
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+
+    if any(run['ordering_violations'] or not run['completed'] for run in runs + [serial]):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ Different configurations are available for development, testing, and production
 """
 
 import os
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -55,13 +55,65 @@ class Settings(BaseSettings):
     telegram_bot_token: Optional[str] = None
     telegram_webhook_url: Optional[str] = None
     telegram_webhook_secret: Optional[str] = None
+    telegram_update_workers: int = 8  # Chats whose updates are processed in parallel per worker process
+    telegram_lane_idle_seconds: float = 60.0  # Reclaim a chat's ordered lane after this long without updates
+    telegram_update_queue_size: int = 1000  # Queued webhook updates per worker before new ones are refused
+    telegram_seen_update_capacity: int = 10000  # Recent update_ids remembered per worker to drop webhook redeliveries
+    telegram_seen_update_ttl_seconds: int = 86400  # How long the shared store remembers an update_id
+    telegram_update_dedup_redis_url: Optional[str] = None  # Share seen update_ids across workers, e.g. redis://localhost:6379/0
+    telegram_send_rate_per_second: float = 25.0  # Outbound messages per second per worker (Telegram allows ~30 per bot)
+    telegram_send_chat_interval_seconds: float = 1.0  # Steady-state spacing of messages to one chat
+    telegram_send_chat_burst: int = 3  # Messages a chat may receive back to back before pacing applies
+    telegram_send_concurrency: int = 8  # Concurrent sendMessage requests per worker
+    telegram_send_queue_size: int = 5000  # Queued outbound messages per worker before new ones are dropped
+    telegram_send_max_attempts: int = 5  # Attempts for network errors and chat migrations
+    telegram_send_max_rate_limited_attempts: int = 20  # 429s waited out for one message before it fails
+    
+    # Notification Log Configuration
+    notification_log_batch_size: int = 100  # notifications_log rows written per insert
+    notification_log_flush_seconds: float = 5.0  # Longest a row waits in memory before it is written
+    notification_log_max_buffered: int = 10000  # Rows held per worker before new ones are dropped (e.g. database down)
+    notification_log_max_attempts: int = 5  # Failed inserts of a batch before it is dropped
     
     # External API Configuration
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-4"
     openai_max_tokens: int = 1000
+    llm_single_flight_enabled: bool = True  # Coalesce identical in-flight LLM requests
+    llm_request_timeout: float = 30.0  # Seconds before an LLM call (and its waiters) time out
+    llm_max_concurrency: int = 8  # Concurrent LLM calls per worker
+    llm_queue_timeout: float = 10.0  # Seconds to wait for an LLM slot before falling back
     
     todoist_api_token: Optional[str] = None
+    todoist_mirror_enabled: bool = True  # Mirror tasks to Todoist through the outbox
+    todoist_outbox_batch_size: int = 50  # Commands per Todoist sync request (max 100)
+    todoist_outbox_poll_seconds: float = 2.0
+    todoist_outbox_max_attempts: int = 8  # Attempts before a row is dead-lettered
+    todoist_outbox_backoff_seconds: float = 5.0
+    todoist_outbox_max_backoff_seconds: float = 900.0
+    todoist_outbox_lock_timeout_seconds: float = 120.0  # Reclaim rows held by a crashed worker
+    
+    # Reminder Delivery Configuration
+    reminder_engine_enabled: bool = True  # Deliver Scheduled reminders through Telegram
+    reminder_window_seconds: float = 300.0  # Reminders due this far ahead are loaded into memory
+    reminder_poll_seconds: float = 60.0  # How often the window is reloaded from the reminders table
+    reminder_max_lateness_seconds: float = 3600.0  # Overdue reminders older than this are retired instead of sent
+    reminder_batch_size: int = 500  # Rows per reminders page
+    reminder_expiry_cron: str = "*/15 * * * *"  # When overdue reminders are retired
+    
+    # Periodic Job Configuration
+    job_scheduler_enabled: bool = True  # Run periodic jobs (one worker per run, elected with advisory locks)
+    job_scheduler_max_workers: int = 2  # Jobs that may run at the same time in one worker process
+    job_scheduler_jitter_seconds: float = 30.0  # Random delay before each run so workers do not start together
+    markup_recalculation_cron: str = "0 2 * * *"  # Nightly recalculation of open invoice markups (default_timezone)
+    
+    # Scheduled Digest Configuration
+    digests_enabled: bool = True  # Send daily/weekly Telegram digests (run as periodic jobs)
+    daily_digest_cron: str = "0 7 * * 1-5"  # When the daily digest is sent (default_timezone)
+    weekly_digest_cron: str = "0 16 * * 5"  # When the weekly digest (next 7 days) is sent
+    digest_batch_size: int = 500  # Recipients loaded, rendered and sent per page
+    digest_max_items: int = 10  # Items listed per digest section
+    digest_page_timeout_seconds: float = 120.0  # Longest wait for a page to be delivered before the next is loaded
     
     # Google Drive API Configuration
     google_api_key: Optional[str] = None
@@ -71,8 +123,46 @@ class Settings(BaseSettings):
     
     # NLP and Processing Configuration
     max_message_length: int = 2000
-    nlp_confidence_threshold: float = 0.7
+    nlp_confidence_threshold: float = 0.7  # Local classifier score needed to answer without the LLM
+    nlp_cascade_margin: float = 0.05  # Also ask the LLM when the top two local intents score this close
+    nlp_intent_thresholds: Dict[str, float] = {}  # Per-intent overrides, e.g. {"update_task_status": 0.8}; above 1.0 always asks the LLM
+    nlp_batch_max_items: int = 500  # Maximum inputs per /api/nlp/process/batch request
+    nlp_batch_max_concurrency: int = 16  # Items processed in parallel per batch
+    nlp_batch_items_per_minute: int = 600  # Batch items each API key may submit per minute (a full batch may arrive at once)
+    nlp_prefetch_enabled: bool = True  # Load likely handler data while the LLM classifies intent
     default_site_id: Optional[str] = None
+    default_timezone: str = "UTC"  # IANA timezone for users without one in preferences_flrts
+    task_match_min_score: float = 0.3  # Minimum title similarity for a task reference to match
+    task_match_ambiguity_margin: float = 0.05  # Ask which task was meant when the top two are this close
+    task_match_recency_weight: float = 0.1  # Score bonus for recently touched tasks
+    equipment_lexicon_refresh_seconds: int = 300  # Rebuild the equipment/ASIC matcher this often
+    list_cache_ttl_seconds: int = 300  # How long a site's active lists are cached for list item additions
+    report_similarity_dimensions: int = 1024  # Hashed feature vector size per field report (power of two)
+    report_similarity_min_score: float = 0.2  # Minimum cosine similarity for a report to count as similar
+    report_similarity_refresh_seconds: int = 300  # Pick up reports filed through other workers this often
+    report_dedup_enabled: bool = True  # Answer resent field reports with the report already logged
+    report_dedup_threshold: float = 0.85  # Estimated Jaccard similarity at which a report counts as a resend
+    report_dedup_window_seconds: int = 900  # How long a report is remembered for resend detection
+    
+    # Site Location Configuration
+    site_locator_cell_degrees: float = 0.25  # Grid cell size of the in-memory site index
+    site_locator_max_distance_km: float = 2.0  # A shared location resolves to a site only within this distance
+    site_locator_refresh_seconds: int = 600  # Reload site coordinates this often
+    site_location_ttl_seconds: int = 14400  # How long a shared location applies to a user's field reports
+    
+    # Field Report Attachment Configuration
+    attachment_storage_backend: str = "local"  # local or drive
+    attachment_storage_dir: str = "attachments"  # Local storage root; downloads are also staged here
+    attachment_drive_folder_id: Optional[str] = None  # Google Drive folder used by the drive backend
+    attachment_max_bytes: int = 20971520  # 20MB, the largest file the Bot API lets bots download
+    attachment_allowed_types: str = "image/,application/pdf"  # Comma-separated MIME types (or prefixes) accepted as documents
+    attachment_chunk_bytes: int = 262144  # Download and Drive upload chunk size (Drive needs a multiple of 256KB)
+    attachment_max_concurrent_downloads: int = 4  # Files downloaded from Telegram at once per worker
+    attachment_queue_timeout_seconds: float = 30.0  # Wait for a download slot before a file is refused
+    attachment_max_pending: int = 50  # Downloaded files waiting to be stored per worker before new ones are refused
+    attachment_workers: int = 2  # Threads storing files and rendering thumbnails per worker
+    attachment_thumbnail_px: int = 320  # Longest side of generated thumbnails
+    attachment_link_window_seconds: int = 1800  # A file without a caption joins a report logged this close in time
     
     # Logging Configuration
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -82,7 +172,10 @@ class Settings(BaseSettings):
     
     # Security Configuration
     cors_origins: str = "*"  # Configure appropriately for production
-    rate_limit_per_minute: int = 60
+    rate_limit_per_minute: int = 60  # Applied per user and per API key
+    rate_limit_burst: int = 10
+    rate_limit_max_wait_seconds: float = 5.0  # Queue requests up to this long before rejecting
+    rate_limit_redis_url: Optional[str] = None  # Shared buckets across workers, e.g. redis://localhost:6379/0
     api_keys: List[str] = []  # List of valid API keys - loaded from environment
     
     @property
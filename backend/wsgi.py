@@ -16,11 +16,12 @@ from pathlib import Path
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
-from app import create_app
+from app import create_app, start_background_services
 from config.settings import settings
 
-# Create application instance for WSGI server
+# Create application instance for WSGI server and start its background workers
 application = create_app()
+start_background_services(application)
 
 if __name__ == "__main__":
     # This allows testing the WSGI interface directly
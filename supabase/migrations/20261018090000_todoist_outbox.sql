@@ -0,0 +1,31 @@
+-- ==========================================
+-- 10NetZero-FLRTS: Todoist Outbox
+-- ==========================================
+-- Version: 1.0
+-- Date: October 18, 2026
+-- Description: Transactional outbox for Todoist writes. Rows are inserted in the
+-- same transaction as the task insert/update and drained to the Todoist Sync API
+-- by the backend dispatcher (app/services/todoist_outbox.py).
+
+CREATE TABLE IF NOT EXISTS todoist_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    operation VARCHAR(50) NOT NULL CHECK (operation IN ('create_task', 'complete_task')),
+    task_id UUID NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    command_uuid UUID NOT NULL DEFAULT uuid_generate_v4(), -- Todoist de-duplicates retried commands by this UUID
+    status VARCHAR(50) NOT NULL CHECK (status IN ('Pending', 'Processing', 'Done', 'Dead')) DEFAULT 'Pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_at TIMESTAMPTZ,
+    locked_by VARCHAR(255),
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+
+-- Dispatcher claims due rows in id order; keep the index limited to live rows
+CREATE INDEX IF NOT EXISTS idx_todoist_outbox_due ON todoist_outbox(next_attempt_at, id)
+    WHERE status IN ('Pending', 'Processing');
+CREATE INDEX IF NOT EXISTS idx_todoist_outbox_task ON todoist_outbox(task_id);
+CREATE INDEX IF NOT EXISTS idx_todoist_outbox_dead ON todoist_outbox(created_at)
+    WHERE status = 'Dead';
@@ -0,0 +1,50 @@
+-- ==========================================
+-- 10NetZero-FLRTS: Task Reference Matching
+-- ==========================================
+-- Version: 1.0
+-- Date: October 18, 2026
+-- Description: Trigram index and lookup function used to resolve task references
+-- such as "complete fix pump" or "complete TASK-20261018-1A2B3C4D" to a single task.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Candidate filtering: a user's open tasks, then fuzzy title matching
+CREATE INDEX IF NOT EXISTS idx_tasks_assigned_status ON tasks(assigned_to_user_id, status);
+CREATE INDEX IF NOT EXISTS idx_tasks_title_trgm ON tasks USING GIN (task_title gin_trgm_ops);
+
+-- Returns a user's open tasks matching a reference, best match first.
+-- An exact task_id_display match always scores 1.0; otherwise the score is the
+-- better of whole-title and word similarity, so "pump" fully matches "Fix pump at Alpha".
+CREATE OR REPLACE FUNCTION match_user_tasks(p_user_id UUID, p_reference TEXT, p_limit INTEGER DEFAULT 10)
+RETURNS TABLE (
+    id UUID,
+    task_id_display VARCHAR,
+    task_title VARCHAR,
+    status VARCHAR,
+    due_date DATE,
+    todoist_task_id VARCHAR,
+    created_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ,
+    match_score REAL,
+    exact_id_match BOOLEAN
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        t.id, t.task_id_display, t.task_title, t.status, t.due_date, t.todoist_task_id,
+        t.created_at, t.updated_at,
+        CASE
+            WHEN t.task_id_display = upper(p_reference) THEN 1.0::real
+            ELSE GREATEST(similarity(t.task_title, p_reference), word_similarity(p_reference, t.task_title))
+        END AS match_score,
+        t.task_id_display = upper(p_reference) AS exact_id_match
+    FROM tasks t
+    WHERE t.assigned_to_user_id = p_user_id
+      AND t.status IN ('To Do', 'In Progress', 'Blocked')
+      AND (
+          t.task_id_display = upper(p_reference)
+          OR t.task_title ILIKE '%' || replace(replace(replace(p_reference, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+          OR p_reference <% t.task_title
+      )
+    ORDER BY exact_id_match DESC, match_score DESC, COALESCE(t.updated_at, t.created_at) DESC
+    LIMIT p_limit;
+$$;
@@ -0,0 +1,26 @@
+-- ==========================================
+-- 10NetZero-FLRTS: Periodic Job Runs
+-- ==========================================
+-- Version: 1.0
+-- Date: October 19, 2026
+-- Description: History of the backend's periodic jobs (app/services/job_scheduler.py).
+-- Each scheduled slot of a job is recorded once: the unique (job_name, scheduled_for)
+-- key stops a second worker from re-running a slot that has already started, while
+-- a PostgreSQL advisory lock held during the run keeps runs of a job from overlapping.
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    id BIGSERIAL PRIMARY KEY,
+    job_name VARCHAR(100) NOT NULL,
+    scheduled_for TIMESTAMPTZ NOT NULL, -- Nominal schedule slot, before jitter
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ,
+    duration_ms INTEGER,
+    status VARCHAR(50) NOT NULL CHECK (status IN ('Running', 'Succeeded', 'Failed')) DEFAULT 'Running',
+    worker_id VARCHAR(255),
+    result JSONB,
+    error TEXT,
+    CONSTRAINT uq_job_runs_slot UNIQUE (job_name, scheduled_for)
+);
+
+-- Latest runs per job (catch-up after downtime, history queries)
+CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs(job_name, started_at DESC);
@@ -0,0 +1,10 @@
+-- ==========================================
+-- 10NetZero-FLRTS: Recent Notifications per User
+-- ==========================================
+-- Version: 1.0
+-- Date: October 19, 2026
+-- Description: Serves "latest notifications sent to a user" (GET /api/notifications/user/<user_id>)
+-- from one index range instead of sorting all of the user's notifications_log rows.
+
+CREATE INDEX IF NOT EXISTS idx_notifications_recipient_sent
+    ON notifications_log(recipient_user_id, timestamp_sent DESC);
@@ -0,0 +1,44 @@
+-- ==========================================
+-- 10NetZero-FLRTS: Field Report Attachments
+-- ==========================================
+-- Version: 1.0
+-- Date: October 19, 2026
+-- Description: Photos and documents technicians send to the Telegram bot
+-- (app/services/report_attachments.py). Files live in attachment storage (a local
+-- directory or a Google Drive folder); this table records where each file and its
+-- thumbnail were stored and which field report it belongs to. An attachment sent
+-- before its report is logged has no field_report_id until the report arrives.
+
+CREATE TABLE IF NOT EXISTS field_report_attachments (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    field_report_id UUID REFERENCES field_reports(id) ON DELETE CASCADE,
+    uploaded_by_user_id UUID NOT NULL REFERENCES flrts_users(id),
+    telegram_file_id VARCHAR(255),
+    telegram_file_unique_id VARCHAR(255),
+    file_name VARCHAR(255) NOT NULL,
+    mime_type VARCHAR(100),
+    size_bytes BIGINT NOT NULL,
+    sha256 CHAR(64),
+    storage_backend VARCHAR(50) NOT NULL, -- 'local' or 'drive'
+    storage_path TEXT, -- Path under the storage directory, or the Drive file ID
+    thumbnail_path TEXT,
+    status VARCHAR(50) NOT NULL CHECK (status IN ('Received', 'Stored', 'Failed')) DEFAULT 'Received',
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    stored_at TIMESTAMPTZ
+);
+
+-- Attachments of a report
+CREATE INDEX IF NOT EXISTS idx_field_report_attachments_report ON field_report_attachments(field_report_id);
+
+-- A user's attachments still waiting for their report
+CREATE INDEX IF NOT EXISTS idx_field_report_attachments_unassigned
+    ON field_report_attachments(uploaded_by_user_id, created_at)
+    WHERE field_report_id IS NULL;
+
+ALTER TABLE field_report_attachments ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY field_report_attachments_all_access ON field_report_attachments
+    FOR ALL
+    TO app_admin
+    USING (true);